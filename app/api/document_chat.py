@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 import logging
+import time
 
 from app import db
 from app.models.document import Document
+from app.services.chat_context import CHAT_CONTEXT_MODES
 from app.utils.api_utils import APIError, log_api_access
 
 # Set up logging
@@ -27,18 +29,22 @@ def chat_with_document():
         document_id = data.get('document_id')
         question = data.get('question')
         chat_history = data.get('chat_history', [])
+        context_mode = data.get('context_mode')
+        
+        if context_mode and context_mode not in CHAT_CONTEXT_MODES:
+            raise APIError(f"Invalid context_mode: {context_mode}. Must be one of: {', '.join(CHAT_CONTEXT_MODES)}", code=400)
         
         # Verify document exists and belongs to user
         document = Document.query.filter_by(id=document_id, user_id=current_user.id).first()
         if not document:
             raise APIError("Document not found", code=404)
             
-        # Get document text
-        document_processor = current_app.services.get('document_processor')
-        if not document_processor:
+        # Get the document context for this question
+        chat_context = current_app.services.get('chat_context')
+        if not chat_context:
             raise APIError("Document processing service unavailable", code=503)
             
-        text = document_processor._extract_document_text(document)
+        text, chat_history, context_info = chat_context.build(document, question, chat_history, context_mode)
         
         if not text:
             raise APIError("Failed to extract document text", code=500)
@@ -49,19 +55,23 @@ def chat_with_document():
             raise APIError("AI service unavailable", code=503)
             
         # Process chat with text
-        answer = ai_service.chat_with_text(text, question, chat_history)
+        started = time.perf_counter()
+        answer = ai_service.chat_with_text(text, question, chat_history, excerpts=context_info['mode'] == 'retrieval')
+        context_info['upstream_ms'] = round((time.perf_counter() - started) * 1000, 1)
         
         if not answer:
             raise APIError("Failed to generate response", code=500)
             
         log_api_access("chat_with_document", True, {
             "document_id": document_id,
-            "question_length": len(question)
+            "question_length": len(question),
+            "context": context_info
         })
             
         return jsonify({
             'answer': answer,
             'document_id': document_id,
+            'context': context_info,
             'is_fallback': False  # Can be enhanced to detect fallback responses
         }), 200
         
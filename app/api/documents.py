@@ -20,10 +20,12 @@ from pathlib import Path
 from app import db
 from app.models.document import Document
 from app.models.chat import ChatHistory
-from app.utils.api_utils import APIError, log_api_access
+from app.utils.api_utils import APIError, log_api_access, response_cache_allowed
+from app.utils.streaming import get_stream_stats, sse_response, wants_stream
 from app.utils.claude import get_anthropic_client
 from app.utils.summarize import generate_summary
 from app.services.document_processor import DocumentProcessor
+from app.services.chat_context import CHAT_CONTEXT_MODES
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -75,12 +77,39 @@ def upload_document():
         if not document_processor:
             raise APIError("Document processing service unavailable", code=503)
         
+        # Hand processing to the background pipeline when enabled
+        ingestion_pipeline = current_app.services.get('ingestion_pipeline')
+        process_async = current_app.config.get('INGEST_ASYNC') and ingestion_pipeline is not None
+        
         # Save the file and create document record
-        document, error = document_processor.save_file(file, current_user.id)
+        document, error = document_processor.save_file(file, current_user.id, process=not process_async)
         if error:
             log_api_access("upload_document", False, {"error": error})
             raise APIError(error, code=400)
         
+        if process_async:
+            job = ingestion_pipeline.submit(current_app._get_current_object(), document)
+            
+            log_api_access("upload_document", True, {
+                "document_id": document.id,
+                "file_type": document.file_type,
+                "file_size": document.file_size,
+                "job_id": job.id
+            })
+            return jsonify({
+                'message': 'Document uploaded, processing started',
+                'document': document.to_dict(),
+                'document_id': document.id,
+                'job_id': job.id,
+                'job': job.to_dict(),
+                'status_url': f"/api/documents/jobs/{job.id}"
+            }), 202
+        
+        # Pre-generate the question pool in the background
+        question_generator = current_app.services.get('question_generator')
+        if current_app.config.get('QUESTION_POOL') and question_generator:
+            question_generator.schedule_pool_top_up(current_app._get_current_object(), document.id)
+        
         # Return success response
         log_api_access("upload_document", True, {
             "document_id": document.id,
@@ -99,6 +128,95 @@ def upload_document():
         log_api_access("upload_document", False)
         raise APIError.from_exception(e, default_message="Failed to upload document")
 
+@documents_bp.route('/jobs/<string:job_id>', methods=['GET'])
+@login_required
+def get_ingestion_job(job_id):
+    """Get the status of a background ingestion job"""
+    ingestion_pipeline = current_app.services.get('ingestion_pipeline')
+    if not ingestion_pipeline:
+        raise APIError("Ingestion service unavailable", code=503)
+    
+    job = ingestion_pipeline.get_job(job_id, current_user.id)
+    if not job:
+        log_api_access("get_ingestion_job", False, {"job_id": job_id})
+        raise APIError("Job not found", code=404)
+    
+    log_api_access("get_ingestion_job", True, {"job_id": job_id, "status": job.status})
+    return jsonify(job.to_dict()), 200
+
+@documents_bp.route('/index-cache/stats', methods=['GET'])
+@login_required
+def get_index_cache_stats():
+    """Get hit/miss/eviction counters for this worker's search index cache"""
+    embeddings_service = current_app.services.get('embeddings_service')
+    if not embeddings_service:
+        raise APIError("Embeddings service unavailable", code=503)
+    
+    log_api_access("get_index_cache_stats", True)
+    return jsonify(embeddings_service.get_index_cache_stats()), 200
+
+@documents_bp.route('/embedding-cache/stats', methods=['GET'])
+@login_required
+def get_embedding_cache_stats():
+    """Get hit-rate counters for this worker's embedding cache"""
+    embeddings_service = current_app.services.get('embeddings_service')
+    if not embeddings_service:
+        raise APIError("Embeddings service unavailable", code=503)
+    
+    log_api_access("get_embedding_cache_stats", True)
+    return jsonify(embeddings_service.get_embedding_cache_stats()), 200
+
+@documents_bp.route('/embedding-scheduler/stats', methods=['GET'])
+@login_required
+def get_embedding_scheduler_stats():
+    """Get batch counts and achieved throughput for this worker's embedding requests"""
+    embeddings_service = current_app.services.get('embeddings_service')
+    if not embeddings_service:
+        raise APIError("Embeddings service unavailable", code=503)
+    
+    log_api_access("get_embedding_scheduler_stats", True)
+    return jsonify(embeddings_service.get_embedding_scheduler_stats()), 200
+
+@documents_bp.route('/upstream/stats', methods=['GET'])
+@login_required
+def get_upstream_stats():
+    """Get per-operation request counts and latencies for this worker's model API calls"""
+    http_client = current_app.services.get('http_client')
+    if not http_client:
+        raise APIError("HTTP client unavailable", code=503)
+    
+    log_api_access("get_upstream_stats", True)
+    return jsonify(http_client.stats()), 200
+
+@documents_bp.route('/response-cache/stats', methods=['GET'])
+@login_required
+def get_response_cache_stats():
+    """Get per-operation hit rates and size of the model response cache"""
+    response_cache = current_app.services.get('response_cache')
+    if not response_cache:
+        raise APIError("Response cache disabled", code=503)
+    
+    log_api_access("get_response_cache_stats", True)
+    return jsonify(response_cache.stats()), 200
+
+@documents_bp.route('/single-flight/stats', methods=['GET'])
+@login_required
+def get_single_flight_stats():
+    """Get per-operation counts of model calls shared between identical concurrent requests"""
+    single_flight = current_app.services.get('single_flight')
+    if not single_flight:
+        raise APIError("Request coalescing unavailable", code=503)
+    
+    log_api_access("get_single_flight_stats", True)
+    return jsonify(single_flight.stats()), 200
+
+@documents_bp.route('/streams/stats', methods=['GET'])
+@login_required
+def get_streams_stats():
+    """Get time-to-first-token percentiles for this worker's streamed responses"""
+    log_api_access("get_streams_stats", True)
+    return jsonify(get_stream_stats()), 200
+
 @documents_bp.route('/<int:document_id>', methods=['DELETE'])
 @login_required
 def delete_document(document_id):
@@ -186,7 +304,8 @@ def get_document_text(document_id):
 @documents_bp.route('/<int:document_id>/summarize', methods=['GET'])
 @login_required
 def summarize_document(document_id):
-    """Generate a summary of a document using Claude API"""
+    """Generate a summary of a document using Claude API (streamed as server-sent events with ?stream=1)"""
+    started = time.perf_counter()
     try:
         # Check if document exists and belongs to user
         document = Document.query.filter_by(id=document_id, user_id=current_user.id).first()
@@ -198,9 +317,20 @@ def summarize_document(document_id):
         document_processor = current_app.services.get('document_processor')
         if not document_processor:
             raise APIError("Document processing service unavailable", code=503)
+        
+        if wants_stream():
+            chunks, error = document_processor.stream_summarize_document(document_id)
+            if error:
+                log_api_access("summarize_document", False, {"document_id": document_id, "error": error})
+                raise APIError(error, code=400)
+            
+            return sse_response(chunks, "summarize_document", started=started, on_complete=lambda summary: {
+                'document_id': document_id,
+                'document_name': document.original_filename
+            })
             
         # Generate summary
-        summary, error = document_processor.summarize_document(document_id)
+        summary, error = document_processor.summarize_document(document_id, use_cache=response_cache_allowed())
         
         if error:
             log_api_access("summarize_document", False, {"document_id": document_id, "error": error})
@@ -394,7 +524,7 @@ def process_image_ocr():
         image_data = image_file.read()
         
         # Use Hugging Face OCR model or Claude Vision
-        text = current_app.services.get('ai_service').process_image_ocr(image_data)
+        text = current_app.services.get('ai_service').process_image_ocr(image_data, use_cache=response_cache_allowed())
         
         if not text:
             raise APIError("Failed to extract text from image", code=400)
@@ -417,7 +547,8 @@ def process_image_ocr():
 @documents_bp.route('/summarize', methods=['POST'])
 @login_required
 def summarize_document_post():
-    """Generate a summary for a document"""
+    """Generate a summary for a document (streamed as server-sent events when stream is true)"""
+    started = time.perf_counter()
     try:
         data = request.get_json()
         
@@ -445,9 +576,13 @@ def summarize_document_post():
         claude_service = current_app.services.get('ai_service')
         if not claude_service:
             raise APIError("AI service unavailable", code=503)
+        
+        if wants_stream(data):
+            return sse_response(claude_service.stream_summarize_text(text), "summarize_document", started=started,
+                                on_complete=lambda summary: {'document_id': document_id})
             
         # Generate summary
-        summary = claude_service.summarize_text(text)
+        summary = claude_service.summarize_text(text, use_cache=response_cache_allowed(data))
         
         if not summary:
             raise APIError("Failed to generate summary", code=500)
@@ -471,7 +606,8 @@ def summarize_document_post():
 @documents_bp.route('/chat', methods=['POST'])
 @login_required
 def chat_with_document():
-    """Chat with a document using Claude API"""
+    """Chat with a document using Claude API (streamed as server-sent events when stream is true)"""
+    started = time.perf_counter()
     try:
         data = request.get_json()
         
@@ -484,6 +620,10 @@ def chat_with_document():
         document_id = data.get('document_id')
         question = data.get('query')
         chat_history = data.get('chat_history', [])
+        context_mode = data.get('context_mode')
+        
+        if context_mode and context_mode not in CHAT_CONTEXT_MODES:
+            raise APIError(f"Invalid context_mode: {context_mode}. Must be one of: {', '.join(CHAT_CONTEXT_MODES)}", code=400)
         session_id = data.get('session_id')
         
         # If no session_id provided, create a new one
@@ -495,12 +635,12 @@ def chat_with_document():
         if not document:
             raise APIError("Document not found", code=404)
             
-        # Get document text
-        document_processor = current_app.services.get('document_processor')
-        if not document_processor:
+        # Get the document context for this question
+        chat_context = current_app.services.get('chat_context')
+        if not chat_context:
             raise APIError("Document processing service unavailable", code=503)
             
-        text = document_processor._extract_document_text(document)
+        text, chat_history, context_info = chat_context.build(document, question, chat_history, context_mode)
         
         if not text:
             raise APIError("Failed to extract document text", code=500)
@@ -509,40 +649,44 @@ def chat_with_document():
         ai_service = current_app.services.get('ai_service')
         if not ai_service:
             raise APIError("AI service unavailable", code=503)
+        
+        excerpts = context_info['mode'] == 'retrieval'
+        if wants_stream(data):
+            user_id = current_user.id
+            
+            def save_turn(answer):
+                # Only a completed answer is saved to chat history
+                if not answer:
+                    raise ValueError("Failed to generate response")
+                _save_chat_turn(user_id, document_id, session_id, question, answer)
+                return {'document_id': document_id, 'session_id': session_id, 'context': context_info}
+            
+            return sse_response(ai_service.stream_chat_with_text(text, question, chat_history, excerpts=excerpts),
+                                "chat_with_document", on_complete=save_turn, started=started)
             
         # Process chat with text
-        answer = ai_service.chat_with_text(text, question, chat_history)
+        upstream_started = time.perf_counter()
+        answer = ai_service.chat_with_text(text, question, chat_history, excerpts=excerpts)
+        context_info['upstream_ms'] = round((time.perf_counter() - upstream_started) * 1000, 1)
         
         if not answer:
             raise APIError("Failed to generate response", code=500)
         
         # Save question and answer to chat history
-        ChatHistory.save_message(
-            user_id=current_user.id,
-            role='user',
-            message=question,
-            document_id=document_id,
-            session_id=session_id
-        )
-        
-        ChatHistory.save_message(
-            user_id=current_user.id,
-            role='assistant',
-            message=answer,
-            document_id=document_id,
-            session_id=session_id
-        )
+        _save_chat_turn(current_user.id, document_id, session_id, question, answer)
             
         log_api_access("chat_with_document", True, {
             "document_id": document_id,
             "question_length": len(question),
-            "session_id": session_id
+            "session_id": session_id,
+            "context": context_info
         })
             
         return jsonify({
             'response': answer,  # Used "response" to match what the frontend expects
             'document_id': document_id,
             'session_id': session_id,
+            'context': context_info,
             'is_fallback': False
         }), 200
         
@@ -556,6 +700,24 @@ def chat_with_document():
         })
         raise APIError.from_exception(e, default_message="Failed to process chat request")
 
+def _save_chat_turn(user_id, document_id, session_id, question, answer):
+    """Save a question and its answer to chat history"""
+    ChatHistory.save_message(
+        user_id=user_id,
+        role='user',
+        message=question,
+        document_id=document_id,
+        session_id=session_id
+    )
+    
+    ChatHistory.save_message(
+        user_id=user_id,
+        role='assistant',
+        message=answer,
+        document_id=document_id,
+        session_id=session_id
+    )
+
 @documents_bp.route('/<int:document_id>/content', methods=['GET'])
 @login_required
 def get_document_content(document_id):
@@ -1,18 +1,25 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 import logging
+import time
 
 from app.utils.api_utils import APIError, log_api_access
+from app.utils.streaming import sse_response, wants_stream
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 general_chat_bp = Blueprint('general_chat', __name__, url_prefix='/api/general_chat')
 
+GENERAL_CHAT_SYSTEM_PROMPT = """You are a helpful AI assistant built into a study application.
+You can help with studying, learning, and general knowledge questions.
+Provide concise, accurate responses."""
+
 @general_chat_bp.route('/', methods=['POST'])
 @login_required
 def chat_with_ai():
-    """Chat with AI without document context"""
+    """Chat with AI without document context (streamed as server-sent events when stream is true)"""
+    started = time.perf_counter()
     try:
         data = request.get_json()
         
@@ -28,6 +35,15 @@ def chat_with_ai():
         ai_service = current_app.services.get('ai_service')
         if not ai_service:
             raise APIError("AI service unavailable", code=503)
+        
+        if wants_stream(data):
+            chunks = ai_service._stream_claude_api(
+                messages=[{"role": "user", "content": query}],
+                system_prompt=GENERAL_CHAT_SYSTEM_PROMPT,
+                max_tokens=1500,
+                temperature=0.7
+            )
+            return sse_response(chunks, "general_chat", started=started)
             
         # Generate general response
         response = generate_general_response(ai_service, query)
@@ -63,15 +79,10 @@ def generate_general_response(ai_service, query):
             }
         ]
         
-        # Define a system prompt
-        system_prompt = """You are a helpful AI assistant built into a study application.
-You can help with studying, learning, and general knowledge questions.
-Provide concise, accurate responses."""
-        
         # Make API call
         result = ai_service._call_claude_api(
             messages=messages,
-            system_prompt=system_prompt,
+            system_prompt=GENERAL_CHAT_SYSTEM_PROMPT,
             max_tokens=1500,
             temperature=0.7
         )
@@ -6,13 +6,30 @@ from datetime import datetime
 
 from app import db
 from app.models.document import Document, Question, DocumentChunk
-from app.utils.api_utils import APIError, log_api_access
+from app.services.srs_scheduler import reschedule_questions
+from app.utils.api_utils import APIError, log_api_access, response_cache_allowed
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 questions_bp = Blueprint('questions', __name__, url_prefix='/api/questions')
 
+# Largest quiz accepted by the batch evaluation endpoint
+MAX_BATCH_ANSWERS = 200
+
+def review_log_row(review, evaluation, latency_ms=None):
+    """Complete a review returned by update_srs_data with its evaluation score and answer time"""
+    score = evaluation.get('score')
+    review['score'] = float(score) if isinstance(score, (int, float)) else None
+    review['latency_ms'] = int(latency_ms) if isinstance(latency_ms, (int, float)) and latency_ms >= 0 else None
+    return review
+
+def record_reviews(reviews):
+    """Hand committed reviews to the write-behind review log"""
+    review_log = current_app.services.get('review_log')
+    if review_log and reviews:
+        review_log.record(current_app._get_current_object(), reviews)
+
 @questions_bp.route('/generate', methods=['POST'])
 @login_required
 def generate_questions():
@@ -42,11 +59,15 @@ def generate_questions():
         
         # Generate questions
         questions, error = question_generator.generate_questions_for_document(
-            document_id, current_user.id, question_type, count
+            document_id, current_user.id, question_type, count, use_cache=response_cache_allowed(data)
         )
         
         if error:
             raise APIError(error, code=400)
+        
+        # Refill the document's question pool in the background
+        if current_app.config.get('QUESTION_POOL'):
+            question_generator.schedule_pool_top_up(current_app._get_current_object(), document_id)
             
         log_api_access("generate_questions", True, {
             "document_id": document_id,
@@ -135,7 +156,8 @@ def evaluate_answer(question_id):
         
         # Update SRS data if evaluation was successful
         if evaluation and 'is_correct' in evaluation:
-            question.update_srs_data(evaluation['is_correct'])
+            review = question.update_srs_data(evaluation['is_correct'], scheduler=current_app.services.get('srs_scheduler'))
+            record_reviews([review_log_row(review, evaluation, data.get('latency_ms'))])
             
         log_api_access("evaluate_answer", True, {
             "question_id": question_id,
@@ -152,6 +174,79 @@ def evaluate_answer(question_id):
         log_api_access("evaluate_answer", False, {"question_id": question_id})
         raise APIError.from_exception(e, default_message="Failed to evaluate answer")
 
+@questions_bp.route('/evaluate-batch', methods=['POST'])
+@login_required
+def evaluate_answers():
+    """Evaluate a whole quiz's answers and update SRS data in one transaction"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            raise APIError("Missing request data", code=400)
+            
+        answers = data.get('answers')
+        if not isinstance(answers, list) or not answers:
+            raise APIError("Missing answers parameter", code=400)
+            
+        if len(answers) > MAX_BATCH_ANSWERS:
+            raise APIError(f"At most {MAX_BATCH_ANSWERS} answers can be evaluated at once", code=400)
+            
+        if any(not isinstance(item, dict) or not isinstance(item.get('question_id'), int) or 'answer' not in item
+               for item in answers):
+            raise APIError("Each answer needs a question_id and an answer", code=400)
+        
+        # Get question generator from service container
+        question_generator = current_app.services.get('question_generator')
+        if not question_generator:
+            raise APIError("Question evaluation service unavailable", code=503)
+        
+        # Load all of the user's answered questions in one query
+        question_ids = {item['question_id'] for item in answers}
+        questions = {
+            question.id: question
+            for question in Question.query.filter(Question.id.in_(question_ids), Question.user_id == current_user.id)
+        }
+        
+        graded = [(questions[item['question_id']], str(item['answer']))
+                  for item in answers if item['question_id'] in questions]
+        evaluations = iter(question_generator.evaluate_answers(graded))
+        
+        # Apply SRS updates and commit once for the whole quiz
+        scheduler = current_app.services.get('srs_scheduler')
+        results = []
+        reviews = []
+        for item in answers:
+            question = questions.get(item['question_id'])
+            if not question:
+                results.append({'question_id': item['question_id'], 'error': 'Question not found or unauthorized'})
+                continue
+                
+            evaluation = next(evaluations)
+            if 'is_correct' in evaluation:
+                review = question.update_srs_data(evaluation['is_correct'], scheduler=scheduler, commit=False)
+                reviews.append(review_log_row(review, evaluation, item.get('latency_ms')))
+            results.append(dict(evaluation, question_id=question.id))
+        db.session.commit()
+        record_reviews(reviews)
+        
+        correct = sum(1 for result in results if result.get('is_correct'))
+        log_api_access("evaluate_answers", True, {"count": len(results), "correct": correct})
+        
+        return jsonify({
+            'results': results,
+            'correct': correct,
+            'count': len(results)
+        }), 200
+        
+    except APIError:
+        # Re-raise APIError to be handled by the global handler
+        raise
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error evaluating answers")
+        log_api_access("evaluate_answers", False)
+        raise APIError.from_exception(e, default_message="Failed to evaluate answers")
+
 @questions_bp.route('/due-for-review', methods=['GET'])
 @login_required
 def get_due_questions():
@@ -179,16 +274,9 @@ def get_due_questions():
                 
             query = query.filter_by(document_id=document_id)
         
-        # Order by priority with proper syntax:
-        # 1. Never answered questions first
-        # 2. Then questions with lower success rates
-        query = query.order_by(
-            # CASE expression to prioritize never answered questions
-            db.case((Question.times_answered == 0, 0), else_=1),
-            # Use a calculated column for success rate - use CASE instead of greatest for SQLite compatibility
-            (db.func.cast(Question.times_correct, db.Float) / 
-             db.case((Question.times_answered < 1, 1), else_=Question.times_answered)).asc()
-        )
+        # Order by the stored priority (never answered first, then lower success rates),
+        # most overdue first within a priority; the review indexes return rows in this order
+        query = query.order_by(Question.review_priority, Question.next_review)
         
         # Limit results
         questions = query.limit(limit).all()
@@ -208,6 +296,40 @@ def get_due_questions():
         log_api_access("get_due_questions", False)
         raise APIError.from_exception(e, default_message="Failed to retrieve due questions")
 
+@questions_bp.route('/reschedule', methods=['POST'])
+@login_required
+def reschedule():
+    """Recompute review dates of the user's answered questions with the current scheduler settings"""
+    try:
+        data = request.get_json(silent=True) or {}
+        document_id = data.get('document_id')
+        
+        scheduler = current_app.services.get('srs_scheduler')
+        if not scheduler:
+            raise APIError("Scheduler service unavailable", code=503)
+        
+        if document_id:
+            document = Document.query.filter_by(id=document_id, user_id=current_user.id).first()
+            if not document:
+                raise APIError("Document not found", code=404)
+        
+        count = reschedule_questions(scheduler, current_user.id, document_id)
+        
+        log_api_access("reschedule_questions", True, {"count": count, "scheduler": scheduler.name})
+        
+        return jsonify({
+            'rescheduled': count,
+            'scheduler': scheduler.name
+        }), 200
+        
+    except APIError:
+        # Re-raise APIError to be handled by the global handler
+        raise
+    except Exception as e:
+        logger.exception("Error rescheduling questions")
+        log_api_access("reschedule_questions", False)
+        raise APIError.from_exception(e, default_message="Failed to reschedule questions")
+
 @questions_bp.route('/by-difficulty', methods=['GET'])
 @login_required
 def get_questions_by_difficulty():
@@ -336,7 +458,8 @@ def generate_questions_for_document(document_id):
         # Generate questions
         logger.info(f"Generating questions of type {question_type} with difficulties {difficulty_levels} for document {document_id}")
         questions, error = question_generator.generate_questions_for_document(
-            document_id, current_user.id, question_type, count, difficulty_levels
+            document_id, current_user.id, question_type, count, difficulty_levels,
+            use_cache=response_cache_allowed(data)
         )
         
         if error:
@@ -346,6 +469,10 @@ def generate_questions_for_document(document_id):
         if not questions:
             logger.warning(f"No questions generated for document {document_id}")
             raise APIError("Failed to generate questions from document content", code=400)
+        
+        # Refill the document's question pool in the background
+        if current_app.config.get('QUESTION_POOL'):
+            question_generator.schedule_pool_top_up(current_app._get_current_object(), document_id)
             
         log_api_access("generate_questions", True, {
             "document_id": document_id,
@@ -454,4 +581,15 @@ def save_questions():
     except Exception as e:
         logger.exception("Error saving questions")
         log_api_access("save_questions", False)
-        raise APIError.from_exception(e, default_message="Failed to save questions")
\ No newline at end of file
+        raise APIError.from_exception(e, default_message="Failed to save questions")
+
+@questions_bp.route('/cache/stats', methods=['GET'])
+@login_required
+def get_question_cache_stats():
+    """Get hit rate and size of the shared question cache"""
+    question_cache = current_app.services.get('question_cache')
+    if not question_cache:
+        raise APIError("Question cache unavailable", code=503)
+    
+    log_api_access("get_question_cache_stats", True)
+    return jsonify(question_cache.stats()), 200
@@ -2,9 +2,12 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 
 from app import db
-from app.models.document import StudySession, StudyPlan
+from app.models.document import StudySession, StudyPlan, StudyDay
 from app.services.study_assistant import StudyAssistant
+from app.services.study_stats import get_study_stats
+from app.utils.streaming import sse_response, wants_stream
 from datetime import datetime, timedelta
+import time
 from sqlalchemy.sql import text
 
 study_bp = Blueprint('study', __name__, url_prefix='/api/study')
@@ -20,7 +23,8 @@ def setup_services():
 @study_bp.route('/chat', methods=['POST'])
 @login_required
 def chat():
-    """Chat with the study assistant"""
+    """Chat with the study assistant (streamed as server-sent events when stream is true)"""
+    started = time.perf_counter()
     data = request.get_json()
     
     if not data or not data.get('message'):
@@ -29,6 +33,22 @@ def chat():
     # Get chat history from the request
     chat_history = data.get('chat_history', [])
     
+    if wants_stream(data):
+        message = data.get('message')
+        
+        def update_history(response):
+            chat_history.append({'role': 'user', 'message': message})
+            chat_history.append({'role': 'assistant', 'message': response})
+            return {'chat_history': chat_history}
+        
+        return sse_response(
+            study_bp.study_assistant.stream_chat(message, chat_history),
+            "study_chat",
+            on_complete=update_history,
+            fallback=lambda: study_bp.study_assistant._get_chat_fallback(message),
+            started=started
+        )
+    
     # Chat with the assistant - now with fallback handling
     response, error, is_fallback = study_bp.study_assistant.chat(
         user_message=data.get('message'),
@@ -169,6 +189,7 @@ def start_study_session():
     
     try:
         db.session.add(session)
+        session.count_start()
         db.session.commit()
         
         return jsonify({
@@ -225,6 +246,19 @@ def get_study_sessions():
         } for session in sessions]
     }), 200
 
+@study_bp.route('/stats', methods=['GET'])
+@login_required
+def get_study_statistics():
+    """Get aggregated study time, answers and streaks for the current user"""
+    days = request.args.get('days', 30, type=int)
+    if days < 1 or days > 366:
+        return jsonify({'error': 'days must be between 1 and 366'}), 400
+    
+    try:
+        return jsonify(get_study_stats(current_user.id, days)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @study_bp.route('/sessions/<int:session_id>', methods=['DELETE'])
 @login_required
 def delete_study_session(session_id):
@@ -235,6 +269,7 @@ def delete_study_session(session_id):
         return jsonify({'error': 'Study session not found'}), 404
     
     try:
+        session.remove_from_rollups()
         db.session.delete(session)
         db.session.commit()
         return jsonify({'message': 'Study session deleted successfully'}), 200
@@ -248,6 +283,8 @@ def clear_all_sessions():
     """Delete all study sessions for the current user"""
     try:
         StudySession.query.filter_by(user_id=current_user.id).delete()
+        # Answer counts in the rollups come from the review log and stay
+        StudyDay.query.filter_by(user_id=current_user.id).update({'study_seconds': 0, 'sessions': 0})
         db.session.commit()
         return jsonify({'message': 'All study sessions cleared successfully'}), 200
     except Exception as e:
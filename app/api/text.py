@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 
 from app.services.text_processor import TextProcessor
+from app.utils.api_utils import response_cache_allowed
+from app.utils.streaming import sse_response, wants_stream
+import time
 
 text_bp = Blueprint('text', __name__, url_prefix='/api/text')
 
@@ -10,13 +13,16 @@ text_bp = Blueprint('text', __name__, url_prefix='/api/text')
 def setup_services():
     if not hasattr(text_bp, 'text_processor'):
         text_bp.text_processor = TextProcessor(
-            api_key=current_app.config['ANTHROPIC_API_KEY']
+            api_key=current_app.config['ANTHROPIC_API_KEY'],
+            response_cache=current_app.services.get('response_cache'),
+            single_flight=current_app.services.get('single_flight')
         )
 
 @text_bp.route('/summarize', methods=['POST'])
 @login_required
 def summarize_text():
-    """Summarize text"""
+    """Summarize text (streamed as server-sent events when stream is true)"""
+    started = time.perf_counter()
     data = request.get_json()
     
     if not data or not data.get('text'):
@@ -34,11 +40,22 @@ def summarize_text():
     if format not in ['paragraph', 'bullets']:
         return jsonify({'error': 'Invalid format, must be "paragraph" or "bullets"'}), 400
     
+    if wants_stream(data):
+        chunks, error = text_bp.text_processor.stream_summarize(text=text, length=length, format=format)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        return sse_response(chunks, "summarize_text", started=started, on_complete=lambda summary: {
+            'original_length': len(text),
+            'summary_length': len(summary)
+        })
+    
     # Summarize the text
     summary, error = text_bp.text_processor.summarize(
         text=text,
         length=length,
-        format=format
+        format=format,
+        use_cache=response_cache_allowed(data)
     )
     
     if error:
@@ -60,7 +77,7 @@ def correct_text():
         return jsonify({'error': 'No text provided'}), 400
     
     # Correct the text
-    corrected, error, corrections = text_bp.text_processor.correct_text(data.get('text'))
+    corrected, error, corrections = text_bp.text_processor.correct_text(data.get('text'), use_cache=response_cache_allowed(data))
     
     if error:
         return jsonify({'error': error}), 400
@@ -91,7 +108,8 @@ def rephrase_text():
     # Rephrase the text
     rephrased, error = text_bp.text_processor.rephrase_text(
         text=text,
-        style=style
+        style=style,
+        use_cache=response_cache_allowed(data)
     )
     
     if error:
@@ -123,7 +141,8 @@ def explain_text():
     # Explain the text
     explanation, error = text_bp.text_processor.explain_text(
         text=text,
-        level=level
+        level=level,
+        use_cache=response_cache_allowed(data)
     )
     
     if error:
@@ -43,16 +43,103 @@ class Config:
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
     ALLOWED_IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp'}
     
+    # Extracted text store (compressed blobs keyed by file SHA-256)
+    TEXT_STORE_FOLDER = os.environ.get('TEXT_STORE_FOLDER') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'text_store')
+    
     # Cache settings
     CACHE_TYPE = 'simple'
     CACHE_DEFAULT_TIMEOUT = 300
     
     # Memory management
-    EMBED_BATCH_SIZE = 5
+    EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', 5))  # Texts per embeddings request
+    EMBED_BATCH_TOKENS = int(os.environ.get('EMBED_BATCH_TOKENS', 8000))  # Estimated tokens per embeddings request
+    EMBED_MAX_IN_FLIGHT = int(os.environ.get('EMBED_MAX_IN_FLIGHT', 4))  # Concurrent embeddings requests per process
+    EMBED_MAX_RETRIES = int(os.environ.get('EMBED_MAX_RETRIES', 5))
     MAX_CHUNK_SIZE = 300
     MAX_OVERLAP = 50
     MAX_TEXT_LENGTH = 100000  # Increased from 50000 to 100000
-    MAX_PDF_PAGES = 50  # Increased from 10 to 50
+    MAX_PDF_PAGES = 50  # Increased from 10 to 50, 0 disables the limit
+    PDF_EXTRACTION_MODE = os.environ.get('PDF_EXTRACTION_MODE', 'process')  # process, thread or serial
+    PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', 4))
+    
+    # FAISS index selection
+    FAISS_INDEX_TYPE = os.environ.get('FAISS_INDEX_TYPE', 'auto')  # auto, flat, hnsw or ivf
+    FAISS_COMPRESSION = os.environ.get('FAISS_COMPRESSION', 'none')  # none, sq8 or pq
+    FAISS_FLAT_MAX_VECTORS = int(os.environ.get('FAISS_FLAT_MAX_VECTORS', 1024))  # auto uses exact search up to this size
+    
+    # Document chat context: auto (whole text for short documents), retrieval or full
+    CHAT_CONTEXT_MODE = os.environ.get('CHAT_CONTEXT_MODE', 'auto')
+    CHAT_CONTEXT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', 3000))  # Budget for retrieved excerpts
+    CHAT_RETRIEVAL_TOP_K = int(os.environ.get('CHAT_RETRIEVAL_TOP_K', 8))
+    CHAT_HISTORY_MESSAGES = int(os.environ.get('CHAT_HISTORY_MESSAGES', 10))  # Most recent history messages sent
+    
+    # Question generation fans out over chunks, several questions per model call
+    QUESTION_GEN_CONCURRENCY = int(os.environ.get('QUESTION_GEN_CONCURRENCY', 4))  # Concurrent calls per process
+    QUESTIONS_PER_CALL = int(os.environ.get('QUESTIONS_PER_CALL', 3))
+    # Chunks are picked by clustering their stored vectors; pairs at least this similar count as duplicates
+    QUESTION_DUPLICATE_SIMILARITY = float(os.environ.get('QUESTION_DUPLICATE_SIMILARITY', 0.95))
+    
+    # Generated questions are cached in the database by chunk text, question type and difficulty
+    QUESTION_CACHE = os.environ.get('QUESTION_CACHE', '1') == '1'
+    QUESTION_CACHE_PER_KEY = int(os.environ.get('QUESTION_CACHE_PER_KEY', 6))  # Candidates kept per key
+    QUESTION_CACHE_TTL = int(os.environ.get('QUESTION_CACHE_TTL', 30 * 24 * 3600))  # Seconds since last served
+    QUESTION_CACHE_MAX_ENTRIES = int(os.environ.get('QUESTION_CACHE_MAX_ENTRIES', 200000))
+    
+    # Question pool pre-generated into the question cache at ingest and topped up after each quiz
+    QUESTION_POOL = os.environ.get('QUESTION_POOL', '0') == '1'
+    QUESTION_POOL_CHUNKS = int(os.environ.get('QUESTION_POOL_CHUNKS', 8))  # Chunks covered per document
+    QUESTION_POOL_PER_DIFFICULTY = int(os.environ.get('QUESTION_POOL_PER_DIFFICULTY', 1))  # Per chunk, type and difficulty
+    QUESTION_POOL_TYPES = os.environ.get('QUESTION_POOL_TYPES', 'mcq,qa,true_false,fill_in_blank').split(',')
+    QUESTION_POOL_MAX_CALLS = int(os.environ.get('QUESTION_POOL_MAX_CALLS', 24))  # Upstream budget per document
+    
+    # Spaced-repetition scheduler engine: fsrs or sm2
+    SRS_SCHEDULER = os.environ.get('SRS_SCHEDULER', 'fsrs')
+    SRS_DESIRED_RETENTION = float(os.environ.get('SRS_DESIRED_RETENTION', 0.9))  # FSRS recall probability at review
+    SRS_MAXIMUM_INTERVAL = int(os.environ.get('SRS_MAXIMUM_INTERVAL', 365))  # Days
+    SRS_FSRS_WEIGHTS = [float(w) for w in os.environ.get('SRS_FSRS_WEIGHTS', '').split(',') if w.strip()] or None
+    
+    # Review log rows are buffered and written in batches off the request path
+    REVIEW_LOG_BATCH_SIZE = int(os.environ.get('REVIEW_LOG_BATCH_SIZE', 500))
+    REVIEW_LOG_FLUSH_INTERVAL = float(os.environ.get('REVIEW_LOG_FLUSH_INTERVAL', 2))  # Seconds
+    REVIEW_LOG_MAX_BUFFER = int(os.environ.get('REVIEW_LOG_MAX_BUFFER', 50000))  # Oldest rows dropped beyond this
+    
+    # Embedding backend: remote (embeddings API) or local (hashed n-grams, no network)
+    EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'remote')
+    LOCAL_EMBEDDING_DIM = int(os.environ.get('LOCAL_EMBEDDING_DIM', 1024))
+    
+    # Embedding cache (memory LRU plus an optional SQLite tier shared across workers, empty path disables it)
+    EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get('EMBEDDING_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'embedding_cache.sqlite'))
+    
+    # Loaded FAISS index cache
+    INDEX_CACHE_MAX_BYTES = int(os.environ.get('INDEX_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    INDEX_MMAP_THRESHOLD = int(os.environ.get('INDEX_MMAP_THRESHOLD', 64 * 1024 * 1024))  # 0 disables mmap loading
+    
+    # Shared HTTP client for model API calls (pooled keep-alive connections)
+    UPSTREAM_POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 32))  # Connections kept per host
+    UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5))
+    UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 60))  # Default when a call sets none
+    UPSTREAM_MAX_RETRIES = int(os.environ.get('UPSTREAM_MAX_RETRIES', 2))  # Connection errors, 429 and 5xx
+    PROMPT_CACHING = os.environ.get('PROMPT_CACHING', '1') == '1'  # Mark repeated document context as cacheable upstream
+    
+    # Model response cache for summaries, text tools and OCR (SQLite shared across workers, empty path disables it)
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'response_cache.sqlite'))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 7 * 24 * 3600))  # Seconds
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    
+    # Identical concurrent model calls share one upstream request (SQLite file coordinates workers on the host,
+    # empty path coalesces within each worker only)
+    SINGLE_FLIGHT_PATH = os.environ.get('SINGLE_FLIGHT_PATH', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'single_flight.sqlite'))
+    SINGLE_FLIGHT_WAIT = int(os.environ.get('SINGLE_FLIGHT_WAIT', 120))  # Seconds to wait on another caller's call
+    
+    # Background document ingestion
+    INGEST_ASYNC = os.environ.get('INGEST_ASYNC', '1') == '1'  # Process uploads off the request thread
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+    INGEST_EMBED = os.environ.get('INGEST_EMBED', '1') == '1'  # Build the search index after chunking
     
     # Error logging
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT')
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
 import os
 import json
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm.attributes import flag_modified
 from app import db
 
 class Document(db.Model):
@@ -11,6 +14,9 @@ class Document(db.Model):
     file_type = db.Column(db.String(10), nullable=False)  # pdf, docx, txt
     file_size = db.Column(db.Integer, nullable=False)  # in bytes
     file_path = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of the file, keys the text store
+    # Upstream calls spent filling the question pool, capped per document
+    question_pool_calls = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_accessed = db.Column(db.DateTime, nullable=True)
     
@@ -59,8 +65,64 @@ class DocumentChunk(db.Model):
         return f'<DocumentChunk {self.id} for Document {self.document_id}>'
 
 
+class IngestionJob(db.Model):
+    """Model for tracking background ingestion of an uploaded document"""
+    STAGES = ['extract', 'sanitize', 'chunk', 'persist', 'embed', 'questions']
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    stages = db.Column(db.JSON, nullable=True)  # Per-stage status, timings and counters
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    # Foreign keys
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<IngestionJob {self.id} for Document {self.document_id}>'
+    
+    @classmethod
+    def initial_stages(cls):
+        """Build the stage map for a new job"""
+        return {name: {'status': 'pending'} for name in cls.STAGES}
+    
+    def progress(self):
+        """Fraction of stages that have finished (completed, skipped or failed)"""
+        if self.status == 'completed':
+            # Jobs recorded before a stage was added never ran it
+            return 1.0
+        stages = self.stages or {}
+        done = sum(1 for name in self.STAGES
+                   if stages.get(name, {}).get('status') in ('completed', 'skipped', 'failed'))
+        return round(done / len(self.STAGES), 2)
+    
+    def to_dict(self):
+        """Convert job to dictionary for API responses"""
+        stages = self.stages or {}
+        return {
+            'id': self.id,
+            'document_id': self.document_id,
+            'status': self.status,
+            'progress': self.progress(),
+            'stages': [dict(stages.get(name, {}), name=name) for name in self.STAGES],
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
 class Question(db.Model):
     """Model for storing generated questions"""
+    __table_args__ = (
+        # Review queue order: scanned in priority order, due date checked in the index
+        db.Index('ix_question_user_review', 'user_id', 'review_priority', 'next_review'),
+        db.Index('ix_question_document_review', 'document_id', 'review_priority', 'next_review'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.Text, nullable=False)
     question_type = db.Column(db.String(15), nullable=False)  # mcq, qa, true_false, fill_in_blank
@@ -74,6 +136,13 @@ class Question(db.Model):
     times_answered = db.Column(db.Integer, default=0)
     times_correct = db.Column(db.Integer, default=0)
     next_review = db.Column(db.DateTime, nullable=True)
+    review_priority = db.Column(db.Float, nullable=False, default=0.0, server_default='0')  # Lower is reviewed first
+    
+    # Scheduler card state (see app.services.srs_scheduler)
+    srs_stability = db.Column(db.Float, nullable=True)  # Days, None until first scheduled
+    srs_difficulty = db.Column(db.Float, nullable=True)  # 1 (easy) to 10 (hard)
+    srs_reps = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Consecutive successful reviews
+    srs_lapses = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     content_hash = db.Column(db.String(64), nullable=True)  # For caching
     
     # Foreign keys
@@ -107,30 +176,145 @@ class Question(db.Model):
                 
         return result
     
-    def update_srs_data(self, correct_answer):
-        """Update SRS data based on answer correctness"""
-        self.last_answered = datetime.utcnow()
-        self.times_answered += 1
+    def update_srs_data(self, correct_answer, scheduler=None, grade=None, commit=True):
+        """Update SRS data based on answer correctness
+        
+        The card's stored state is advanced by the scheduler engine (the default
+        engine when none is given); grade (1 again to 4 easy) overrides the
+        again/good grade derived from correct_answer. Returns the review as a
+        review log row.
+        """
+        from app.services.srs_scheduler import AGAIN, GOOD, create_scheduler
+        scheduler = scheduler or create_scheduler()
+        
+        now = datetime.utcnow()
+        elapsed_days = (now - self.last_answered).total_seconds() / 86400 if self.last_answered else 0.0
+        self.last_answered = now
+        self.times_answered = (self.times_answered or 0) + 1
         
         if correct_answer:
-            self.times_correct += 1
-            
-        # Calculate next review time based on performance
-        success_rate = self.times_correct / max(1, self.times_answered)
-        
-        # Basic SRS algorithm - intervals expand with correct answers
-        if success_rate >= 0.8:
-            # User is doing well, longer interval
-            days_until_review = min(30, self.times_correct)
-        elif success_rate >= 0.5:
-            # User is doing okay, medium interval
-            days_until_review = 3
+            self.times_correct = (self.times_correct or 0) + 1
+        self.review_priority = self.priority_for(self.times_answered, self.times_correct)
+        
+        # Calculate next review time from the card's memory state
+        grade = grade or (GOOD if correct_answer else AGAIN)
+        self.srs_stability, self.srs_difficulty, self.srs_reps, self.srs_lapses, days_until_review = scheduler.review_one(
+            self.srs_stability, self.srs_difficulty, self.srs_reps, self.srs_lapses, grade, elapsed_days
+        )
+        self.next_review = now + timedelta(days=days_until_review)
+        if commit:
+            db.session.commit()
+        
+        return {
+            'question_id': self.id,
+            'user_id': self.user_id,
+            'document_id': self.document_id,
+            'reviewed_at': now,
+            'grade': grade,
+            'is_correct': bool(correct_answer),
+            'elapsed_days': elapsed_days,
+            'scheduled_days': days_until_review,
+            'stability': self.srs_stability,
+            'difficulty': self.srs_difficulty,
+            'scheduler': scheduler.name
+        }
+    
+    @staticmethod
+    def priority_for(times_answered, times_correct):
+        """Review priority: never answered questions first (0), then by success rate (1 to 2)"""
+        if not times_answered:
+            return 0.0
+        return 1.0 + (times_correct or 0) / times_answered
+
+
+class QuestionCandidate(db.Model):
+    """Generated question cached for reuse by every document whose chunk has the same text"""
+    __table_args__ = (
+        db.Index('ix_question_candidate_key', 'content_hash', 'question_type', 'difficulty'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # Hash of the chunk text, as in Question.content_hash
+    question_type = db.Column(db.String(15), nullable=False)
+    difficulty = db.Column(db.String(10), nullable=False)
+    data = db.Column(db.JSON, nullable=False)  # Parsed question: question, answer, options, explanation
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    times_served = db.Column(db.Integer, default=0)
+    
+    def __repr__(self):
+        return f'<QuestionCandidate {self.id} {self.question_type}/{self.difficulty}>'
+
+
+class ReviewLog(db.Model):
+    """Append-only record of each answered review, for analytics and scheduler fitting"""
+    __table_args__ = (
+        db.Index('ix_review_log_user_time', 'user_id', 'reviewed_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Plain ids, so the history outlives deleted questions and documents
+    question_id = db.Column(db.Integer, nullable=False, index=True)
+    document_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    reviewed_at = db.Column(db.DateTime, nullable=False)
+    grade = db.Column(db.SmallInteger, nullable=False)  # 1 again, 2 hard, 3 good, 4 easy
+    is_correct = db.Column(db.Boolean, nullable=False)
+    score = db.Column(db.Float, nullable=True)  # Evaluation score, scale depends on question type
+    latency_ms = db.Column(db.Integer, nullable=True)  # Time the user took to answer, when reported
+    elapsed_days = db.Column(db.Float, nullable=False)  # Since the previous review
+    scheduled_days = db.Column(db.Integer, nullable=False)  # Interval until the next review
+    stability = db.Column(db.Float, nullable=True)  # Card state after the review
+    difficulty = db.Column(db.Float, nullable=True)
+    scheduler = db.Column(db.String(10), nullable=True)
+    
+    def __repr__(self):
+        return f'<ReviewLog {self.id} question {self.question_id}>'
+
+
+class StudyDay(db.Model):
+    """Daily rollup of a user's study time, sessions and review answers per document (UTC days)"""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'document_id', name='uq_study_day_key'),
+    )
+    
+    COUNTERS = ('study_seconds', 'sessions', 'reviews', 'correct')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    document_id = db.Column(db.Integer, nullable=False, default=0)  # 0 for study not tied to a document
+    study_seconds = db.Column(db.Integer, nullable=False, default=0)  # Counted when sessions pause or end
+    sessions = db.Column(db.Integer, nullable=False, default=0)  # Sessions started
+    reviews = db.Column(db.Integer, nullable=False, default=0)  # Answers recorded in the review log
+    correct = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StudyDay {self.user_id} {self.day} {self.document_id}>'
+    
+    @classmethod
+    def add(cls, user_id, day, document_id=None, **counts):
+        """Add to a day's counters in the current transaction, creating the row if needed"""
+        key = {'user_id': user_id, 'day': day, 'document_id': document_id or 0}
+        values = {name: int(counts.get(name, 0)) for name in cls.COUNTERS}
+        
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            statement = insert(cls.__table__).values(**key, **values)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['user_id', 'day', 'document_id'],
+                set_={name: cls.__table__.c[name] + statement.excluded[name] for name in cls.COUNTERS}
+            ))
+            return
+        
+        row = cls.query.filter_by(**key).with_for_update().first()
+        if row is None:
+            db.session.add(cls(**key, **values))
+            db.session.flush()
         else:
-            # User needs more practice, short interval
-            days_until_review = 1
-            
-        self.next_review = datetime.utcnow() + timedelta(days=days_until_review)
-        db.session.commit()
+            for name, value in values.items():
+                setattr(row, name, getattr(row, name) + value)
 
 
 class StudySession(db.Model):
@@ -152,6 +336,7 @@ class StudySession(db.Model):
     def end_session(self):
         """End the study session"""
         self.end_time = datetime.utcnow()
+        self.roll_up()
         db.session.commit()
     
     def pause_session(self):
@@ -172,6 +357,7 @@ class StudySession(db.Model):
             'duration_seconds': int(self.calculate_duration() * 60) if self.calculate_duration() else 0  # Convert to seconds
         })
         
+        self.roll_up()
         db.session.commit()
         
         return self.end_time
@@ -191,6 +377,52 @@ class StudySession(db.Model):
         db.session.commit()
         return True
     
+    def count_start(self):
+        """Count the session in the daily rollup of the day it starts"""
+        day = (self.start_time or datetime.utcnow()).date()
+        StudyDay.add(self.user_id, day, self.document_id, sessions=1)
+        self._set_rollup(dict(self._rollup(), started=day.isoformat()))
+    
+    def roll_up(self):
+        """Add study time not counted yet to the daily rollups
+        
+        Called when end_time is set (pause or end). Resuming keeps the studied
+        time (end_time - start_time) unchanged, so the time added is what was
+        studied since the last pause, split at UTC midnights.
+        """
+        if not self.start_time or not self.end_time:
+            return
+        
+        rollup = self._rollup()
+        seconds_by_day = dict(rollup.get('seconds') or {})
+        remaining = int((self.end_time - self.start_time).total_seconds()) - sum(seconds_by_day.values())
+        
+        span_end = self.end_time
+        while remaining > 0:
+            day = (span_end - timedelta(microseconds=1)).date()
+            part = min(remaining, max(1, int((span_end - datetime.combine(day, datetime.min.time())).total_seconds())))
+            StudyDay.add(self.user_id, day, self.document_id, study_seconds=part)
+            seconds_by_day[day.isoformat()] = seconds_by_day.get(day.isoformat(), 0) + part
+            remaining -= part
+            span_end -= timedelta(seconds=part)
+        
+        self._set_rollup(dict(rollup, seconds=seconds_by_day))
+    
+    def remove_from_rollups(self):
+        """Take the session's counted time and start out of the daily rollups before it is deleted"""
+        rollup = self._rollup()
+        for day, seconds in (rollup.get('seconds') or {}).items():
+            StudyDay.add(self.user_id, datetime.fromisoformat(day).date(), self.document_id, study_seconds=-seconds)
+        if rollup.get('started'):
+            StudyDay.add(self.user_id, datetime.fromisoformat(rollup['started']).date(), self.document_id, sessions=-1)
+    
+    def _rollup(self):
+        return (self.session_metadata or {}).get('rollup') or {}
+    
+    def _set_rollup(self, rollup):
+        self.session_metadata = dict(self.session_metadata or {}, rollup=rollup)
+        flag_modified(self, 'session_metadata')
+    
     def calculate_duration(self):
         """Calculate the duration of the study session in minutes"""
         if self.end_time:
@@ -0,0 +1,155 @@
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.models.document import DocumentChunk
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+CHAT_CONTEXT_MODES = ('auto', 'retrieval', 'full')
+
+# Full mode keeps the historical cap on document text per turn
+FULL_CONTEXT_MAX_CHARS = 100000
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from had has have how i if in into is it its "
+    "me my of on or so than that the their them then there these they this to was we were what "
+    "when where which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r'\w+', text.lower()) if token not in _STOPWORDS]
+
+
+def rank_chunks_bm25(chunks: List[Tuple[int, str]], query: str, k1=1.5, b=0.75) -> List[Tuple[int, str, float]]:
+    """Rank (chunk_id, text) pairs against a query with BM25, best first, dropping non-matches"""
+    query_terms = set(_tokenize(query))
+    if not chunks or not query_terms:
+        return []
+
+    tokenized = [_tokenize(text) for _, text in chunks]
+    average_length = sum(len(tokens) for tokens in tokenized) / len(tokenized) or 1
+    document_frequency = Counter(term for tokens in tokenized for term in set(tokens) & query_terms)
+
+    ranked = []
+    for (chunk_id, text), tokens in zip(chunks, tokenized):
+        frequencies = Counter(tokens)
+        score = 0.0
+        for term in query_terms:
+            frequency = frequencies.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(chunks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * len(tokens) / average_length))
+        if score > 0:
+            ranked.append((chunk_id, text, score))
+
+    ranked.sort(key=lambda item: item[2], reverse=True)
+    return ranked
+
+
+class ChatContextBuilder:
+    """Builds the document context and history sent with each document chat turn
+
+    In retrieval mode only the chunks most relevant to the question are sent,
+    packed into a token budget: semantic search when the document already
+    has an index, BM25 over its chunks otherwise. Auto mode sends short
+    documents whole and uses retrieval for the rest. Full mode sends the
+    whole text as before.
+    """
+
+    def __init__(self, document_processor, embeddings_service=None, mode='auto', max_context_tokens=3000,
+                 top_k=8, max_history_messages=10):
+        self.document_processor = document_processor
+        self.embeddings_service = embeddings_service
+        self.mode = mode if mode in CHAT_CONTEXT_MODES else 'auto'
+        self.max_context_tokens = max_context_tokens
+        self.top_k = top_k
+        self.max_history_messages = max_history_messages
+        logger.info(f"Initialized ChatContextBuilder in {self.mode} mode with {max_context_tokens} token budget")
+
+    def build(self, document, question: str, chat_history: Optional[List[Dict]] = None,
+              mode: Optional[str] = None) -> Tuple[str, List[Dict], Dict]:
+        """Get (context text, trimmed history, info) for one chat turn
+
+        Returns empty context text when the document text can't be read.
+        """
+        mode = mode or self.mode
+        history = self.trim_history(chat_history)
+
+        text = self.document_processor._extract_document_text(document)
+        if not text:
+            return "", history, {'mode': mode, 'characters': 0}
+
+        if mode == 'full' or (mode == 'auto' and estimate_tokens(text) <= self.max_context_tokens):
+            return self._full_context(text, history)
+
+        # Follow-up questions often lean on the previous one
+        previous_questions = [message.get('message', '') for message in history if message.get('role') == 'user']
+        query = ' '.join(previous_questions[-1:] + [question])
+
+        ranked, source = self._rank(document.id, query)
+        if not ranked:
+            logger.info(f"No relevant chunks found for document {document.id}, sending full text")
+            context, history, info = self._full_context(text, history)
+            info['fallback'] = True
+            return context, history, info
+
+        # Pack the best chunks into the budget, then restore document order
+        # (chunk ids increase with position in the document)
+        selected = []
+        used_tokens = 0
+        for chunk_id, chunk_text, _ in ranked:
+            tokens = estimate_tokens(chunk_text)
+            if selected and used_tokens + tokens > self.max_context_tokens:
+                continue
+            selected.append((chunk_id, chunk_text))
+            used_tokens += tokens
+        selected.sort()
+
+        context = "\n\n".join(f"[Excerpt {i + 1}]\n{chunk_text}" for i, (_, chunk_text) in enumerate(selected))
+        return context, history, {
+            'mode': 'retrieval',
+            'source': source,
+            'chunks': len(selected),
+            'characters': len(context),
+            'estimated_tokens': estimate_tokens(context),
+            'document_characters': len(text)
+        }
+
+    def trim_history(self, chat_history: Optional[List[Dict]]) -> List[Dict]:
+        """Keep only the most recent history messages"""
+        if not chat_history:
+            return []
+        return list(chat_history[-self.max_history_messages:]) if self.max_history_messages else list(chat_history)
+
+    def _full_context(self, text, history):
+        context = text[:FULL_CONTEXT_MAX_CHARS]
+        return context, history, {
+            'mode': 'full',
+            'characters': len(context),
+            'estimated_tokens': estimate_tokens(context),
+            'document_characters': len(text)
+        }
+
+    def _rank(self, document_id, query) -> Tuple[List[Tuple[int, str, float]], str]:
+        # Semantic search only when an index is already built; building one
+        # inline would put a full embedding pass on the chat request
+        if self.embeddings_service and self.embeddings_service.has_index(document_id):
+            results, error = self.embeddings_service.search_document(document_id, query, top_k=self.top_k)
+            if results:
+                return [(result['chunk_id'], result['text'], result['score']) for result in results], 'semantic'
+            logger.warning(f"Semantic search failed for document {document_id}, using lexical ranking: {error}")
+
+        chunks = DocumentChunk.query.with_entities(DocumentChunk.id, DocumentChunk.chunk_text)\
+            .filter_by(document_id=document_id).all()
+        return rank_chunks_bm25(chunks, query)[:self.top_k], 'lexical'
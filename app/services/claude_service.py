@@ -1,27 +1,33 @@
 import base64
-import requests
 import logging
 import json
 from typing import Dict, List, Tuple, Optional, Any
 
+from app.utils.http_client import get_http_client
+from app.utils.streaming import stream_message_text
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
 class ClaudeService:
     """Service for interacting with Claude API, including vision capabilities"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, prompt_caching=True, response_cache=None, single_flight=None):
         self.api_key = api_key
         self.claude_api_url = "https://api.anthropic.com/v1/messages"
-        self.headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        logger.info("Initialized ClaudeService with Claude API")
+        self.prompt_caching = prompt_caching
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        logger.info(f"Initialized ClaudeService with Claude API, prompt caching {'on' if prompt_caching else 'off'}")
     
-    def _call_claude_api(self, messages, system_prompt=None, max_tokens=2000, temperature=0.7, model="claude-3-opus-20240229"):
-        """Make an API call to Claude API"""
+    def _call_claude_api(self, messages, system_prompt=None, max_tokens=2000, temperature=0.7, model="claude-3-opus-20240229",
+                         cache_operation=None, use_cache=True):
+        """Make an API call to Claude API
+        
+        With cache_operation set, identical requests are answered from the
+        response cache (unless use_cache is False) and counted under that name.
+        Identical requests already in flight share one upstream call.
+        """
         # Prepare payload
         payload = {
             "model": model,
@@ -37,20 +43,47 @@ class ClaudeService:
         # Log API request (without sensitive data)
         logger.debug(f"Making Claude API request with {len(messages)} messages, system prompt: {bool(system_prompt)}")
         
-        # Make API call
-        response = requests.post(self.claude_api_url, json=payload, headers=self.headers, timeout=30)
+        call = lambda: self._post(payload)
+        if self.single_flight:
+            call = lambda: self.single_flight.fetch(cache_operation or 'claude_service', payload, lambda: self._post(payload))
+        
+        if cache_operation and self.response_cache:
+            return self.response_cache.fetch(cache_operation, payload, call, use_cache)
+        return call()
+    
+    def _post(self, payload):
+        """Send a payload to the Claude API and return the decoded response"""
+        response = get_http_client().post(self.claude_api_url, json=payload, api_key=self.api_key, timeout=30,
+                                          operation='claude_service')
         response.raise_for_status()  # Raise exception for 4XX/5XX status codes
         
         # Log successful response
         logger.debug(f"Successful API response, status: {response.status_code}")
         
-        return response.json()
+        result = response.json()
+        get_http_client().record_usage('claude_service', result.get('usage'))
+        return result
     
-    def process_image_ocr(self, image_data):
+    def _stream_claude_api(self, messages, system_prompt=None, max_tokens=2000, temperature=0.7, model="claude-3-opus-20240229"):
+        """Stream a Claude API call, yielding text as it is generated"""
+        payload = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": messages
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+
+        logger.debug(f"Streaming Claude API request with {len(messages)} messages, system prompt: {bool(system_prompt)}")
+        return stream_message_text(self.claude_api_url, payload, self.api_key, timeout=30, operation='claude_service')
+    
+    def process_image_ocr(self, image_data, use_cache=True):
         """Process an image with OCR using Claude Vision capabilities
         
         Args:
             image_data: Raw image bytes
+            use_cache: Whether an identical earlier request may be answered from the response cache
             
         Returns:
             Extracted text from the image
@@ -94,7 +127,9 @@ class ClaudeService:
                     system_prompt=system_prompt,
                     max_tokens=4000,  # Higher token limit for potentially long documents
                     temperature=0.2,  # Lower temperature for more accurate text extraction
-                    model="claude-3-opus-20240229"  # Using opus for best quality
+                    model="claude-3-opus-20240229",  # Using opus for best quality
+                    cache_operation='process_image_ocr',
+                    use_cache=use_cache
                 )
                 
                 # Extract text from response
@@ -122,53 +157,20 @@ class ClaudeService:
             logger.exception(f"Error processing image with OCR: {str(e)}")
             return self._fallback_local_ocr(image_data)
             
-    def chat_with_text(self, text, user_question, chat_history=None):
+    def chat_with_text(self, text, user_question, chat_history=None, excerpts=False):
         """Chat with text content using Claude
         
         Args:
             text: The text to chat about
             user_question: The user's question
             chat_history: Previous chat messages
+            excerpts: Whether text holds selected excerpts rather than the whole document
             
         Returns:
             Claude's response
         """
         try:
-            # Prepare system prompt
-            system_prompt = f"""You are a helpful AI assistant that answers questions about documents.
-Your answers should be based solely on the document content provided.
-If you don't know the answer or if the question is not related to the document content, say so politely.
-Keep your responses concise and directly answer the user's question."""
-            
-            # Prepare messages
-            messages = []
-            
-            # Initial context message with the document text
-            messages.append({
-                "role": "user",
-                "content": f"Here is the document content to reference when answering questions:\n\n{text[:100000]}"
-            })
-            
-            # Add AI acknowledgment
-            messages.append({
-                "role": "assistant",
-                "content": "I'll answer questions about this document."
-            })
-            
-            # Add chat history if provided
-            if chat_history:
-                for message in chat_history:
-                    role = "user" if message.get("role") == "user" else "assistant"
-                    messages.append({
-                        "role": role,
-                        "content": message.get("message", "")
-                    })
-            
-            # Add current user question
-            messages.append({
-                "role": "user",
-                "content": user_question
-            })
+            system_prompt, messages = self._chat_request(text, user_question, chat_history, excerpts)
             
             # Make API call
             result = self._call_claude_api(
@@ -189,35 +191,79 @@ Keep your responses concise and directly answer the user's question."""
         except Exception as e:
             logger.exception(f"Error in chat_with_text: {str(e)}")
             return f"I'm sorry, an error occurred: {str(e)}"
+    
+    def stream_chat_with_text(self, text, user_question, chat_history=None, excerpts=False):
+        """Like chat_with_text, but yields the response text as it is generated (raises on failure)"""
+        system_prompt, messages = self._chat_request(text, user_question, chat_history, excerpts)
+        return self._stream_claude_api(messages=messages, system_prompt=system_prompt, max_tokens=2000, temperature=0.7)
+    
+    def _chat_request(self, text, user_question, chat_history=None, excerpts=False):
+        """Build the (system prompt, messages) for a chat turn about a text"""
+        # Prepare system prompt
+        system_prompt = f"""You are a helpful AI assistant that answers questions about documents.
+Your answers should be based solely on the document content provided.
+If you don't know the answer or if the question is not related to the document content, say so politely.
+Keep your responses concise and directly answer the user's question."""
+        
+        # Prepare messages
+        messages = []
+        
+        # Initial context message with the document text
+        if excerpts:
+            context = f"Here are the excerpts of the document most relevant to my question, in document order:\n\n{text}"
+        else:
+            context = f"Here is the document content to reference when answering questions:\n\n{text[:100000]}"
+        context_block = {"type": "text", "text": context}
+        
+        # The system prompt and whole document are identical on every turn, so
+        # mark them as a cacheable prefix; excerpts change with each question
+        if self.prompt_caching and not excerpts:
+            context_block["cache_control"] = {"type": "ephemeral"}
+        messages.append({
+            "role": "user",
+            "content": [context_block]
+        })
+        
+        # Add AI acknowledgment
+        messages.append({
+            "role": "assistant",
+            "content": "I'll answer questions about this document."
+        })
+        
+        # Add chat history if provided
+        if chat_history:
+            for message in chat_history:
+                role = "user" if message.get("role") == "user" else "assistant"
+                messages.append({
+                    "role": role,
+                    "content": message.get("message", "")
+                })
+        
+        # Add current user question
+        messages.append({
+            "role": "user",
+            "content": user_question
+        })
+        return system_prompt, messages
             
-    def summarize_text(self, text):
+    def summarize_text(self, text, use_cache=True):
         """Summarize text content using Claude
         
         Args:
             text: The text to summarize
+            use_cache: Whether an identical earlier request may be answered from the response cache
             
         Returns:
             Summary of the text
         """
         try:
-            # Prepare messages
-            messages = [
-                {
-                    "role": "user",
-                    "content": f"""Please provide a comprehensive summary of the following text. 
-Capture the main points, key arguments, and important conclusions.
-Focus on the factual content without adding any new information.
-
-TEXT TO SUMMARIZE:
-{text[:100000]}"""
-                }
-            ]
-            
             # Make API call
             result = self._call_claude_api(
-                messages=messages,
+                messages=self._summary_messages(text),
                 max_tokens=2000,
-                temperature=0.3
+                temperature=0.3,
+                cache_operation='summarize_text',
+                use_cache=use_cache
             )
             
             # Extract summary
@@ -231,6 +277,24 @@ TEXT TO SUMMARIZE:
         except Exception as e:
             logger.exception(f"Error in summarize_text: {str(e)}")
             return f"Error generating summary: {str(e)}"
+    
+    def stream_summarize_text(self, text):
+        """Like summarize_text, but yields the summary as it is generated (raises on failure)"""
+        return self._stream_claude_api(messages=self._summary_messages(text), max_tokens=2000, temperature=0.3)
+    
+    def _summary_messages(self, text):
+        """Build the messages for summarizing a text"""
+        return [
+            {
+                "role": "user",
+                "content": f"""Please provide a comprehensive summary of the following text. 
+Capture the main points, key arguments, and important conclusions.
+Focus on the factual content without adding any new information.
+
+TEXT TO SUMMARIZE:
+{text[:100000]}"""
+            }
+        ]
 
     def _fallback_local_ocr(self, image_data):
         """Fallback to local OCR processing if Claude Vision fails
@@ -1,7 +1,8 @@
-import requests
 import logging
 from typing import Tuple, Optional
 
+from app.utils.http_client import get_http_client
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -25,13 +26,8 @@ def summarize_document_with_claude(api_key: str, text: str, max_length: int = 10
     try:
         logger.info(f"Summarizing document of length {len(text)}")
         
-        # API endpoint and headers
+        # API endpoint
         api_url = "https://api.anthropic.com/v1/messages"
-        headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
         
         # Create prompt for document summarization
         prompt = f"""
@@ -56,7 +52,7 @@ SUMMARY:
         }
         
         # Make API call
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = get_http_client().post(api_url, json=payload, api_key=api_key, operation='claude_summarize')
         response.raise_for_status()
         result = response.json()
         
@@ -1,22 +1,19 @@
-import requests
 import logging
 from flask import current_app
 from typing import Dict, List, Tuple, Optional
 
+from app.utils.http_client import get_http_client
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
 class DocumentChatbot:
     """ChatBot for interacting with document content using Claude API"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, prompt_caching=True):
         self.api_key = api_key
         self.claude_api_url = "https://api.anthropic.com/v1/messages"
-        self.headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
+        self.prompt_caching = prompt_caching
         logger.info("Initialized DocumentChatbot with Claude API")
     
     def chat_with_document(self, document_text: str, user_question: str, 
@@ -43,56 +40,43 @@ class DocumentChatbot:
                 logger.warning(f"Document too long ({len(document_text)} chars), truncating to {max_length}")
                 document_text = document_text[:max_length]
             
-            # Prepare the user message with context
-            context_message = f"""Here is the document content:
+            # Start every turn with the same document context so the prefix
+            # can be served from the upstream prompt cache on later turns
+            first_user_msg = f"""Here is the document content:
 
 {document_text}
 
-Based only on the document above, please answer this question: {user_question}"""
+Please refer to this document to answer my questions."""
+            context_block = {"type": "text", "text": first_user_msg}
+            if self.prompt_caching:
+                context_block["cache_control"] = {"type": "ephemeral"}
             
-            # Prepare messages array - starting with just a user message (no system message)
             messages = [
-                {"role": "user", "content": context_message}
+                {"role": "user", "content": [context_block]},
+                {"role": "assistant", "content": "I've reviewed the document and I'm ready to answer your questions based solely on its content."}
             ]
             
-            # Add minimal chat history if provided (only the most recent exchanges)
-            if chat_history and len(chat_history) > 0:
-                # Only use the last 2 exchanges to keep token count low
-                recent_history = chat_history[-4:] if len(chat_history) > 4 else chat_history
-                
-                # Clear messages and start with just context for the first message
-                if len(recent_history) > 0:
-                    messages = []
-                    
-                    # First add the document context
-                    first_user_msg = f"""Here is the document content:
-
-{document_text}
-
-Please refer to this document to answer my questions."""
-                    messages.append({"role": "user", "content": first_user_msg})
-                    messages.append({"role": "assistant", "content": "I've reviewed the document and I'm ready to answer your questions based solely on its content."})
-                    
-                    # Then add recent history
-                    for message in recent_history:
-                        role = "user" if message.get("role") == "user" else "assistant"
-                        content = message.get("message", "")
-                        # Skip empty messages
-                        if not content.strip():
-                            continue
-                        # Truncate long messages
-                        if len(content) > 500:
-                            content = content[:500] + "... [truncated]"
-                        messages.append({
-                            "role": role,
-                            "content": content
-                        })
-                    
-                    # Add current question as a separate message
-                    messages.append({
-                        "role": "user",
-                        "content": user_question
-                    })
+            # Add minimal chat history if provided (only the last 2 exchanges to keep token count low)
+            recent_history = chat_history[-4:] if chat_history else []
+            for message in recent_history:
+                role = "user" if message.get("role") == "user" else "assistant"
+                content = message.get("message", "")
+                # Skip empty messages
+                if not content.strip():
+                    continue
+                # Truncate long messages
+                if len(content) > 500:
+                    content = content[:500] + "... [truncated]"
+                messages.append({
+                    "role": role,
+                    "content": content
+                })
+            
+            # Add current question as a separate message
+            messages.append({
+                "role": "user",
+                "content": f"Based only on the document above, please answer this question: {user_question}"
+            })
             
             # Prepare payload with a simpler, reliable model
             payload = {
@@ -106,7 +90,8 @@ Please refer to this document to answer my questions."""
             logger.debug(f"Sending request to Claude API with {len(messages)} messages")
             
             # Make API call
-            response = requests.post(self.claude_api_url, json=payload, headers=self.headers)
+            response = get_http_client().post(self.claude_api_url, json=payload, api_key=self.api_key,
+                                              operation='document_chatbot')
             
             # Log the response status and some details without exposing sensitive data
             logger.debug(f"Claude API response status: {response.status_code}")
@@ -118,6 +103,7 @@ Please refer to this document to answer my questions."""
                 
             # Continue if successful
             result = response.json()
+            get_http_client().record_usage('document_chatbot', result.get('usage'))
             
             # Extract response
             if 'content' in result and len(result['content']) > 0:
@@ -4,27 +4,104 @@ import os
 import uuid
 import re
 import logging
-import requests
 from werkzeug.utils import secure_filename
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import html
 import base64
 import json
 from io import BytesIO
 
 from app import db
-from app.models.document import Document, DocumentChunk, Question
+from app.models.document import Document, DocumentChunk, Question, IngestionJob
+from app.services.text_store import ExtractedTextStore
+from app.utils.http_client import get_http_client
+from app.utils.streaming import stream_message_text
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+PDF_EXTRACTION_MODES = ('process', 'thread', 'serial')
+
+
+def _extract_pdf_page_range(file_path, start, end):
+    """Extract text from pages [start, end) of a PDF
+    
+    Runs in a pool worker, so it opens its own reader instead of sharing one
+    across workers (PdfReader is not thread-safe and cannot be pickled).
+    """
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f, strict=False)
+        return [_extract_page_text(pdf_reader, page_num) for page_num in range(start, end)]
+
+
+def _extract_page_text(pdf_reader, page_num):
+    """Extract text from a single PDF page with improved error handling"""
+    try:
+        page = pdf_reader.pages[page_num]
+        extracted_text = page.extract_text() or ""
+        
+        # Additional cleaning for better quality
+        extracted_text = extracted_text.replace('\n\n', '\n').strip()
+        
+        # Check if the text contains actual content (not just whitespace or common PDF artifacts)
+        if len(extracted_text.strip()) < 10:
+            # Try alternate extraction method
+            extracted_text = _extract_page_text_alternate(page) or ""
+            
+        return extracted_text
+    except Exception as e:
+        logger.warning(f"Failed to extract text from page {page_num}: {e}")
+        return ""
+
+
+def _extract_page_text_alternate(page):
+    """Alternative method to extract text from a PDF page when the primary method fails"""
+    try:
+        # Try to extract text using a different approach (accessing raw stream data)
+        if '/Contents' in page and hasattr(page['/Contents'], 'get_data'):
+            data = page['/Contents'].get_data()
+            if data:
+                # Simple text extraction from content stream
+                text = ""
+                data_str = data.decode('latin-1', errors='replace')
+                pattern = r'\((.*?)\)'
+                matches = re.findall(pattern, data_str)
+                if matches:
+                    text = " ".join(matches)
+                    return text
+        return ""
+    except Exception as e:
+        logger.warning(f"Alternative text extraction failed: {e}")
+        return ""
+
+
 class DocumentProcessor:
     """Service for processing uploaded documents"""
     
-    def __init__(self, upload_folder, allowed_extensions):
+    SUMMARY_API_URL = "https://api.anthropic.com/v1/messages"
+    
+    def __init__(self, upload_folder, allowed_extensions, max_pdf_pages=50,
+                 pdf_extraction_mode='process', pdf_workers=4, text_store=None, response_cache=None,
+                 single_flight=None):
         self.upload_folder = upload_folder
         self.allowed_extensions = allowed_extensions
+        self.text_store = text_store
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        
+        # PDF extraction settings
+        if pdf_extraction_mode not in PDF_EXTRACTION_MODES:
+            logger.warning(f"Unknown PDF extraction mode '{pdf_extraction_mode}', using 'serial'")
+            pdf_extraction_mode = 'serial'
+        self.max_pdf_pages = max_pdf_pages
+        self.pdf_extraction_mode = pdf_extraction_mode
+        self.pdf_workers = max(1, pdf_workers)
+        self._pdf_executor = None
+        self._pdf_executor_lock = threading.Lock()
         
         # Create upload folder if it doesn't exist
         if not os.path.exists(self.upload_folder):
@@ -34,8 +111,12 @@ class DocumentProcessor:
         """Check if the file type is allowed"""
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
-    def save_file(self, file, user_id):
-        """Save uploaded file and create document record"""
+    def save_file(self, file, user_id, process=True):
+        """Save uploaded file and create document record
+        
+        When process is False the text is not extracted here; the caller is
+        expected to hand the document to the ingestion pipeline instead.
+        """
         if not file or not self.allowed_file(file.filename):
             return None, "Invalid file or file type not allowed"
         
@@ -65,6 +146,7 @@ class DocumentProcessor:
                 file_type=file_extension,
                 file_size=file_size,
                 file_path=file_path,
+                content_hash=ExtractedTextStore.hash_file(file_path),
                 user_id=user_id
             )
             
@@ -72,6 +154,9 @@ class DocumentProcessor:
             db.session.commit()
             logger.info(f"Document record created with ID {document.id}")
             
+            if not process:
+                return document, None
+            
             # Extract and store text chunks
             success, error = self.process_document_text(document)
             if not success:
@@ -109,216 +194,261 @@ class DocumentProcessor:
         
         return text
     
-    def process_document_text(self, document):
-        """Extract text from document and create chunks"""
+    def extract_text(self, document, use_store=True):
+        """Extract raw text from a document file based on its type
+        
+        Text already in the extracted text store is returned without parsing
+        the file; freshly extracted text is written to the store.
+        
+        Returns:
+            Tuple of (text, error)
+        """
+        if use_store:
+            text = self.get_stored_text(document)
+            if text is not None:
+                return text, None
+        
         file_path = document.file_path
         file_type = document.file_type
         
+        if file_type == 'pdf':
+            try:
+                text = self._extract_text_from_pdf(file_path)
+            except ImportError:
+                logger.warning("PyPDF2 not available, using basic text extraction")
+                text = self._extract_text_basic(file_path)
+        elif file_type == 'docx':
+            try:
+                import docx
+                text = self._extract_text_from_docx(file_path)
+            except ImportError:
+                logger.warning("python-docx not available, using basic text extraction")
+                text = self._extract_text_basic(file_path)
+        elif file_type == 'txt':
+            text = self._extract_text_from_txt(file_path)
+        else:
+            return None, f"Unsupported file type: {file_type}"
+        
+        self.store_text(document, text)
+        return text, None
+    
+    def _ensure_content_hash(self, document):
+        """Get the document's file hash, computing it for documents saved before hashing"""
+        if not document.content_hash and os.path.exists(document.file_path):
+            document.content_hash = ExtractedTextStore.hash_file(document.file_path)
+            db.session.commit()
+        return document.content_hash
+    
+    def get_stored_text(self, document):
+        """Get the document's extracted text from the text store, or None"""
+        if not self.text_store:
+            return None
+        
+        text = self.text_store.get(self._ensure_content_hash(document))
+        if text is not None:
+            logger.info(f"Using stored text for document {document.id}")
+        return text
+    
+    def store_text(self, document, text):
+        """Write the document's extracted text to the text store"""
+        # Empty text usually means extraction failed, so don't pin it
+        if not self.text_store or not text or not text.strip():
+            return
+        
+        self.text_store.put(self._ensure_content_hash(document), text)
+    
+    def invalidate_stored_text(self, document):
+        """Drop the document's stored text so the next read re-extracts it"""
+        if self.text_store and document.content_hash:
+            self.text_store.delete(document.content_hash)
+    
+    def prepare_text(self, text, max_text_length=100000):
+        """Sanitize extracted text and truncate it to the chunking limit"""
+        # Sanitize the extracted text
+        text = self.sanitize_input(text)
+        
+        text_length = len(text)
+        logger.info(f"Text extracted and sanitized, length: {text_length} characters")
+        
+        # Truncate very long texts to prevent memory issues
+        if text_length > max_text_length:
+            logger.warning(f"Text too long ({text_length} chars), truncating to {max_text_length}")
+            text = text[:max_text_length]
+        
+        return text
+    
+    def process_document_text(self, document):
+        """Extract text from document and create chunks"""
         try:
-            logger.info(f"Processing document: {document.id}, type: {file_type}")
+            logger.info(f"Processing document: {document.id}, type: {document.file_type}")
             
             # Extract text based on file type
-            if file_type == 'pdf':
-                try:
-                    text = self._extract_text_from_pdf(file_path)
-                except ImportError:
-                    logger.warning("PyPDF2 not available, using basic text extraction")
-                    text = self._extract_text_basic(file_path)
-            elif file_type == 'docx':
-                try:
-                    import docx
-                    text = self._extract_text_from_docx(file_path)
-                except ImportError:
-                    logger.warning("python-docx not available, using basic text extraction")
-                    text = self._extract_text_basic(file_path)
-            elif file_type == 'txt':
-                text = self._extract_text_from_txt(file_path)
-            else:
-                return False, f"Unsupported file type: {file_type}"
-            
-            # Sanitize the extracted text
-            text = self.sanitize_input(text)
-            
-            text_length = len(text)
-            logger.info(f"Text extracted and sanitized, length: {text_length} characters")
-            
-            # Truncate very long texts to prevent memory issues
-            max_text_length = 100000
-            if text_length > max_text_length:
-                logger.warning(f"Text too long ({text_length} chars), truncating to {max_text_length}")
-                text = text[:max_text_length]
-                text_length = max_text_length
-            
-            # Improved chunking with better overlap handling
-            chunk_size = 1000
-            overlap = 100
-            
-            # Increased maximum number of chunks
-            MAX_CHUNKS = 100
-            
-            # Delete any existing chunks for this document
-            existing_chunks = DocumentChunk.query.filter_by(document_id=document.id).all()
-            for chunk in existing_chunks:
-                db.session.delete(chunk)
-            db.session.commit()
-            
-            # Create chunks
-            chunks = []
-            start = 0
-            chunk_index = 0
-            
-            while start < text_length and chunk_index < MAX_CHUNKS:
-                # Calculate chunk end position
-                end = min(start + chunk_size, text_length)
-                
-                # Try to find a good break point (sentence end)
-                if end < text_length:
-                    # Look for sentence endings (.!?) with possible trailing spaces
-                    match = re.search(r'[.!?]\s*', text[max(end-50, start):end])
-                    if match:
-                        end = max(end-50, start) + match.end()
-                
-                # Extract chunk
-                chunk_text = text[start:end].strip()
-                
-                # Skip empty chunks
-                if not chunk_text:
-                    start = end
-                    continue
-                
-                # Add chunk to list
-                chunks.append({
-                    'chunk_text': chunk_text,
-                    'chunk_index': chunk_index,
-                    'document_id': document.id
-                })
-                
-                # Move to next chunk with proper overlap
-                start = end - overlap
-                chunk_index += 1
+            text, error = self.extract_text(document)
+            if error:
+                return False, error
             
-            if chunk_index >= MAX_CHUNKS and start < text_length:
-                logger.warning(f"Reached maximum chunk limit ({MAX_CHUNKS}), truncating document")
+            text = self.prepare_text(text)
             
-            # Process chunks in parallel
-            return self._process_chunks_parallel(document.id, chunks)
+            # Split into chunks and store them in a single transaction
+            chunks = self._split_into_chunks(text, document.id)
+            return self._persist_chunks(document.id, chunks)
         
         except Exception as e:
             logger.exception("Error in process_document_text")
             db.session.rollback()
             return False, str(e)
     
-    def _process_chunks_parallel(self, document_id, chunks):
-        """Process document chunks in parallel for better performance"""
-        if not chunks:
-            return True, None
+    def _split_into_chunks(self, text, document_id, chunk_size=1000, overlap=100, max_chunks=100):
+        """Split text into overlapping chunks, preferring sentence boundaries"""
+        chunks = []
+        text_length = len(text)
+        start = 0
+        chunk_index = 0
+        
+        while start < text_length and chunk_index < max_chunks:
+            # Calculate chunk end position
+            end = min(start + chunk_size, text_length)
+            
+            # Try to find a good break point (sentence end)
+            if end < text_length:
+                # Look for sentence endings (.!?) with possible trailing spaces
+                match = re.search(r'[.!?]\s*', text[max(end-50, start):end])
+                if match:
+                    end = max(end-50, start) + match.end()
+            
+            # Extract chunk
+            chunk_text = text[start:end].strip()
+            
+            # Skip empty chunks
+            if not chunk_text:
+                start = end
+                continue
             
+            chunks.append({
+                'chunk_text': chunk_text,
+                'chunk_index': chunk_index,
+                'document_id': document_id
+            })
+            chunk_index += 1
+            
+            # Stop once the end of the text is reached, otherwise the overlap
+            # would keep producing copies of the final chunk
+            if end >= text_length:
+                break
+            
+            # Move to next chunk with proper overlap
+            start = end - overlap
+        
+        if chunk_index >= max_chunks and start < text_length:
+            logger.warning(f"Reached maximum chunk limit ({max_chunks}), truncating document")
+        
+        return chunks
+    
+    def _persist_chunks(self, document_id, chunks):
+        """Replace all chunks of a document with a single bulk insert in one transaction"""
         try:
-            logger.info(f"Processing {len(chunks)} chunks in parallel for document {document_id}")
-            
-            # Calculate optimal number of workers based on available CPUs
-            max_workers = min(8, os.cpu_count() or 4)
-            logger.info(f"Using {max_workers} workers for parallel processing")
-            
-            # Process chunks in parallel batches
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit tasks
-                futures = []
-                for chunk_data in chunks:
-                    futures.append(executor.submit(self._create_chunk, chunk_data))
-                
-                # Process results
-                for future in as_completed(futures):
-                    try:
-                        success = future.result()
-                        if not success:
-                            logger.warning(f"Failed to create a chunk for document {document_id}")
-                    except Exception as e:
-                        logger.exception(f"Error in chunk processing: {e}")
+            # Delete any existing chunks for this document
+            DocumentChunk.query.filter_by(document_id=document_id).delete(synchronize_session=False)
             
-            logger.info(f"Parallel chunk processing complete for document {document_id}")
+            # Insert all chunks with one executemany statement
+            if chunks:
+                db.session.execute(db.insert(DocumentChunk), chunks)
+            
+            db.session.commit()
+            logger.info(f"Stored {len(chunks)} chunks for document {document_id}")
             return True, None
             
         except Exception as e:
-            logger.exception(f"Error in parallel chunk processing: {e}")
+            logger.exception(f"Error storing chunks for document {document_id}: {e}")
             db.session.rollback()
             return False, str(e)
     
-    def _create_chunk(self, chunk_data):
-        """Create a single document chunk (for parallel processing)"""
-        try:
-            # Create new session for this thread to avoid conflicts
-            from app import create_app
-            app = create_app()
-            with app.app_context():
-                from app import db
-                from app.models.document import DocumentChunk
-                
-                # Create and save chunk with thread-local session
-                doc_chunk = DocumentChunk(
-                    chunk_text=chunk_data['chunk_text'],
-                    chunk_index=chunk_data['chunk_index'],
-                    document_id=chunk_data['document_id']
-                )
-                
-                db.session.add(doc_chunk)
-                db.session.commit()
-                
-                return True
-            
-        except Exception as e:
-            logger.exception(f"Error creating chunk: {e}")
-            # Rollback in case of error
+    def _get_pdf_executor(self):
+        """Get the shared PDF extraction pool, creating it on first use"""
+        with self._pdf_executor_lock:
+            if self._pdf_executor is None:
+                if self.pdf_extraction_mode == 'process':
+                    # Spawn instead of fork: the web process has live threads
+                    # (request handlers, ingestion workers) that fork would copy
+                    # mid-lock into the children
+                    self._pdf_executor = ProcessPoolExecutor(
+                        max_workers=self.pdf_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                else:
+                    self._pdf_executor = ThreadPoolExecutor(max_workers=self.pdf_workers)
+                logger.info(f"Started {self.pdf_extraction_mode} pool with {self.pdf_workers} workers for PDF extraction")
+            return self._pdf_executor
+    
+    def iter_pdf_pages(self, file_path, max_pages=None):
+        """Yield (page_number, text) for each PDF page in page order
+        
+        Pages are split into ranges that pool workers extract independently;
+        results are yielded as soon as every earlier range has finished.
+        """
+        import PyPDF2
+        
+        with open(file_path, 'rb') as f:
+            page_count = len(PyPDF2.PdfReader(f, strict=False).pages)
+        
+        max_pages = self.max_pdf_pages if max_pages is None else max_pages
+        pages_to_process = min(page_count, max_pages) if max_pages else page_count
+        if pages_to_process < page_count:
+            logger.warning(f"PDF has {page_count} pages, extracting the first {pages_to_process}")
+        
+        if self.pdf_extraction_mode == 'serial' or self.pdf_workers == 1 or pages_to_process <= 1:
+            for page_num, page_text in enumerate(_extract_pdf_page_range(file_path, 0, pages_to_process)):
+                yield page_num, page_text
+            return
+        
+        # Two ranges per worker keeps every worker busy while bounding how
+        # many times each worker re-opens the file
+        range_size = max(1, -(-pages_to_process // (self.pdf_workers * 2)))
+        ranges = [(start, min(start + range_size, pages_to_process))
+                  for start in range(0, pages_to_process, range_size)]
+        
+        executor = self._get_pdf_executor()
+        futures = [executor.submit(_extract_pdf_page_range, file_path, start, end) for start, end in ranges]
+        
+        # Consume futures in submission order so pages stream out in order
+        for (start, end), future in zip(ranges, futures):
             try:
-                db.session.rollback()
-            except:
-                pass
-            return False
+                page_texts = future.result()
+            except Exception as e:
+                logger.warning(f"Error extracting pages {start + 1}-{end}: {e}")
+                page_texts = [""] * (end - start)
+            for offset, page_text in enumerate(page_texts):
+                yield start + offset, page_text
     
     def _extract_text_from_pdf(self, file_path):
         """Extract text from PDF file with improved processing for larger documents"""
-        import PyPDF2
         text = ""
+        pages_to_process = 0
         try:
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f, strict=False)
-                # Increased limit of pages to process (max 50 pages)
-                pages_to_process = min(len(pdf_reader.pages), 50)
-                logger.info(f"Processing {pages_to_process} pages from PDF")
-                
-                # Using ThreadPoolExecutor for parallel page processing
-                with ThreadPoolExecutor(max_workers=4) as executor:
-                    # Create tasks to process each page
-                    future_to_page = {
-                        executor.submit(self._extract_page_text, pdf_reader, i): i 
-                        for i in range(pages_to_process)
-                    }
-                    
-                    # Collect results
-                    page_texts = [""] * pages_to_process
-                    success_count = 0
-                    
-                    for future in as_completed(future_to_page):
-                        page_num = future_to_page[future]
-                        try:
-                            page_text = future.result()
-                            if page_text and len(page_text.strip()) > 0:
-                                page_texts[page_num] = f"\n--- Page {page_num+1} ---\n{page_text}\n"
-                                success_count += 1
-                        except Exception as e:
-                            logger.warning(f"Error extracting text from page {page_num}: {e}")
-                    
-                    # Check if we extracted any meaningful text
-                    if success_count == 0 and pages_to_process > 0:
-                        logger.warning("Failed to extract text from any pages, trying OCR fallback")
-                        try:
-                            # Try OCR as a fallback
-                            return self.extract_text_from_pdf_with_ocr(file_path)
-                        except Exception as ocr_error:
-                            logger.warning(f"OCR fallback also failed: {ocr_error}")
-                    
-                    # Combine all text in page order
-                    text = "".join(page_texts)
+            logger.info(f"Extracting PDF text with {self.pdf_extraction_mode} mode ({self.pdf_workers} workers)")
+            
+            page_texts = []
+            success_count = 0
+            
+            for page_num, page_text in self.iter_pdf_pages(file_path):
+                pages_to_process += 1
+                if page_text and len(page_text.strip()) > 0:
+                    page_texts.append(f"\n--- Page {page_num+1} ---\n{page_text}\n")
+                    success_count += 1
+            
+            logger.info(f"Processed {pages_to_process} pages from PDF")
+            
+            # Check if we extracted any meaningful text
+            if success_count == 0 and pages_to_process > 0:
+                logger.warning("Failed to extract text from any pages, trying OCR fallback")
+                try:
+                    # Try OCR as a fallback
+                    return self.extract_text_from_pdf_with_ocr(file_path)
+                except Exception as ocr_error:
+                    logger.warning(f"OCR fallback also failed: {ocr_error}")
+            
+            # Combine all text in page order
+            text = "".join(page_texts)
                     
             # If we got very little text, try OCR as a fallback
             if len(text.strip()) < 100 and pages_to_process > 0:
@@ -331,6 +461,8 @@ class DocumentProcessor:
                     logger.warning(f"OCR fallback failed: {ocr_error}")
                     
             return text
+        except ImportError:
+            raise
         except Exception as e:
             logger.exception(f"Error extracting text from PDF: {e}")
             # Try OCR if regular extraction fails
@@ -342,45 +474,6 @@ class DocumentProcessor:
                 # Return empty string to fail gracefully
                 return ""
     
-    def _extract_page_text(self, pdf_reader, page_num):
-        """Extract text from a single PDF page with improved error handling"""
-        try:
-            page = pdf_reader.pages[page_num]
-            extracted_text = page.extract_text() or ""
-            
-            # Additional cleaning for better quality
-            extracted_text = extracted_text.replace('\n\n', '\n').strip()
-            
-            # Check if the text contains actual content (not just whitespace or common PDF artifacts)
-            if len(extracted_text.strip()) < 10:
-                # Try alternate extraction method
-                extracted_text = self._extract_page_text_alternate(page) or ""
-                
-            return extracted_text
-        except Exception as e:
-            logger.warning(f"Failed to extract text from page {page_num}: {e}")
-            return ""
-            
-    def _extract_page_text_alternate(self, page):
-        """Alternative method to extract text from a PDF page when the primary method fails"""
-        try:
-            # Try to extract text using a different approach (accessing raw stream data)
-            if '/Contents' in page and hasattr(page['/Contents'], 'get_data'):
-                data = page['/Contents'].get_data()
-                if data:
-                    # Simple text extraction from content stream
-                    text = ""
-                    data_str = data.decode('latin-1', errors='replace')
-                    pattern = r'\((.*?)\)'
-                    matches = re.findall(pattern, data_str)
-                    if matches:
-                        text = " ".join(matches)
-                        return text
-            return ""
-        except Exception as e:
-            logger.warning(f"Alternative text extraction failed: {e}")
-            return ""
-    
     def _extract_text_from_docx(self, file_path):
         """Extract text from DOCX file with improved handling"""
         import docx
@@ -490,30 +583,12 @@ class DocumentProcessor:
             return None, str(e)
     
     def _extract_document_text(self, document):
-        """Fallback to extract text directly from file"""
+        """Get the document's full text, from the text store or the file"""
         try:
-            file_type = document.file_type
-            file_path = document.file_path
-            
-            if file_type == 'pdf':
-                try:
-                    import PyPDF2
-                    return self._extract_text_from_pdf(file_path)
-                except ImportError:
-                    return self._extract_text_basic(file_path)
-                    
-            elif file_type == 'docx':
-                try:
-                    import docx
-                    return self._extract_text_from_docx(file_path)
-                except ImportError:
-                    return self._extract_text_basic(file_path)
-                    
-            elif file_type == 'txt':
-                return self._extract_text_from_txt(file_path)
-                
-            else:
+            text, error = self.extract_text(document)
+            if error:
                 return "Unsupported file type"
+            return text
                 
         except Exception as e:
             logger.exception(f"Error in _extract_document_text: {e}")
@@ -539,11 +614,20 @@ class DocumentProcessor:
             chunks = DocumentChunk.query.filter_by(document_id=document_id).all()
             for chunk in chunks:
                 db.session.delete(chunk)
+            
+            # Delete ingestion job records
+            IngestionJob.query.filter_by(document_id=document_id).delete(synchronize_session=False)
                 
             # Delete the document record
+            content_hash = document.content_hash
             db.session.delete(document)
             db.session.commit()
             
+            # Stored text is shared by documents with identical files
+            if content_hash and not Document.query.filter_by(content_hash=content_hash).first():
+                if self.text_store:
+                    self.text_store.delete(content_hash)
+            
             return True, None
         
         except Exception as e:
@@ -551,73 +635,42 @@ class DocumentProcessor:
             logger.exception(f"Error deleting document: {e}")
             return False, str(e)
     
-    def summarize_document(self, document_id):
-        """Summarize a document using Claude API"""
-        document = Document.query.get(document_id)
-        if not document:
-            return None, "Document not found"
+    def summarize_document(self, document_id, use_cache=True):
+        """Summarize a document using Claude API
         
+        Identical requests are answered from the response cache unless use_cache is False,
+        and identical requests already in flight share one upstream call.
+        """
         try:
-            # Get document text
-            text, error = self.get_document_text(document_id)
+            payload, api_key, error = self._summary_request(document_id)
             if error:
-                return None, f"Error getting document text: {error}"
-            
-            # Use Claude API to summarize
-            from flask import current_app
-            api_key = current_app.config['ANTHROPIC_API_KEY']
-            
-            if not api_key:
-                return None, "API key not configured"
-            
-            # Maximum length for text to summarize - increased limit
-            max_length = 20000  # Increased from 10000
-            if len(text) > max_length:
-                logger.warning(f"Text too long ({len(text)} chars) for summarization, truncating to {max_length}")
-                text = text[:max_length]
-            
-            # API endpoint and headers
-            api_url = "https://api.anthropic.com/v1/messages"
-            headers = {
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            }
+                return None, error
             
-            # Create prompt for document summarization
-            messages = [
-                {
-                    "role": "user",
-                    "content": f"""Please provide a comprehensive summary of the following document.
-                    Organize the summary with clear headings and bullet points where appropriate.
-                    Capture all the main points, key arguments, important details, and conclusions.
-                    The summary should be thorough but concise, focusing on the essential information.
-                    
-                    DOCUMENT TO SUMMARIZE:
-                    {text}
-                    """
-                }
-            ]
+            def post():
+                # Make API call
+                logger.info(f"Sending summarization request to Claude API for document {document_id}")
+                response = get_http_client().post(self.SUMMARY_API_URL, json=payload, api_key=api_key,
+                                                  operation='summarize_document')
+                
+                # Check for errors
+                if response.status_code != 200:
+                    logger.error(f"Claude API error: {response.status_code} - {response.text}")
+                    return {'status_code': response.status_code}
+                return response.json()
             
-            # Prepare API request
-            payload = {
-                "model": "claude-3-haiku-20240307",
-                "max_tokens": 1500,
-                "temperature": 0.3,
-                "messages": messages
-            }
+            call = post
+            if self.single_flight:
+                call = lambda: self.single_flight.fetch('summarize_document', payload, post)
             
-            # Make API call
-            logger.info(f"Sending summarization request to Claude API for document {document_id}")
-            response = requests.post(api_url, headers=headers, json=payload)
+            if self.response_cache:
+                result = self.response_cache.fetch('summarize_document', payload, call, use_cache)
+            else:
+                result = call()
             
-            # Check for errors
-            if response.status_code != 200:
-                logger.error(f"Claude API error: {response.status_code} - {response.text}")
-                return None, f"Error from Claude API: {response.status_code}"
+            if 'status_code' in result:
+                return None, f"Error from Claude API: {result['status_code']}"
             
             # Extract summary
-            result = response.json()
             if 'content' in result and len(result['content']) > 0:
                 summary = result['content'][0]['text'].strip()
                 logger.info(f"Successfully summarized document {document_id}")
@@ -630,6 +683,63 @@ class DocumentProcessor:
             logger.exception(f"Error in summarize_document: {str(e)}")
             return None, str(e)
     
+    def stream_summarize_document(self, document_id):
+        """Like summarize_document, but returns (chunks, error) where chunks yields the summary as it is generated"""
+        payload, api_key, error = self._summary_request(document_id)
+        if error:
+            return None, error
+        
+        logger.info(f"Streaming summarization request to Claude API for document {document_id}")
+        return stream_message_text(self.SUMMARY_API_URL, payload, api_key, operation='summarize_document'), None
+    
+    def _summary_request(self, document_id):
+        """Build the summarization payload for a document, returning (payload, api_key, error)"""
+        document = Document.query.get(document_id)
+        if not document:
+            return None, None, "Document not found"
+        
+        # Get document text
+        text, error = self.get_document_text(document_id)
+        if error:
+            return None, None, f"Error getting document text: {error}"
+        
+        # Use Claude API to summarize
+        from flask import current_app
+        api_key = current_app.config['ANTHROPIC_API_KEY']
+        
+        if not api_key:
+            return None, None, "API key not configured"
+        
+        # Maximum length for text to summarize - increased limit
+        max_length = 20000  # Increased from 10000
+        if len(text) > max_length:
+            logger.warning(f"Text too long ({len(text)} chars) for summarization, truncating to {max_length}")
+            text = text[:max_length]
+        
+        # Create prompt for document summarization
+        messages = [
+            {
+                "role": "user",
+                "content": f"""Please provide a comprehensive summary of the following document.
+                Organize the summary with clear headings and bullet points where appropriate.
+                Capture all the main points, key arguments, important details, and conclusions.
+                The summary should be thorough but concise, focusing on the essential information.
+                
+                DOCUMENT TO SUMMARIZE:
+                {text}
+                """
+            }
+        ]
+        
+        # Prepare API request
+        payload = {
+            "model": "claude-3-haiku-20240307",
+            "max_tokens": 1500,
+            "temperature": 0.3,
+            "messages": messages
+        }
+        return payload, api_key, None
+    
     def extract_text_from_image(self, image_path):
         """Extract text from images using Claude Vision API for OCR"""
         try:
@@ -753,7 +863,7 @@ class DocumentProcessor:
                 page_count = len(pdf_reader.pages)
                 
                 text = []
-                pages_to_process = min(50, page_count)
+                pages_to_process = min(self.max_pdf_pages, page_count) if self.max_pdf_pages else page_count
                 
                 for i in range(pages_to_process):
                     try:
@@ -796,13 +906,6 @@ class DocumentProcessor:
             with open(image_path, "rb") as image_file:
                 base64_image = base64.b64encode(image_file.read()).decode('utf-8')
             
-            # Prepare API call
-            headers = {
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            }
-            
             messages = [
                 {
                     "role": "user",
@@ -814,10 +917,11 @@ class DocumentProcessor:
             ]
             
             # Call Claude Vision API
-            response = requests.post(
+            response = get_http_client().post(
                 "https://api.anthropic.com/v1/messages",
-                headers=headers,
-                json={"model": "claude-3-opus-20240229", "messages": messages, "max_tokens": 1000}
+                json={"model": "claude-3-opus-20240229", "messages": messages, "max_tokens": 1000},
+                api_key=api_key,
+                operation='analyze_image'
             )
             
             response.raise_for_status()
@@ -839,6 +943,9 @@ class DocumentProcessor:
             return False, "Document not found"
         
         try:
+            # Reprocessing replaces the stored text
+            self.invalidate_stored_text(document)
+            
             # Extract text based on file type
             if document.file_type == 'pdf':
                 # Try normal extraction first
@@ -848,6 +955,8 @@ class DocumentProcessor:
                 if len(text.strip()) < 100:
                     logger.info("PDF appears to be image-based, using OCR")
                     text = self.extract_text_from_pdf_with_ocr(document.file_path)
+                
+                self.store_text(document, text)
             else:
                 # For other document types, use existing methods
                 text = self._extract_document_text(document)
@@ -855,47 +964,9 @@ class DocumentProcessor:
             # Sanitize and chunk the text
             text = self.sanitize_input(text)
             
-            # Delete existing chunks
-            existing_chunks = DocumentChunk.query.filter_by(document_id=document.id).all()
-            for chunk in existing_chunks:
-                db.session.delete(chunk)
-            db.session.commit()
-            
-            # Create new chunks
-            chunks = []
-            chunk_size = 1000
-            overlap = 100
-            text_length = len(text)
-            start = 0
-            chunk_index = 0
-            MAX_CHUNKS = 100
-            
-            while start < text_length and chunk_index < MAX_CHUNKS:
-                end = min(start + chunk_size, text_length)
-                
-                # Find good break point
-                if end < text_length:
-                    match = re.search(r'[.!?]\s*', text[max(end-50, start):end])
-                    if match:
-                        end = max(end-50, start) + match.end()
-                
-                chunk_text = text[start:end].strip()
-                
-                if not chunk_text:
-                    start = end
-                    continue
-                
-                chunks.append({
-                    'chunk_text': chunk_text,
-                    'chunk_index': chunk_index,
-                    'document_id': document.id
-                })
-                
-                start = end - overlap
-                chunk_index += 1
-            
-            # Process chunks in parallel
-            success, error = self._process_chunks_parallel(document.id, chunks)
+            # Chunk the text and replace existing chunks in a single transaction
+            chunks = self._split_into_chunks(text, document.id)
+            success, error = self._persist_chunks(document.id, chunks)
             if not success:
                 return False, error
                 
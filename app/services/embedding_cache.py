@@ -0,0 +1,158 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """Two-tier cache of embedding vectors keyed by content hash
+
+    The memory tier is an LRU bounded by the total bytes of the stored
+    vectors. The optional disk tier is a SQLite file shared by all worker
+    processes on the host, so embeddings survive restarts; disk hits are
+    promoted into memory.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_path=None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._local = threading.local()
+
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_path:
+            directory = os.path.dirname(os.path.abspath(self.disk_path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding ("
+                    "key TEXT PRIMARY KEY, dimension INTEGER NOT NULL, vector BLOB NOT NULL)"
+                )
+
+        logger.info(f"Initialized EmbeddingCache with {max_bytes} byte budget, disk tier {disk_path or 'disabled'}")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections can't be shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Get cached vectors for the given keys; missing keys are left out"""
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+
+        if missing and self.disk_path:
+            from_disk = self._read_disk(missing)
+            if from_disk:
+                with self._lock:
+                    self.disk_hits += len(from_disk)
+                    for key, vector in from_disk.items():
+                        self._insert(key, vector)
+                found.update(from_disk)
+
+        with self._lock:
+            self.misses += len(missing) - sum(1 for key in missing if key in found)
+
+        return found
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        """Store vectors in memory and, when enabled, on disk"""
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        if not items:
+            return
+
+        with self._lock:
+            for key, vector in items:
+                self._insert(key, vector)
+
+        if self.disk_path:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embedding (key, dimension, vector) VALUES (?, ?, ?)",
+                        [(key, vector.shape[0], vector.tobytes()) for key, vector in items]
+                    )
+            except Exception as e:
+                logger.warning(f"Failed to write {len(items)} embeddings to disk cache: {e}")
+
+    def _read_disk(self, keys):
+        found = {}
+        try:
+            conn = self._connect()
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embedding WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Failed to read embeddings from disk cache: {e}")
+        return found
+
+    def _insert(self, key, vector):
+        # Caller holds the lock
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+
+        if vector.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+
+        # Evict least recently used vectors until back under budget
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Get hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(hits / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_enabled': bool(self.disk_path)
+            }
@@ -0,0 +1,132 @@
+import logging
+import re
+from typing import List
+
+import numpy as np
+
+from app.utils.http_client import get_http_client
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ('remote', 'local')
+DEFAULT_REMOTE_MODEL = "claude-3-opus-20240229"
+
+
+class EmbeddingProvider:
+    """Interface for turning texts into embedding vectors
+
+    model_id identifies the vector space; it keys the embedding cache and is
+    stored with each index so vectors from different providers never mix.
+    Remote providers are called through the concurrent batch scheduler, local
+    ones are called in-process.
+    """
+    model_id = None
+    remote = False
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed a batch of texts, raising on failure"""
+        raise NotImplementedError
+
+
+class RemoteEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the HTTP embeddings API"""
+    remote = True
+
+    def __init__(self, api_key, api_url="https://api.anthropic.com/v1/embeddings", model=DEFAULT_REMOTE_MODEL):
+        self.api_url = api_url
+        self.model_id = model
+        self.api_key = api_key
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        payload = {
+            "model": self.model_id,
+            "input": texts,
+            "encoding_format": "float"
+        }
+
+        # The batch scheduler owns retries for embedding requests
+        response = get_http_client().post(
+            self.api_url,
+            json=payload,
+            api_key=self.api_key,
+            timeout=60,
+            retries=0,
+            operation='embeddings'
+        )
+        response.raise_for_status()
+
+        # Extract embeddings from response
+        result = response.json()
+        if 'data' not in result:
+            logger.error(f"Invalid response format: {result}")
+            raise ValueError("Invalid API response format")
+
+        return [np.array(item['embedding'], dtype=np.float32) for item in result['data']]
+
+
+class HashedNgramEmbeddingProvider(EmbeddingProvider):
+    """Local embeddings from hashed character n-grams, computed with NumPy
+
+    Character n-grams of the lower-cased, whitespace-normalised text are
+    hashed into a fixed number of signed buckets (the hashing trick), damped
+    with log(1 + count) and L2-normalised, so L2 distance in FAISS ranks like
+    cosine similarity. No vocabulary or network is needed and the vectors are
+    identical across processes.
+    """
+
+    # 64-bit polynomial rolling hash and murmur3 finaliser constants
+    _PRIME = np.uint64(1099511628211)
+    _MIX1 = np.uint64(0xff51afd7ed558ccd)
+    _MIX2 = np.uint64(0xc4ceb9fe1a85ec53)
+
+    def __init__(self, dimension=1024, ngram_sizes=(3, 4, 5)):
+        self.dimension = dimension
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.model_id = f"hashed-ngram-v1-{dimension}-{'-'.join(map(str, self.ngram_sizes))}"
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        normalized = ' ' + re.sub(r'\s+', ' ', text.lower()).strip() + ' '
+        data = np.frombuffer(normalized.encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+
+        counts = np.zeros(self.dimension, dtype=np.float64)
+        with np.errstate(over='ignore'):
+            for n in self.ngram_sizes:
+                if len(data) < n:
+                    continue
+
+                # Hash every n-gram at once; uint64 arithmetic wraps
+                count = len(data) - n + 1
+                hashes = np.full(count, n, dtype=np.uint64)
+                for j in range(n):
+                    hashes = hashes * self._PRIME + data[j:j + count]
+
+                hashes ^= hashes >> np.uint64(33)
+                hashes *= self._MIX1
+                hashes ^= hashes >> np.uint64(33)
+                hashes *= self._MIX2
+                hashes ^= hashes >> np.uint64(33)
+
+                buckets = (hashes % np.uint64(self.dimension)).astype(np.int64)
+                signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+                counts += np.bincount(buckets, weights=signs, minlength=self.dimension)
+
+        vector = np.sign(counts) * np.log1p(np.abs(counts))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.astype(np.float32)
+
+
+def create_embedding_provider(backend, api_key=None, local_dimension=1024) -> EmbeddingProvider:
+    """Create the embedding provider for a backend name"""
+    if backend not in EMBEDDING_BACKENDS:
+        logger.warning(f"Unknown embedding backend '{backend}', using 'remote'")
+        backend = 'remote'
+
+    if backend == 'local':
+        return HashedNgramEmbeddingProvider(dimension=local_dimension)
+    return RemoteEmbeddingProvider(api_key)
@@ -0,0 +1,196 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import requests
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying; anything else in the 4xx range is a caller error
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for batching (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class EmbeddingBatchScheduler:
+    """Sends embedding batches concurrently, sized by a token budget, under a shared in-flight limit
+
+    The pool is shared by every caller in the process, so max_in_flight bounds
+    the total number of concurrent embedding requests. A 429/503 with a
+    Retry-After header pauses all workers until the server's deadline; other
+    failures are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(self, embed_batch: Callable[[List[str]], List[np.ndarray]], max_in_flight=4,
+                 max_batch_size=5, max_batch_tokens=8000, max_retries=5, base_delay=0.5, max_delay=30.0):
+        self.embed_batch = embed_batch
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='embed')
+
+        # Shared pause set by Retry-After responses
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+        # Cumulative counters
+        self._totals = {'runs': 0, 'texts': 0, 'failed_texts': 0, 'batches': 0, 'tokens': 0,
+                        'retries': 0, 'rate_limited': 0, 'seconds': 0.0}
+
+        logger.info(f"Initialized EmbeddingBatchScheduler with {self.max_in_flight} in flight, "
+                    f"{self.max_batch_size} texts / {self.max_batch_tokens} tokens per batch")
+
+    def plan_batches(self, texts: List[str]) -> List[List[int]]:
+        """Group text positions into batches bounded by count and estimated tokens"""
+        batches = []
+        current = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (len(current) >= self.max_batch_size or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def run(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Embed texts, returning one vector per text (None where its batch failed)"""
+        results = [None] * len(texts)
+        if not texts:
+            return results
+
+        started = time.perf_counter()
+        batches = self.plan_batches(texts)
+        run_stats = {'retries': 0, 'rate_limited': 0}
+
+        futures = [
+            (batch, self.executor.submit(self._send_with_retry, [texts[i] for i in batch], run_stats))
+            for batch in batches
+        ]
+
+        for batch, future in futures:
+            embeddings = future.result()
+            if embeddings is None:
+                continue
+            for i, embedding in zip(batch, embeddings):
+                results[i] = embedding
+
+        elapsed = time.perf_counter() - started
+        failed = sum(1 for result in results if result is None)
+        tokens = sum(estimate_tokens(text) for text in texts)
+
+        with self._lock:
+            self._totals['runs'] += 1
+            self._totals['texts'] += len(texts)
+            self._totals['failed_texts'] += failed
+            self._totals['batches'] += len(batches)
+            self._totals['tokens'] += tokens
+            self._totals['retries'] += run_stats['retries']
+            self._totals['rate_limited'] += run_stats['rate_limited']
+            self._totals['seconds'] += elapsed
+
+        logger.info(
+            f"Embedded {len(texts) - failed}/{len(texts)} texts in {len(batches)} batches in {elapsed:.2f}s "
+            f"({len(texts) / elapsed if elapsed else 0:.1f} texts/sec, {run_stats['retries']} retries, "
+            f"{run_stats['rate_limited']} rate limited)"
+        )
+        return results
+
+    def _send_with_retry(self, batch: List[str], run_stats: Dict) -> Optional[List[np.ndarray]]:
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+
+            try:
+                embeddings = self.embed_batch(batch)
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+                return embeddings
+
+            except Exception as e:
+                status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status_code is not None and status_code not in RETRYABLE_STATUS_CODES:
+                    logger.error(f"Embedding batch failed with status {status_code}, not retrying: {e}")
+                    return None
+
+                if attempt == self.max_retries:
+                    logger.error(f"Failed to embed batch after {self.max_retries + 1} attempts: {e}")
+                    return None
+
+                delay = self._retry_delay(e, attempt)
+                with self._lock:
+                    run_stats['retries'] += 1
+                    if status_code in (429, 503):
+                        run_stats['rate_limited'] += 1
+                logger.warning(f"Embedding attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        return None
+
+    def _retry_delay(self, error, attempt) -> float:
+        """Delay before the next attempt: the server's Retry-After if given, else full-jitter backoff"""
+        response = getattr(error, 'response', None)
+        retry_after = self._parse_retry_after(response) if response is not None else None
+
+        if retry_after is not None:
+            # Pause every worker until the server's deadline, plus a little
+            # jitter so they don't all resume in the same instant
+            delay = min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+            with self._lock:
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            return delay
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After') if response.headers else None
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _wait_for_rate_limit(self):
+        with self._lock:
+            wait = self._resume_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def stats(self) -> Dict:
+        """Get cumulative counters and achieved throughput"""
+        with self._lock:
+            totals = dict(self._totals)
+
+        seconds = totals['seconds']
+        totals['seconds'] = round(seconds, 3)
+        totals['texts_per_second'] = round(totals['texts'] / seconds, 2) if seconds else None
+        totals['tokens_per_second'] = round(totals['tokens'] / seconds, 2) if seconds else None
+        totals['max_in_flight'] = self.max_in_flight
+        totals['max_batch_size'] = self.max_batch_size
+        totals['max_batch_tokens'] = self.max_batch_tokens
+        return totals
@@ -1,170 +1,180 @@
 import numpy as np
 import faiss
-import requests
 import pickle
 import os
 import logging
-import time
 import hashlib
-from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 
 from app import db
 from app.models.document import Document, DocumentChunk
+from app.services.index_cache import IndexCache
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_scheduler import EmbeddingBatchScheduler
+from app.services.embedding_providers import DEFAULT_REMOTE_MODEL, create_embedding_provider
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+FAISS_INDEX_TYPES = ('auto', 'flat', 'hnsw', 'ivf')
+FAISS_COMPRESSIONS = ('none', 'sq8', 'pq')
+
+
+def choose_index_factory(num_vectors: int, dimension: int, index_type: str = 'auto',
+                         compression: str = 'none', flat_max_vectors: int = 1024) -> str:
+    """Choose a faiss.index_factory description for a corpus of the given size
+    
+    Small corpora use an exact flat index. Larger ones use HNSW (auto picks it
+    up to 50k vectors) or IVF, optionally with SQ8 or PQ compressed codes.
+    Falls back to a smaller setting whenever there are too few vectors to
+    train the requested one.
+    """
+    if index_type == 'auto':
+        if num_vectors <= flat_max_vectors:
+            index_type = 'flat'
+        elif num_vectors <= 50000:
+            index_type = 'hnsw'
+        else:
+            index_type = 'ivf'
+    
+    if index_type == 'flat':
+        return 'Flat'
+    
+    # PQ needs a sub-quantizer count dividing the dimension, sub-vectors of
+    # at least 8 dimensions and enough vectors to train 256 centroids each
+    codes = 'Flat'
+    if compression == 'sq8':
+        codes = 'SQ8'
+    elif compression == 'pq':
+        pq_m = next((m for m in (64, 48, 32, 16, 8) if dimension % m == 0 and dimension // m >= 8), None)
+        codes = f'PQ{pq_m}' if pq_m and num_vectors >= 256 * 39 else 'SQ8'
+    
+    if index_type == 'hnsw':
+        return 'HNSW32' if codes == 'Flat' else f'HNSW32,{codes}'
+    
+    # IVF wants roughly 39 training vectors per list
+    nlist = max(1, min(int(4 * np.sqrt(num_vectors)), num_vectors // 39))
+    if nlist < 2:
+        return 'Flat'
+    return f'IVF{nlist},{codes}'
+
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str = 'auto', compression: str = 'none',
+                      flat_max_vectors: int = 1024):
+    """Build and populate a FAISS index sized for the embeddings
+    
+    Returns:
+        Tuple of (index, factory description)
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_vectors, dimension = embeddings.shape
+    description = choose_index_factory(num_vectors, dimension, index_type, compression, flat_max_vectors)
+    
+    index = faiss.index_factory(dimension, description)
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    
+    # Search-time accuracy settings are saved with the index
+    if description.startswith('IVF'):
+        faiss.extract_index_ivf(index).nprobe = min(16, faiss.extract_index_ivf(index).nlist)
+    elif description.startswith('HNSW'):
+        faiss.downcast_index(index).hnsw.efSearch = 64
+    
+    return index, description
+
+
 class EmbeddingsService:
-    """Service for managing document embeddings and semantic search using Claude API"""
+    """Service for managing document embeddings and semantic search with a pluggable embedding backend"""
     
-    def __init__(self, api_key, index_directory='app/static/indices', cache_size=100):
+    def __init__(self, api_key, index_directory='app/static/indices', embedding_backend='remote', local_embedding_dim=1024,
+                 embedding_cache_bytes=64 * 1024 * 1024, embedding_cache_path=None,
+                 embed_batch_size=5, embed_batch_tokens=8000, embed_max_in_flight=4, embed_max_retries=5,
+                 index_cache_bytes=256 * 1024 * 1024, index_mmap_threshold=64 * 1024 * 1024,
+                 index_type='auto', index_compression='none', flat_max_vectors=1024):
         self.api_key = api_key
         self.index_directory = index_directory
-        self.embeddings_api_url = "https://api.anthropic.com/v1/embeddings"
-        self.headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
+        
+        # FAISS index selection
+        if index_type not in FAISS_INDEX_TYPES:
+            logger.warning(f"Unknown FAISS index type '{index_type}', using 'auto'")
+            index_type = 'auto'
+        if index_compression not in FAISS_COMPRESSIONS:
+            logger.warning(f"Unknown FAISS compression '{index_compression}', using 'none'")
+            index_compression = 'none'
+        self.index_type = index_type
+        self.index_compression = index_compression
+        self.flat_max_vectors = flat_max_vectors
+        
+        # Embedding backend: the remote API or in-process vectors
+        self.provider = create_embedding_provider(embedding_backend, api_key, local_embedding_dim)
+        self.embedding_model = self.provider.model_id
         
         # Create indices directory if it doesn't exist
         if not os.path.exists(self.index_directory):
             os.makedirs(self.index_directory)
             
-        # Initialize embedding cache
-        self._text_hash_cache = {}
-        self.get_embedding_cached = lru_cache(maxsize=cache_size)(self._get_single_embedding)
+        # Embedding cache keyed by content hash, with an optional disk tier
+        self.embedding_cache = EmbeddingCache(max_bytes=embedding_cache_bytes, disk_path=embedding_cache_path)
         
-        logger.info(f"Initialized EmbeddingsService with Claude API and cache size {cache_size}")
-    
-    def _text_to_hash(self, text: str) -> str:
-        """Convert text to a hash for caching"""
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
+        # Concurrent batch scheduler for uncached texts
+        self.embedding_scheduler = EmbeddingBatchScheduler(
+            self.provider.embed,
+            max_in_flight=embed_max_in_flight,
+            max_batch_size=embed_batch_size,
+            max_batch_tokens=embed_batch_tokens,
+            max_retries=embed_max_retries
+        )
         
-    def _get_single_embedding(self, text_hash: str) -> np.ndarray:
-        """Get embedding for a single text by hash (for caching)"""
-        if text_hash not in self._text_hash_cache:
-            return np.array([])
+        # Loaded FAISS indexes, so repeated searches skip deserialization
+        self.index_cache = IndexCache(max_bytes=index_cache_bytes, mmap_threshold=index_mmap_threshold)
         
-        text = self._text_hash_cache[text_hash]
-        try:
-            # Claude Embeddings API call for a single text
-            payload = {
-                "model": "claude-3-opus-20240229", 
-                "input": [text],
-                "encoding_format": "float"
-            }
-            
-            response = requests.post(
-                self.embeddings_api_url, 
-                headers=self.headers,
-                json=payload
-            )
-            response.raise_for_status()
-            
-            # Extract embedding from response
-            result = response.json()
-            if 'data' not in result or not result['data']:
-                logger.error(f"Invalid response format: {result}")
-                return np.array([])
-                
-            return np.array(result['data'][0]['embedding'])
-            
-        except Exception as e:
-            logger.exception(f"Error getting single embedding: {str(e)}")
-            return np.array([])
+        logger.info(f"Initialized EmbeddingsService with {self.embedding_model} embeddings and {embedding_cache_bytes} byte embedding cache")
+    
+    def _text_to_hash(self, text: str) -> str:
+        """Convert text to a cache key (the model is included so a model change never reuses vectors)"""
+        return hashlib.sha256(f"{self.embedding_model}\0{text}".encode('utf-8')).hexdigest()
     
     def get_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Get embeddings for a list of texts using Claude API with caching"""
+        """Get embeddings for a list of texts using the configured backend with caching"""
         if not texts:
             return np.array([])
             
         try:
-            # Process each text with cache
-            result_embeddings = []
-            uncached_texts = []
-            uncached_indices = []
+            # Local vectors are cheaper to compute than to look up
+            if not self.provider.remote:
+                return np.vstack(self.provider.embed(texts))
             
             # Check cache first
-            for i, text in enumerate(texts):
-                text_hash = self._text_to_hash(text)
-                self._text_hash_cache[text_hash] = text  # Store mapping of hash to text
-                
-                cached_embedding = self.get_embedding_cached(text_hash)
-                if cached_embedding.size > 0:
-                    result_embeddings.append((i, cached_embedding))
-                    logger.debug(f"Cache hit for text at index {i}")
-                else:
-                    uncached_texts.append(text)
-                    uncached_indices.append(i)
-                    logger.debug(f"Cache miss for text at index {i}")
+            text_hashes = [self._text_to_hash(text) for text in texts]
+            cached = self.embedding_cache.get_many(set(text_hashes))
+            result_embeddings = [(i, cached[h]) for i, h in enumerate(text_hashes) if h in cached]
+            
+            # Embed each distinct uncached text once
+            uncached = {}
+            for i, text_hash in enumerate(text_hashes):
+                if text_hash not in cached:
+                    uncached.setdefault(text_hash, (texts[i], []))[1].append(i)
+            uncached_hashes = list(uncached)
+            uncached_texts = [uncached[h][0] for h in uncached_hashes]
             
-            # For uncached texts, process in batches
+            # For uncached texts, send batches concurrently
             if uncached_texts:
                 logger.info(f"Processing {len(uncached_texts)} uncached texts in batches")
-                batch_size = 5  # Small batch size
-                batch_embeddings = []
+                batch_embeddings = self.embedding_scheduler.run(uncached_texts)
                 
-                for i in range(0, len(uncached_texts), batch_size):
-                    batch = uncached_texts[i:i+batch_size]
-                    logger.info(f"Getting embeddings for batch {i//batch_size + 1}/{(len(uncached_texts)-1)//batch_size + 1}")
-                    
-                    # Add retry logic
-                    max_retries = 3
-                    for attempt in range(max_retries):
-                        try:
-                            # Claude Embeddings API call
-                            payload = {
-                                "model": "claude-3-opus-20240229", 
-                                "input": batch,
-                                "encoding_format": "float"
-                            }
-                            
-                            response = requests.post(
-                                self.embeddings_api_url, 
-                                headers=self.headers,
-                                json=payload
-                            )
-                            response.raise_for_status()
-                            
-                            # Extract embeddings from response
-                            result = response.json()
-                            if 'data' not in result:
-                                logger.error(f"Invalid response format: {result}")
-                                raise ValueError("Invalid API response format")
-                                
-                            # Add embeddings to batch results
-                            embeddings = [np.array(item['embedding']) for item in result['data']]
-                            batch_embeddings.extend(embeddings)
-                            
-                            # Update cache for these embeddings
-                            for j, emb in enumerate(embeddings):
-                                original_idx = i + j
-                                if original_idx < len(uncached_texts):
-                                    text_hash = self._text_to_hash(uncached_texts[original_idx])
-                                    self.get_embedding_cached.cache_clear()  # Clear cache to update
-                                    self.get_embedding_cached(text_hash)  # Call once to cache
-                            
-                            # Add delay between API calls
-                            if i + batch_size < len(uncached_texts):
-                                time.sleep(1)  # 1 second delay between batches
-                                
-                            break  # Success, exit retry loop
-                            
-                        except Exception as e:
-                            logger.warning(f"Embedding attempt {attempt+1} failed: {str(e)}")
-                            if attempt < max_retries - 1:
-                                time.sleep(2)  # Wait before retry
-                            else:
-                                logger.error(f"Failed to embed batch after {max_retries} attempts")
-                                # Fill with empty arrays as placeholder for failed embeddings
-                                batch_embeddings.extend([np.array([]) for _ in range(len(batch))])
+                # Cache the new embeddings
+                self.embedding_cache.put_many([
+                    (text_hash, embedding)
+                    for text_hash, embedding in zip(uncached_hashes, batch_embeddings)
+                    if embedding is not None
+                ])
                 
                 # Combine batch results with their original indices
-                for i, idx in enumerate(uncached_indices):
-                    if i < len(batch_embeddings) and batch_embeddings[i].size > 0:
-                        result_embeddings.append((idx, batch_embeddings[i]))
+                for text_hash, embedding in zip(uncached_hashes, batch_embeddings):
+                    if embedding is not None and embedding.size > 0:
+                        for idx in uncached[text_hash][1]:
+                            result_embeddings.append((idx, embedding))
             
             # Sort by original index and combine
             result_embeddings.sort(key=lambda x: x[0])
@@ -175,7 +185,7 @@ class EmbeddingsService:
                 
             # Verify all embeddings have the same dimension
             first_dim = result_embeddings[0][1].shape[0]
-            all_embeddings = np.zeros((len(texts), first_dim))
+            all_embeddings = np.zeros((len(texts), first_dim), dtype=np.float32)
             
             # Fill in the embeddings we have
             for idx, emb in result_embeddings:
@@ -193,17 +203,11 @@ class EmbeddingsService:
         if not document:
             return False, "Document not found"
         
-        chunks = DocumentChunk.query.filter_by(document_id=document_id).all()
+        chunks = DocumentChunk.query.filter_by(document_id=document_id).order_by(DocumentChunk.chunk_index).all()
         if not chunks:
             return False, "No chunks found for document"
         
         try:
-            # Limit number of chunks to process
-            max_chunks = 20  # Process only first 20 chunks for safety
-            if len(chunks) > max_chunks:
-                logger.warning(f"Limiting to {max_chunks} chunks (was {len(chunks)})")
-                chunks = chunks[:max_chunks]
-            
             # Get texts from chunks
             texts = [chunk.chunk_text for chunk in chunks]
             chunk_ids = [chunk.id for chunk in chunks]
@@ -219,17 +223,24 @@ class EmbeddingsService:
             dimension = embeddings.shape[1]
             logger.info(f"Created embeddings with dimension {dimension}")
             
-            # Use a simple index type that uses less memory
-            index = faiss.IndexFlatL2(dimension)
-            index.add(embeddings)
+            # Pick the index type for the corpus size
+            index, description = build_faiss_index(
+                embeddings, self.index_type, self.index_compression, self.flat_max_vectors
+            )
+            logger.info(f"Built {description} index with {index.ntotal} vectors")
             
             # Save index and mapping to disk
             index_path = os.path.join(self.index_directory, f"doc_{document_id}_index.faiss")
             mapping_path = os.path.join(self.index_directory, f"doc_{document_id}_mapping.pkl")
             
-            faiss.write_index(index, index_path)
-            with open(mapping_path, 'wb') as f:
-                pickle.dump({'chunk_ids': chunk_ids}, f)
+            # Write to temporary files and rename so concurrent searches never
+            # load a half-written index
+            faiss.write_index(index, index_path + '.tmp')
+            with open(mapping_path + '.tmp', 'wb') as f:
+                pickle.dump({'chunk_ids': chunk_ids, 'index_type': description, 'embedding_model': self.embedding_model}, f)
+            os.replace(mapping_path + '.tmp', mapping_path)
+            os.replace(index_path + '.tmp', index_path)
+            self.index_cache.invalidate(document_id)
             
             logger.info(f"Index saved to {index_path}")
             
@@ -245,13 +256,52 @@ class EmbeddingsService:
             db.session.rollback()
             return False, str(e)
     
+    def has_index(self, document_id: int) -> bool:
+        """Check whether a search index has been built for a document"""
+        index_path = os.path.join(self.index_directory, f"doc_{document_id}_index.faiss")
+        mapping_path = os.path.join(self.index_directory, f"doc_{document_id}_mapping.pkl")
+        return os.path.exists(index_path) and os.path.exists(mapping_path)
+    
+    def get_stored_embeddings(self, document_id: int, chunks: List[DocumentChunk]) -> Optional[np.ndarray]:
+        """Get vectors for a document's chunks without calling the embeddings API
+        
+        Vectors come from the local backend, the embedding cache or the document's
+        saved index. Returns None when some chunk has no stored vector.
+        """
+        if not chunks:
+            return None
+            
+        try:
+            texts = [chunk.chunk_text for chunk in chunks]
+            if not self.provider.remote:
+                return np.vstack(self.provider.embed(texts))
+            
+            text_hashes = [self._text_to_hash(text) for text in texts]
+            cached = self.embedding_cache.get_many(set(text_hashes))
+            if all(text_hash in cached for text_hash in text_hashes):
+                return np.vstack([cached[text_hash] for text_hash in text_hashes])
+            
+            if not self.has_index(document_id):
+                return None
+            index_path = os.path.join(self.index_directory, f"doc_{document_id}_index.faiss")
+            mapping_path = os.path.join(self.index_directory, f"doc_{document_id}_mapping.pkl")
+            index, mapping = self.index_cache.get(document_id, index_path, mapping_path)
+            if mapping.get('embedding_model', DEFAULT_REMOTE_MODEL) != self.embedding_model:
+                return None
+            
+            # Flat and HNSW indexes keep their vectors (compressed ones approximately)
+            positions = {chunk_id: i for i, chunk_id in enumerate(mapping['chunk_ids'])}
+            if any(chunk.id not in positions for chunk in chunks):
+                return None
+            return np.vstack([index.reconstruct(positions[chunk.id]) for chunk in chunks])
+            
+        except Exception as e:
+            logger.info(f"No stored vectors for document {document_id}: {str(e)}")
+            return None
+    
     def search_document(self, document_id: int, query: str, top_k: int = 3) -> Tuple[List[Dict], Optional[str]]:
         """Search for relevant chunks in a document using semantic search"""
-        document = Document.query.get(document_id)
-        if not document:
-            return [], "Document not found"
-        
-        # Check if index exists
+        # Check if index exists (building it checks that the document exists)
         index_path = os.path.join(self.index_directory, f"doc_{document_id}_index.faiss")
         mapping_path = os.path.join(self.index_directory, f"doc_{document_id}_mapping.pkl")
         
@@ -262,10 +312,17 @@ class EmbeddingsService:
                 return [], error
         
         try:
-            # Load index and mapping
-            index = faiss.read_index(index_path)
-            with open(mapping_path, 'rb') as f:
-                mapping = pickle.load(f)
+            # Load index and mapping, from the cache when already loaded
+            index, mapping = self.index_cache.get(document_id, index_path, mapping_path)
+            
+            # Indexes built with another embedding backend are in a different
+            # vector space, so rebuild them for the current one
+            if mapping.get('embedding_model', DEFAULT_REMOTE_MODEL) != self.embedding_model:
+                logger.info(f"Index for document {document_id} uses {mapping.get('embedding_model', DEFAULT_REMOTE_MODEL)}, rebuilding")
+                success, error = self.create_document_index(document_id)
+                if not success:
+                    return [], error
+                index, mapping = self.index_cache.get(document_id, index_path, mapping_path)
             
             # Get query embedding
             query_embedding = self.get_embeddings([query])
@@ -279,23 +336,49 @@ class EmbeddingsService:
                 
             distances, indices = index.search(query_embedding, k)
             
-            # Get chunk IDs and texts
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < 0 or idx >= len(mapping['chunk_ids']):
-                    continue  # Skip invalid indices
-                    
-                chunk_id = mapping['chunk_ids'][idx]
-                chunk = DocumentChunk.query.get(chunk_id)
-                if chunk:
-                    results.append({
-                        'chunk_id': chunk_id,
-                        'text': chunk.chunk_text,
-                        'score': float(1.0 / (1.0 + distances[0][i]))  # Convert distance to similarity score
-                    })
+            # Get chunk IDs, skipping invalid indices
+            hits = [
+                (mapping['chunk_ids'][idx], distances[0][i])
+                for i, idx in enumerate(indices[0])
+                if 0 <= idx < len(mapping['chunk_ids'])
+            ]
+            
+            # Load all hit texts in one query
+            chunk_texts = dict(
+                db.session.query(DocumentChunk.id, DocumentChunk.chunk_text)
+                .filter(DocumentChunk.document_id == document_id, DocumentChunk.id.in_([chunk_id for chunk_id, _ in hits]))
+                .all()
+            ) if hits else {}
+            
+            # Keep score order
+            results = [
+                {
+                    'chunk_id': chunk_id,
+                    'text': chunk_texts[chunk_id],
+                    'score': float(1.0 / (1.0 + distance))  # Convert distance to similarity score
+                }
+                for chunk_id, distance in hits
+                if chunk_id in chunk_texts
+            ]
+            
+            # Chunks are deleted with their document
+            if hits and not results and not db.session.query(Document.id).filter_by(id=document_id).first():
+                return [], "Document not found"
             
             return results, None
         
         except Exception as e:
             logger.exception(f"Error searching document: {str(e)}")
-            return [], str(e)
\ No newline at end of file
+            return [], str(e)
+    
+    def get_index_cache_stats(self) -> Dict:
+        """Get hit/miss/eviction counters for the loaded index cache"""
+        return self.index_cache.stats()
+    
+    def get_embedding_cache_stats(self) -> Dict:
+        """Get hit/miss counters for the embedding cache"""
+        return self.embedding_cache.stats()
+    
+    def get_embedding_scheduler_stats(self) -> Dict:
+        """Get batch counts and achieved throughput for the embedding scheduler"""
+        return self.embedding_scheduler.stats()
\ No newline at end of file
@@ -0,0 +1,140 @@
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import faiss
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class IndexCache:
+    """LRU cache of loaded FAISS indexes and their chunk mappings, bounded by total bytes
+
+    Entries are validated against the size and mtime of the files on disk, so
+    an index rewritten by another worker process is reloaded on next use.
+    Indexes at or above mmap_threshold bytes are memory-mapped instead of read
+    into memory; their pages belong to the OS page cache, so only the mapping
+    counts against the budget.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, mmap_threshold=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        logger.info(f"Initialized IndexCache with {max_bytes} byte budget")
+
+    @staticmethod
+    def _signature(index_path, mapping_path):
+        index_stat = os.stat(index_path)
+        mapping_stat = os.stat(mapping_path)
+        return (index_stat.st_size, index_stat.st_mtime_ns, mapping_stat.st_size, mapping_stat.st_mtime_ns)
+
+    def get(self, key, index_path: str, mapping_path: str) -> Tuple[object, Dict]:
+        """Get (index, mapping) for a key, loading it from disk on a miss"""
+        signature = self._signature(index_path, mapping_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['signature'] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry['index'], entry['mapping']
+
+            # Files changed on disk since the entry was loaded
+            if entry:
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        # Load outside the lock so other documents can still be served
+        index, mapping, size, mmapped = self._load(index_path, mapping_path, signature)
+
+        with self._lock:
+            if size > self.max_bytes:
+                logger.warning(f"Index for {key} ({size} bytes) exceeds the cache budget, not caching")
+                return index, mapping
+
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'index': index,
+                'mapping': mapping,
+                'signature': signature,
+                'size': size,
+                'mmapped': mmapped
+            }
+            self._bytes += size
+
+            # Evict least recently used entries until back under budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self.evictions += 1
+                logger.debug(f"Evicted index for {evicted_key} from cache")
+
+        return index, mapping
+
+    def _load(self, index_path, mapping_path, signature):
+        index_size, _, mapping_size, _ = signature
+
+        mmapped = False
+        if self.mmap_threshold and index_size >= self.mmap_threshold:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+                mmapped = True
+            except Exception as e:
+                logger.warning(f"Memory-mapped load of {index_path} failed, reading normally: {e}")
+                index = faiss.read_index(index_path)
+        else:
+            index = faiss.read_index(index_path)
+
+        with open(mapping_path, 'rb') as f:
+            mapping = pickle.load(f)
+
+        size = mapping_size if mmapped else index_size + mapping_size
+        return index, mapping, size, mmapped
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+
+    def invalidate(self, key) -> None:
+        """Drop a cached entry, e.g. after its files have been rewritten"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Get cache counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'mmapped_entries': sum(1 for entry in self._entries.values() if entry['mmapped']),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,198 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app import db
+from app.models.document import Document, IngestionJob
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class IngestionPipeline:
+    """Runs document ingestion (extract, sanitize, chunk, persist, embed, questions) on a local worker pool
+
+    Job state is stored in the database so any web worker can answer status
+    requests, while the stages themselves run on threads of the worker that
+    accepted the upload.
+    """
+
+    def __init__(self, max_workers=2, embed=True, questions=False):
+        self.max_workers = max_workers
+        self.embed = embed
+        self.questions = questions
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+        logger.info(f"Initialized IngestionPipeline with {max_workers} workers")
+
+    def submit(self, app, document: Document) -> IngestionJob:
+        """Create a job for a saved document and queue it for processing"""
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            document_id=document.id,
+            user_id=document.user_id,
+            status='queued',
+            stages=IngestionJob.initial_stages()
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.executor.submit(self._run_job, app, job.id)
+        logger.info(f"Queued ingestion job {job.id} for document {document.id}")
+        return job
+
+    def get_job(self, job_id: str, user_id: int) -> Optional[IngestionJob]:
+        """Get a job owned by the given user"""
+        return IngestionJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+    def _run_job(self, app, job_id):
+        """Worker entry point: run every stage inside a fresh app context"""
+        with app.app_context():
+            try:
+                self._process(app, job_id)
+            except Exception as e:
+                logger.exception(f"Ingestion job {job_id} crashed: {e}")
+                db.session.rollback()
+                self._finish_job(job_id, 'failed', str(e))
+            finally:
+                db.session.remove()
+
+    def _process(self, app, job_id):
+        job = IngestionJob.query.get(job_id)
+        if not job:
+            logger.error(f"Ingestion job {job_id} not found")
+            return
+
+        document = Document.query.get(job.document_id)
+        if not document:
+            self._finish_job(job_id, 'failed', "Document not found")
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        document_processor = app.services.get('document_processor')
+        if not document_processor:
+            self._finish_job(job_id, 'failed', "Document processing service unavailable")
+            return
+
+        # Extract
+        text, error = self._run_stage(job_id, 'extract', lambda: self._extract(document_processor, document))
+        if error:
+            self._finish_job(job_id, 'failed', error)
+            return
+
+        # Sanitize
+        text, error = self._run_stage(job_id, 'sanitize', lambda: self._sanitize(document_processor, text))
+        if error:
+            self._finish_job(job_id, 'failed', error)
+            return
+
+        # Chunk
+        chunks, error = self._run_stage(job_id, 'chunk', lambda: self._chunk(document_processor, document, text))
+        if error:
+            self._finish_job(job_id, 'failed', error)
+            return
+
+        # Persist
+        _, error = self._run_stage(job_id, 'persist', lambda: self._persist(document_processor, document, chunks))
+        if error:
+            self._finish_job(job_id, 'failed', error)
+            return
+
+        # Embed - the document is already usable without an index, so a
+        # failure here is recorded on the stage but does not fail the job
+        embeddings_service = app.services.get('embeddings_service')
+        if not self.embed or not embeddings_service or not chunks:
+            self._update_stage(job_id, 'embed', status='skipped')
+        else:
+            self._run_stage(job_id, 'embed', lambda: self._embed(embeddings_service, document))
+
+        # Questions - pre-generate the document's question pool; optional like embed
+        question_generator = app.services.get('question_generator')
+        if not self.questions or not question_generator or not chunks:
+            self._update_stage(job_id, 'questions', status='skipped')
+        else:
+            self._run_stage(job_id, 'questions', lambda: self._questions(question_generator, document))
+
+        self._finish_job(job_id, 'completed')
+
+    def _extract(self, document_processor, document):
+        text, error = document_processor.extract_text(document)
+        if error:
+            return None, error, {}
+        return text, None, {'characters': len(text or '')}
+
+    def _sanitize(self, document_processor, text):
+        text = document_processor.prepare_text(text)
+        return text, None, {'characters': len(text)}
+
+    def _chunk(self, document_processor, document, text):
+        chunks = document_processor._split_into_chunks(text, document.id)
+        return chunks, None, {'chunks': len(chunks)}
+
+    def _persist(self, document_processor, document, chunks):
+        success, error = document_processor._persist_chunks(document.id, chunks)
+        return success, error, {'chunks': len(chunks)}
+
+    def _embed(self, embeddings_service, document):
+        success, error = embeddings_service.create_document_index(document.id)
+        return success, error, {}
+
+    def _questions(self, question_generator, document):
+        stats = question_generator.fill_question_pool(document.id)
+        return stats, None, stats
+
+    def _run_stage(self, job_id, name, func) -> Tuple[object, Optional[str]]:
+        """Run one stage, recording its status, timing and counters on the job"""
+        self._update_stage(job_id, name, status='running', started_at=datetime.utcnow().isoformat())
+        started = time.perf_counter()
+
+        try:
+            result, error, details = func()
+        except Exception as e:
+            logger.exception(f"Ingestion stage {name} failed for job {job_id}")
+            db.session.rollback()
+            result, error, details = None, str(e), {}
+
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self._update_stage(
+            job_id, name,
+            status='failed' if error else 'completed',
+            finished_at=datetime.utcnow().isoformat(),
+            duration_ms=duration_ms,
+            error=error,
+            **details
+        )
+        logger.info(f"Ingestion job {job_id}: stage {name} {'failed' if error else 'completed'} in {duration_ms} ms")
+        return result, error
+
+    def _update_stage(self, job_id, name, **changes):
+        job = IngestionJob.query.get(job_id)
+        if not job:
+            return
+
+        # Reassign the JSON column so SQLAlchemy notices the change
+        stages = dict(job.stages or IngestionJob.initial_stages())
+        stage = dict(stages.get(name, {}))
+        stage.update({key: value for key, value in changes.items() if value is not None})
+        stages[name] = stage
+        job.stages = stages
+        db.session.commit()
+
+    def _finish_job(self, job_id, status, error=None):
+        job = IngestionJob.query.get(job_id)
+        if not job:
+            return
+
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        if error:
+            logger.error(f"Ingestion job {job_id} {status}: {error}")
+        else:
+            logger.info(f"Ingestion job {job_id} {status}")
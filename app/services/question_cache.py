@@ -0,0 +1,170 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import func
+
+from app import db
+from app.models.document import QuestionCandidate
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class QuestionCache:
+    """Durable cache of generated questions keyed by chunk content hash, question type and difficulty
+
+    Candidates are rows in the question_candidate table, so they survive
+    restarts and are shared by every worker and by every document with the
+    same chunk text (the same file uploaded by different users, for
+    example). Each key keeps up to max_per_key candidates, and the least
+    recently served are dropped first. Candidates unused for ttl_seconds,
+    and the least recently used beyond max_entries, are evicted. take() and
+    add() only stage changes in the session, so the caller commits them
+    together with the questions built from them.
+    """
+
+    # Check the TTL and size budget after this many additions
+    EVICT_EVERY = 32
+
+    def __init__(self, max_per_key=6, ttl_seconds=30 * 24 * 3600, max_entries=200000):
+        self.max_per_key = max(1, max_per_key)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'added': 0, 'evictions': 0}
+        self._adds = 0
+
+        logger.info(f"Initialized QuestionCache with {self.max_per_key} candidates per key, {ttl_seconds}s TTL "
+                    f"and {max_entries} entry budget")
+
+    def take(self, content_hashes: Set[str], wanted: Dict[Tuple[str, str], int],
+             exclude: Set[str] = None) -> Dict[Tuple[str, str], List[Tuple[str, Dict]]]:
+        """Get up to the wanted number of cached questions per (question type, difficulty) from any of the chunks
+
+        Returns (content_hash, question) pairs. Candidates whose question text
+        is in exclude (typically questions the user already has) are used last;
+        otherwise the least recently served come first, so repeat requests
+        rotate through the pool, and picks are spread over different chunks.
+        """
+        exclude = exclude or set()
+        if not content_hashes or not wanted:
+            return {}
+
+        candidates = {}
+        hashes = list(content_hashes)
+        for start in range(0, len(hashes), 500):
+            rows = QuestionCandidate.query.filter(QuestionCandidate.content_hash.in_(hashes[start:start + 500])).all()
+            for row in rows:
+                if (row.question_type, row.difficulty) in wanted:
+                    candidates.setdefault((row.question_type, row.difficulty), []).append(row)
+
+        now = datetime.utcnow()
+        served = {}
+        hits = 0
+        for key, count in wanted.items():
+            ordered = sorted(candidates.get(key, []), key=lambda row: (row.data.get('question') in exclude,
+                                                                       row.last_used_at or datetime.min))
+            # One per chunk first, then fill up from the rest
+            chosen = []
+            used_hashes = set()
+            for row in ordered:
+                if len(chosen) < count and row.content_hash not in used_hashes:
+                    chosen.append(row)
+                    used_hashes.add(row.content_hash)
+            chosen += [row for row in ordered if row not in chosen][:count - len(chosen)]
+
+            for row in chosen:
+                row.last_used_at = now
+                row.times_served = (row.times_served or 0) + 1
+            if chosen:
+                served[key] = [(row.content_hash, dict(row.data)) for row in chosen]
+            hits += len(chosen)
+
+        with self._lock:
+            self._counters['hits'] += hits
+            self._counters['misses'] += sum(wanted.values()) - hits
+        return served
+
+    def unserved_counts(self, content_hashes: Set[str]) -> Dict[Tuple[str, str, str], int]:
+        """Count candidates never served yet per (content hash, question type, difficulty)"""
+        counts = {}
+        hashes = list(content_hashes)
+        for start in range(0, len(hashes), 500):
+            rows = db.session.query(
+                QuestionCandidate.content_hash, QuestionCandidate.question_type, QuestionCandidate.difficulty,
+                func.count(QuestionCandidate.id)
+            ).filter(
+                QuestionCandidate.content_hash.in_(hashes[start:start + 500]),
+                QuestionCandidate.times_served == 0
+            ).group_by(
+                QuestionCandidate.content_hash, QuestionCandidate.question_type, QuestionCandidate.difficulty
+            ).all()
+            for content_hash, question_type, difficulty, count in rows:
+                counts[(content_hash, question_type, difficulty)] = count
+        return counts
+
+    def add(self, generated: Dict[Tuple[str, str, str], List[Dict]]) -> None:
+        """Stage newly generated questions per (content hash, type, difficulty), trimming each key to max_per_key"""
+        added = 0
+        for (content_hash, question_type, difficulty), questions in generated.items():
+            for question in questions:
+                db.session.add(QuestionCandidate(content_hash=content_hash, question_type=question_type,
+                                                 difficulty=difficulty, data=question))
+                added += 1
+        if not added:
+            return
+        db.session.flush()
+
+        trimmed = 0
+        for content_hash, question_type, difficulty in generated:
+            stale = db.session.query(QuestionCandidate.id).filter_by(
+                content_hash=content_hash, question_type=question_type, difficulty=difficulty
+            ).order_by(QuestionCandidate.last_used_at.desc(), QuestionCandidate.id.desc()).offset(self.max_per_key).all()
+            if stale:
+                trimmed += QuestionCandidate.query.filter(QuestionCandidate.id.in_([row.id for row in stale])) \
+                    .delete(synchronize_session=False)
+
+        with self._lock:
+            self._counters['added'] += added
+            self._counters['evictions'] += trimmed
+            self._adds += added
+            check = self._adds >= self.EVICT_EVERY
+            if check:
+                self._adds = 0
+        if check:
+            self.evict(commit=False)
+
+    def evict(self, commit=True) -> int:
+        """Drop candidates unused for the TTL, then least recently used ones beyond max_entries"""
+        removed = QuestionCandidate.query.filter(
+            QuestionCandidate.last_used_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        ).delete(synchronize_session=False)
+
+        excess = QuestionCandidate.query.count() - self.max_entries
+        if excess > 0:
+            oldest = db.session.query(QuestionCandidate.id).order_by(QuestionCandidate.last_used_at).limit(excess).all()
+            for start in range(0, len(oldest), 500):
+                batch = [row.id for row in oldest[start:start + 500]]
+                removed += QuestionCandidate.query.filter(QuestionCandidate.id.in_(batch)) \
+                    .delete(synchronize_session=False)
+
+        if commit:
+            db.session.commit()
+        if removed:
+            with self._lock:
+                self._counters['evictions'] += removed
+            logger.info(f"Evicted {removed} cached questions")
+        return removed
+
+    def stats(self) -> Dict:
+        """Get hit rate for this process and current size"""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['entries'] = QuestionCandidate.query.count()
+        stats['max_entries'] = self.max_entries
+        stats['max_per_key'] = self.max_per_key
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
@@ -1,37 +1,82 @@
 import json
 import re
-import requests
 import logging
 import random
 import hashlib
+import math
 from typing import Dict, List, Tuple, Optional, Any
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
 
+import numpy as np
+
 from app import db
 from app.models.document import Document, Question, DocumentChunk
 from app.utils.api_utils import log_api_access
+from app.utils.http_client import get_http_client
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# How each question type is described and shaped in multi-question prompts
+QUESTION_FORMATS = {
+    'mcq': {
+        'name': 'multiple-choice questions',
+        'guidelines': 'Give exactly 4 distinct, plausible, mutually exclusive options with exactly one correct answer.',
+        'shape': '{"question": "...", "options": {"A": "...", "B": "...", "C": "...", "D": "..."}, "answer": "A"}'
+    },
+    'qa': {
+        'name': 'questions with detailed answers',
+        'guidelines': 'Questions should require analysis, not a one-word answer; answers should fully explain the concept.',
+        'shape': '{"question": "...", "answer": "..."}'
+    },
+    'true_false': {
+        'name': 'True/False statements',
+        'guidelines': 'Each statement must be clearly true or false from the context; false ones should be plausibly false.',
+        'shape': '{"statement": "...", "answer": "True or False", "explanation": "..."}'
+    },
+    'fill_in_blank': {
+        'name': 'fill-in-the-blank questions',
+        'guidelines': 'Replace one significant term with _____; the answer must be clear and specific.',
+        'shape': '{"question": "Sentence with _____", "answer": "...", "explanation": "..."}'
+    }
+}
+
+# Difficulty levels pre-generated for the question pool
+POOL_DIFFICULTIES = ['easy', 'medium', 'hard']
+
 class QuestionGenerator:
     """Service for generating questions using Claude API"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, single_flight=None, max_concurrency=4, questions_per_call=3, question_cache=None,
+                 pool_chunks=8, pool_per_difficulty=1, pool_types=None, pool_max_calls=24, duplicate_similarity=0.95):
         self.api_key = api_key
         self.claude_api_url = "https://api.anthropic.com/v1/messages"
-        self.headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        # Cache for previously generated questions to avoid duplicates
-        self.question_cache = {}
-        logger.info("Initialized QuestionGenerator with Claude API and caching")
+        self.single_flight = single_flight
+        self.questions_per_call = max(1, questions_per_call)
+        # Shared by all requests in the process, so this bounds concurrent generation calls
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix='questions')
+        # Durable cache of generated questions shared across workers and documents
+        self.question_cache = question_cache
+        # Chunks at least this cosine-similar to an already selected chunk are not selected
+        self.duplicate_similarity = duplicate_similarity
+        
+        # Pre-generated question pool per document, filled at ingest and topped up in the background
+        self.pool_chunks = pool_chunks
+        self.pool_per_difficulty = pool_per_difficulty
+        self.pool_types = pool_types or ['mcq', 'qa', 'true_false', 'fill_in_blank']
+        self.pool_max_calls = pool_max_calls
+        # Separate from the generation pool, whose workers the top-ups wait on
+        self.pool_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='question-pool')
+        self._pool_pending = set()
+        self._pool_lock = threading.Lock()
+        logger.info(f"Initialized QuestionGenerator with Claude API and caching, {max_concurrency} concurrent calls "
+                    f"of up to {self.questions_per_call} questions")
     
     def _call_claude_api(self, prompt, max_tokens=1000, temperature=0.7, model="claude-3-opus-20240229"):
-        """Make an API call to Claude"""
+        """Make an API call to Claude, sharing one call among identical requests already in flight"""
         payload = {
             "model": model,
             "max_tokens": max_tokens,
@@ -41,8 +86,16 @@ class QuestionGenerator:
             ]
         }
         
+        if self.single_flight:
+            return self.single_flight.fetch('question_generator', payload, lambda: self._post(payload))
+        return self._post(payload)
+    
+    def _post(self, payload):
+        """Send a payload to the Claude API and return the decoded response"""
+        response = None
         try:
-            response = requests.post(self.claude_api_url, json=payload, headers=self.headers)
+            response = get_http_client().post(self.claude_api_url, json=payload, api_key=self.api_key,
+                                              operation='question_generator')
             response.raise_for_status()
             log_api_access("claude_question_api", True)
             return response.json()
@@ -88,14 +141,6 @@ class QuestionGenerator:
         try:
             logger.info(f"Generating MCQ from context of length: {len(context)}")
             
-            # Generate a hash for the context
-            context_hash = self._get_content_hash(context)
-            
-            # Check cache first
-            if context_hash in self.question_cache and 'mcq' in self.question_cache[context_hash]:
-                logger.info("Using cached MCQ")
-                return self.question_cache[context_hash]['mcq']
-            
             # Limit context length to prevent API issues
             if len(context) > 2000:
                 logger.info(f"Context too long ({len(context)} chars), truncating to 2000")
@@ -146,11 +191,6 @@ Context:
                 difficulty = self._determine_difficulty(parsed['question'], parsed['answer'])
                 parsed['difficulty'] = difficulty
             
-            # Cache the result
-            if context_hash not in self.question_cache:
-                self.question_cache[context_hash] = {}
-            self.question_cache[context_hash]['mcq'] = parsed
-            
             return parsed
         
         except Exception as e:
@@ -297,6 +337,105 @@ Context:
             logger.exception(f"Error generating fill-in-the-blank question: {str(e)}")
             return {}
     
+    def generate_questions(self, context: str, question_type: str, difficulties: List[str]) -> List[Dict]:
+        """Generate several questions of one type from context in a single call, one per requested difficulty
+        
+        Returns parsed questions shaped like the single-question generators' results (possibly fewer
+        than requested if some could not be parsed).
+        """
+        try:
+            question_format = QUESTION_FORMATS[question_type]
+            count = len(difficulties)
+            logger.info(f"Generating {count} {question_type} questions from context of length: {len(context)}")
+            
+            # Limit context length to prevent API issues
+            if len(context) > 2000:
+                logger.info(f"Context too long ({len(context)} chars), truncating to 2000")
+                context = context[:2000]
+            
+            levels = '\n'.join(f"{i + 1}. {difficulty}" for i, difficulty in enumerate(difficulties))
+            prompt = f"""
+Based on the context below, create exactly {count} high-quality {question_format['name']}.
+
+IMPORTANT GUIDELINES:
+1. Each question must test a different, significant concept from the context, not trivial details
+2. Focus on understanding rather than mere recall, and use different wording than the original text
+3. {question_format['guidelines']}
+4. Match each question to its difficulty level, in this order:
+{levels}
+
+Respond with only a JSON array of {count} objects, each shaped like:
+{question_format['shape']}
+
+Context:
+"""
+            prompt += context
+            
+            response = self._call_claude_api(prompt, max_tokens=min(4096, 150 + 350 * count), temperature=0.7)
+            
+            if 'content' not in response or len(response['content']) == 0:
+                logger.error("Invalid response from Claude API")
+                return []
+            
+            parsed = self._parse_questions_response(response['content'][0]['text'], question_type)
+            logger.info(f"Generated {len(parsed)} of {count} {question_type} questions")
+            return parsed[:count]
+        
+        except Exception as e:
+            logger.exception(f"Error generating {question_type} questions: {str(e)}")
+            return []
+    
+    def _parse_questions_response(self, response: str, question_type: str) -> List[Dict]:
+        """Parse a JSON array of questions from Claude API, skipping malformed entries"""
+        logger.debug(f"Parsing {question_type} questions response: {response[:100]}...")
+        
+        match = re.search(r'\[.*\]', response, re.DOTALL)
+        if not match:
+            logger.warning(f"No JSON array in {question_type} questions response")
+            return []
+        
+        try:
+            items = json.loads(match.group(0))
+        except ValueError as e:
+            logger.warning(f"Failed to parse {question_type} questions response: {str(e)}")
+            return []
+        
+        questions = []
+        for item in items:
+            parsed = self._normalize_question(item, question_type) if isinstance(item, dict) else {}
+            if parsed:
+                questions.append(parsed)
+            else:
+                logger.warning(f"Skipping malformed {question_type} question in response")
+        return questions
+    
+    def _normalize_question(self, item: Dict, question_type: str) -> Dict:
+        """Validate one question from a JSON response and shape it like the single-question parsers"""
+        question = str(item.get('question') or item.get('statement') or '').strip()
+        answer = item.get('answer')
+        answer = str(answer).strip() if answer is not None else ''
+        if not question or not answer:
+            return {}
+        
+        result = {'question': question, 'answer': answer, 'question_type': question_type}
+        if question_type == 'mcq':
+            options = item.get('options')
+            if not isinstance(options, dict):
+                return {}
+            options = {str(key).strip().upper(): str(value).strip() for key, value in options.items()}
+            answer = answer.upper()
+            if len(options) != 4 or answer not in options:
+                return {}
+            result.update(options=options, answer=answer)
+        elif question_type == 'true_false':
+            if answer.lower() not in ('true', 'false'):
+                return {}
+            result.update(answer=answer.capitalize(), options={'True': 'True', 'False': 'False'})
+        
+        if question_type in ('true_false', 'fill_in_blank'):
+            result['explanation'] = str(item.get('explanation') or '').strip()
+        return result
+    
     def _parse_mcq_response(self, response: str) -> Dict:
         """Parse MCQ response from Claude API"""
         logger.debug(f"Parsing MCQ response: {response[:100]}...")
@@ -436,8 +575,13 @@ Context:
     def generate_questions_for_document(self, document_id: int, user_id: int, 
                                       question_type: str = 'mcq', 
                                       count: int = None,
-                                      difficulty_levels: List[str] = None) -> Tuple[List[Dict], Optional[str]]:
-        """Generate questions for a document with improved caching and variety"""
+                                      difficulty_levels: List[str] = None,
+                                      use_cache: bool = True) -> Tuple[List[Dict], Optional[str]]:
+        """Generate questions for a document with improved caching and variety
+        
+        Questions already generated for the same chunk text are reused from the question
+        cache unless use_cache is False.
+        """
         document = Document.query.filter_by(id=document_id).first()
         if not document:
             return [], "Document not found"
@@ -500,12 +644,7 @@ Context:
             if not chunks:
                 return [], "Failed to extract text or create chunks for this document"
             
-            # Improved chunk selection for diverse questions
-            selected_chunks = self._select_diverse_chunks(chunks, count, max_chunks=10)
-            
             # Balance question types if mixed
-            questions = []
-            
             if question_type == 'mixed':
                 # Distribute among different question types
                 types = ['mcq', 'qa', 'true_false', 'fill_in_blank']
@@ -520,23 +659,40 @@ Context:
                     if remainder > 0:
                         type_counts[t] += 1
                         remainder -= 1
-                
-                # Generate each type with balanced difficulties
-                for qtype, qcount in type_counts.items():
-                    if qcount <= 0:
-                        continue
-                    
-                    # Distribute questions across difficulty levels
-                    difficulty_counts = self._distribute_by_difficulty(qcount, difficulty_levels)    
-                    for difficulty, diff_count in difficulty_counts.items():
-                        batch = self._generate_questions_batch(selected_chunks, user_id, qtype, diff_count, difficulty)
-                        questions.extend(batch)
             else:
-                # Generate single type with balanced difficulties
-                difficulty_counts = self._distribute_by_difficulty(count, difficulty_levels)
-                for difficulty, diff_count in difficulty_counts.items():
-                    batch = self._generate_questions_batch(selected_chunks, user_id, question_type, diff_count, difficulty)
-                    questions.extend(batch)
+                type_counts = {question_type: count}
+            
+            # Balance difficulties within each type
+            targets = {
+                qtype: self._distribute_by_difficulty(qcount, difficulty_levels)
+                for qtype, qcount in type_counts.items() if qcount > 0
+            }
+            
+            # Reuse questions already generated for this document's chunk texts
+            questions = []
+            if self.question_cache and use_cache:
+                questions = self._take_cached_questions(chunks, targets, user_id)
+            
+            # Generate the rest across chunks concurrently
+            remaining = sum(sum(difficulty_counts.values()) for difficulty_counts in targets.values())
+            generated = {}
+            if remaining:
+                # Improved chunk selection for diverse questions
+                selected_chunks = self._select_diverse_chunks(chunks, remaining, max_chunks=10)
+                calls = self._plan_question_calls(selected_chunks, targets)
+                new_questions, generated = self._generate_questions_concurrently(calls, user_id)
+                questions.extend(new_questions)
+            
+            # Save questions and new cache entries in one transaction
+            if questions:
+                try:
+                    db.session.add_all(questions)
+                    if self.question_cache:
+                        self.question_cache.add(generated)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    raise
             
             # Check if any questions were generated
             if not questions:
@@ -566,96 +722,282 @@ Context:
                 
         return result
     
-    def _generate_questions_batch(self, chunks, user_id, question_type, count, target_difficulty=None):
-        """Generate a batch of questions of a specific type and difficulty with caching"""
-        questions = []
-        chunks_used = set()
+    def _plan_question_calls(self, chunks: List[DocumentChunk], targets: Dict[str, Dict[str, int]]) -> List[Dict]:
+        """Split the wanted questions into API calls of up to questions_per_call questions on one chunk each
         
-        # Try using each chunk
-        for chunk in chunks:
-            # Skip if we've generated enough questions
-            if len(questions) >= count:
-                break
-                
-            # Generate a question based on type
-            question_data = None
-            context = chunk.chunk_text
-            context_hash = self._get_content_hash(context)
-            
-            # Check if we've already used this content hash
-            if context_hash in chunks_used:
-                continue
-                
-            # Check if cached
-            cached = False
-            if context_hash in self.question_cache and question_type in self.question_cache[context_hash]:
-                question_data = self.question_cache[context_hash][question_type]
-                cached = True
-                logger.info(f"Using cached {question_type} question")
-            
-            # Generate if not cached
-            if not cached:
-                if question_type == 'mcq':
-                    question_data = self.generate_mcq(context)
-                elif question_type == 'qa':
-                    question_data = self.generate_qa(context)
-                elif question_type == 'true_false':
-                    question_data = self.generate_true_false(context)
-                elif question_type == 'fill_in_blank':
-                    question_data = self.generate_fill_in_blank(context)
-            
-            # Skip if generation failed
-            if not question_data or 'question' not in question_data:
+        Each question type starts where the previous one stopped, so a mixed quiz spreads
+        over as many chunks as possible. Difficulties are interleaved across a type's calls.
+        """
+        calls = []
+        next_chunk = 0
+        
+        for qtype, difficulty_counts in targets.items():
+            difficulties = [level for level, level_count in difficulty_counts.items() for _ in range(level_count)]
+            if not difficulties:
                 continue
-                
-            # Skip if difficulty doesn't match target (if specified)
-            question_difficulty = question_data.get('difficulty', 'medium')
-            if target_difficulty and question_difficulty != target_difficulty:
-                # Try to adjust difficulty if possible
-                if 'question' in question_data and 'answer' in question_data:
-                    question_data['difficulty'] = target_difficulty
-            
-            # Create question object
+            
+            # With few chunks, calls carry more than questions_per_call questions each
+            call_count = min(len(chunks), math.ceil(len(difficulties) / self.questions_per_call))
+            for i in range(call_count):
+                chunk = chunks[(next_chunk + i) % len(chunks)]
+                calls.append({
+                    'context': chunk.chunk_text,
+                    'content_hash': self._get_content_hash(chunk.chunk_text),
+                    'document_id': chunk.document_id,
+                    'question_type': qtype,
+                    'difficulties': difficulties[i::call_count]
+                })
+            next_chunk += call_count
+        
+        return calls
+    
+    def _take_cached_questions(self, chunks: List[DocumentChunk], targets: Dict[str, Dict[str, int]],
+                               user_id: int) -> List[Question]:
+        """Build questions from the question cache for any of the document's chunks
+        
+        Counts served from the cache are subtracted from targets, leaving what still has to be generated.
+        """
+        hashes = {self._get_content_hash(chunk.chunk_text) for chunk in chunks}
+        wanted = {(qtype, difficulty): level_count
+                  for qtype, difficulty_counts in targets.items()
+                  for difficulty, level_count in difficulty_counts.items() if level_count > 0}
+        existing = db.session.query(Question.question_text).filter_by(document_id=chunks[0].document_id, user_id=user_id)
+        cached = self.question_cache.take(hashes, wanted, exclude={row.question_text for row in existing})
+        
+        questions = []
+        for (qtype, difficulty), entries in cached.items():
+            targets[qtype][difficulty] -= len(entries)
+            call = {'question_type': qtype, 'document_id': chunks[0].document_id}
+            for content_hash, question_data in entries:
+                questions.append(self._build_question(dict(call, content_hash=content_hash), question_data, difficulty, user_id))
+        
+        logger.info(f"Took {len(questions)} questions from the question cache")
+        return questions
+    
+    def _generate_questions_concurrently(self, calls: List[Dict], user_id: int) -> Tuple[List[Question], Dict]:
+        """Run planned generation calls on the shared pool
+        
+        Returns the unsaved questions and the parsed questions per (content hash, type, difficulty)
+        for the question cache.
+        """
+        questions = []
+        generated = {}
+        for call, parsed in self._run_generation_calls(calls):
+            # Questions come back in the order of the requested difficulties
+            for question_data, difficulty in zip(parsed, call['difficulties']):
+                questions.append(self._build_question(call, question_data, difficulty, user_id))
+                generated.setdefault((call['content_hash'], call['question_type'], difficulty), []).append(question_data)
+        return questions, generated
+    
+    def _run_generation_calls(self, calls: List[Dict]) -> List[Tuple[Dict, List[Dict]]]:
+        """Run generation calls on the shared pool, returning (call, parsed questions) pairs"""
+        started = time.perf_counter()
+        futures = [
+            self.executor.submit(self.generate_questions, call['context'], call['question_type'], call['difficulties'])
+            for call in calls
+        ]
+        results = [(call, future.result()) for call, future in zip(calls, futures)]
+        
+        logger.info(f"Generated {sum(len(parsed) for _, parsed in results)} questions in {len(calls)} calls "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return results
+    
+    def fill_question_pool(self, document_id: int) -> Dict:
+        """Pre-generate unserved questions for a document into the question cache
+        
+        Each type and difficulty on up to pool_chunks diverse chunks is topped up to
+        pool_per_difficulty candidates that have not been served yet, spending at most
+        what is left of the document's budget of pool_max_calls upstream calls.
+        Returns counters for the run.
+        """
+        if not self.question_cache:
+            return {'calls': 0, 'questions': 0, 'reason': 'question cache disabled'}
+        
+        chunks = DocumentChunk.query.filter_by(document_id=document_id).all()
+        selected = {}
+        for chunk in self._select_diverse_chunks(chunks, self.pool_chunks, self.pool_chunks):
+            selected.setdefault(self._get_content_hash(chunk.chunk_text), chunk)
+        unserved = self.question_cache.unserved_counts(set(selected))
+        
+        calls = []
+        for content_hash, chunk in selected.items():
+            for qtype in self.pool_types:
+                missing = [difficulty for difficulty in POOL_DIFFICULTIES
+                           for _ in range(self.pool_per_difficulty - unserved.get((content_hash, qtype, difficulty), 0))]
+                for start in range(0, len(missing), self.questions_per_call):
+                    calls.append({
+                        'context': chunk.chunk_text,
+                        'content_hash': content_hash,
+                        'document_id': document_id,
+                        'question_type': qtype,
+                        'difficulties': missing[start:start + self.questions_per_call]
+                    })
+        
+        wanted = len(calls)
+        calls = calls[:self._reserve_pool_calls(document_id, wanted)] if calls else []
+        
+        generated = {}
+        for call, parsed in self._run_generation_calls(calls) if calls else []:
+            for question_data, difficulty in zip(parsed, call['difficulties']):
+                generated.setdefault((call['content_hash'], call['question_type'], difficulty), []).append(question_data)
+        
+        if generated:
             try:
-                # Create options JSON for appropriate question types
-                options_json = None
-                if question_type == 'mcq' and 'options' in question_data:
-                    options_json = json.dumps(question_data['options'])
-                elif question_type == 'fill_in_blank' and 'options' in question_data:
-                    options_json = json.dumps(question_data['options'])
-                
-                # Create the question with specified difficulty
-                question = Question(
-                    question_text=question_data['question'],
-                    question_type=question_type,
-                    options=options_json,
-                    answer=question_data.get('answer', ''),
-                    document_id=chunk.document_id,
-                    user_id=user_id,
-                    difficulty=question_data.get('difficulty', 'medium') if not target_difficulty else target_difficulty,
-                    content_hash=context_hash
-                )
-                
-                db.session.add(question)
+                self.question_cache.add(generated)
                 db.session.commit()
-                
-                questions.append(question)
-                chunks_used.add(context_hash)
-                
-                # Add delay to avoid rate limiting
-                time.sleep(0.5)
-                
+            except Exception:
+                db.session.rollback()
+                raise
+        
+        stats = {
+            'chunks': len(selected),
+            'calls': len(calls),
+            'deferred_calls': wanted - len(calls),
+            'questions': sum(len(questions) for questions in generated.values())
+        }
+        logger.info(f"Filled question pool for document {document_id}: {stats}")
+        return stats
+    
+    def _reserve_pool_calls(self, document_id: int, wanted: int) -> int:
+        """Take up to wanted calls from the document's pool budget, returning how many were granted"""
+        # Optimistic update so concurrent workers can't overspend the budget
+        for _ in range(5):
+            spent = db.session.query(Document.question_pool_calls).filter_by(id=document_id).scalar() or 0
+            granted = min(wanted, self.pool_max_calls - spent)
+            if granted <= 0:
+                return 0
+            updated = Document.query.filter_by(id=document_id, question_pool_calls=spent) \
+                .update({'question_pool_calls': spent + granted}, synchronize_session=False)
+            db.session.commit()
+            if updated:
+                return granted
+        return 0
+    
+    def schedule_pool_top_up(self, app, document_id: int) -> bool:
+        """Queue a background refill of a document's question pool, unless one is already queued"""
+        with self._pool_lock:
+            if document_id in self._pool_pending:
+                return False
+            self._pool_pending.add(document_id)
+        
+        self.pool_executor.submit(self._top_up_pool, app, document_id)
+        return True
+    
+    def _top_up_pool(self, app, document_id):
+        """Worker entry point: fill the pool inside a fresh app context"""
+        with app.app_context():
+            try:
+                self.fill_question_pool(document_id)
             except Exception as e:
-                logger.exception(f"Error saving question: {str(e)}")
+                logger.exception(f"Question pool top-up failed for document {document_id}: {e}")
                 db.session.rollback()
+            finally:
+                with self._pool_lock:
+                    self._pool_pending.discard(document_id)
+                db.session.remove()
+    
+    def _build_question(self, call: Dict, question_data: Dict, difficulty: str, user_id: int) -> Question:
+        """Create a Question row for a planned call from parsed question data"""
+        # Create options JSON for appropriate question types
+        options_json = None
+        if 'options' in question_data and call['question_type'] in ('mcq', 'fill_in_blank'):
+            options_json = json.dumps(question_data['options'])
         
-        return questions
+        return Question(
+            question_text=question_data['question'],
+            question_type=call['question_type'],
+            options=options_json,
+            answer=question_data.get('answer', ''),
+            document_id=call['document_id'],
+            user_id=user_id,
+            difficulty=difficulty,
+            content_hash=call['content_hash']
+        )
     
     def _select_diverse_chunks(self, chunks: List[DocumentChunk], desired_count: int, max_chunks: int) -> List[DocumentChunk]:
-        """Select diverse chunks from document for question generation"""
+        """Select diverse chunks from document for question generation
+        
+        Chunks with the same text are considered once. When the document's chunk
+        vectors are available without an embeddings call, the chunks are clustered
+        and the one nearest each cluster centre is picked, skipping near-duplicates;
+        otherwise chunks are sampled from equal sections of the document.
+        """
         if not chunks:
             return []
-            
+        
+        # Identical chunk texts would only produce the same questions again
+        unique = {}
+        for chunk in sorted(chunks, key=lambda x: x.chunk_index):
+            unique.setdefault(self._get_content_hash(chunk.chunk_text), chunk)
+        if len(unique) < len(chunks):
+            logger.info(f"Skipping {len(chunks) - len(unique)} chunks with duplicate text")
+        chunks = list(unique.values())
+        
+        count = min(desired_count, max_chunks)
+        if len(chunks) > 1 and count > 0:
+            vectors = self._get_chunk_vectors(chunks)
+            if vectors is not None:
+                result = self._select_chunks_by_clusters(chunks, vectors, count)
+                random.shuffle(result)
+                return result
+        
+        return self._select_chunks_by_position(chunks, desired_count, max_chunks)
+    
+    def _get_chunk_vectors(self, chunks: List[DocumentChunk]) -> Optional[np.ndarray]:
+        """Get stored vectors for a document's chunks, or None when there are none"""
+        from flask import current_app
+        embeddings_service = current_app.services.get('embeddings_service')
+        if not embeddings_service:
+            return None
+        
+        vectors = embeddings_service.get_stored_embeddings(chunks[0].document_id, chunks)
+        if vectors is None or vectors.ndim != 2 or len(vectors) != len(chunks):
+            return None
+        return vectors.astype(np.float32)
+    
+    def _select_chunks_by_clusters(self, chunks: List[DocumentChunk], vectors: np.ndarray, count: int) -> List[DocumentChunk]:
+        """Pick the chunk nearest each k-means centre, skipping near-duplicates of chunks already picked"""
+        unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        count = min(count, len(chunks))
+        rng = np.random.default_rng(random.getrandbits(32))
+        
+        # k-means++ seeding on cosine distance; stops early when every chunk duplicates a centre
+        centres = [unit[rng.integers(len(unit))]]
+        for _ in range(1, count):
+            distance = np.clip(1.0 - np.max(unit @ np.array(centres).T, axis=1), 0.0, None)
+            if distance.sum() <= 1e-6:
+                break
+            centres.append(unit[rng.choice(len(unit), p=distance / distance.sum())])
+        centres = np.array(centres)
+        
+        # Spherical k-means refinement
+        for _ in range(10):
+            labels = np.argmax(unit @ centres.T, axis=1)
+            for k in range(len(centres)):
+                members = unit[labels == k]
+                if len(members):
+                    centre = members.mean(axis=0)
+                    centres[k] = centre / max(np.linalg.norm(centre), 1e-12)
+        labels = np.argmax(unit @ centres.T, axis=1)
+        
+        selected = []
+        skipped = 0
+        for k in range(len(centres)):
+            members = np.flatnonzero(labels == k)
+            if not len(members):
+                continue
+            best = members[np.argmax(unit[members] @ centres[k])]
+            if selected and np.max(unit[selected] @ unit[best]) >= self.duplicate_similarity:
+                skipped += 1
+                continue
+            selected.append(best)
+        
+        logger.info(f"Selected {len(selected)} of {len(chunks)} chunks by embedding clusters"
+                    f"{f', skipped {skipped} near-duplicates' if skipped else ''}")
+        return [chunks[i] for i in selected]
+    
+    def _select_chunks_by_position(self, chunks: List[DocumentChunk], desired_count: int, max_chunks: int) -> List[DocumentChunk]:
+        """Sample chunks from equal sections of the document"""
         # If few chunks available, return all of them
         if len(chunks) <= desired_count:
             return chunks
@@ -700,6 +1042,32 @@ Context:
         if not question:
             return {'error': 'Question not found'}
         
+        return self.grade_answer(question, user_answer)
+    
+    def evaluate_answers(self, answers: List[Tuple[Question, str]]) -> List[Dict]:
+        """Evaluate answers to loaded questions, returning results in the same order
+        
+        Answers graded by the model (QA) are evaluated concurrently on the shared
+        pool; the others are graded in place.
+        """
+        results = [None] * len(answers)
+        futures = {}
+        for i, (question, user_answer) in enumerate(answers):
+            if question.question_type == 'qa':
+                futures[i] = self.executor.submit(self.grade_answer, question, user_answer)
+            else:
+                results[i] = self.grade_answer(question, user_answer)
+        
+        for i, future in futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                logger.exception(f"Error evaluating answer: {str(e)}")
+                results[i] = {'error': 'Error evaluating answer'}
+        return results
+    
+    def grade_answer(self, question: Question, user_answer: str) -> Dict:
+        """Grade a user's answer to a loaded question"""
         # Get correct answer
         correct_answer = question.answer
         
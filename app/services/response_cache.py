@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Persistent cache of model API responses keyed by request payload
+
+    The key is a hash of the full payload (model, prompt and parameters), so
+    any change to the request is a miss. Entries live in a SQLite file shared
+    by all worker processes on the host and expire after ttl_seconds; when
+    the stored bytes exceed max_bytes the least recently used entries are
+    evicted. Hit and miss counters are kept per operation for this process.
+    """
+
+    # Check the size budget after this many writes
+    EVICT_EVERY = 32
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._writes = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response ("
+                "key TEXT PRIMARY KEY, operation TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_accessed_at ON response (accessed_at)")
+
+        logger.info(f"Initialized ResponseCache at {path} with {ttl_seconds}s TTL and {max_bytes} byte budget")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections can't be shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key_for(payload: Dict) -> str:
+        """Hash of a request payload, independent of key order"""
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, operation: str, payload: Dict) -> Optional[Dict]:
+        """Get the cached response for a payload, or None"""
+        key = self.key_for(payload)
+        now = time.time()
+        result = None
+
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT body, expires_at FROM response WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                result = json.loads(zlib.decompress(row[0]))
+                with conn:
+                    conn.execute("UPDATE response SET accessed_at = ? WHERE key = ?", (now, key))
+        except Exception as e:
+            logger.warning(f"Failed to read {operation} response from cache: {e}")
+
+        self._count(operation, 'hits' if result is not None else 'misses')
+        return result
+
+    def put(self, operation: str, payload: Dict, response: Dict) -> None:
+        """Store a response for a payload"""
+        body = zlib.compress(json.dumps(response).encode('utf-8'))
+        now = time.time()
+
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO response (key, operation, body, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.key_for(payload), operation, body, len(body), now + self.ttl_seconds, now)
+                )
+        except Exception as e:
+            logger.warning(f"Failed to write {operation} response to cache: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            check = self._writes % self.EVICT_EVERY == 0
+        if check:
+            self.evict()
+
+    def fetch(self, operation: str, payload: Dict, call: Callable[[], Dict], use_cache: bool = True) -> Dict:
+        """Get the response for a payload from the cache, or from call() (cached if it returns)"""
+        if not use_cache:
+            self._count(operation, 'bypassed')
+            return call()
+
+        cached = self.get(operation, payload)
+        if cached is not None:
+            return cached
+
+        response = call()
+        # Only cache responses that carry generated content
+        if response and response.get('content'):
+            self.put(operation, payload, response)
+        return response
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under the byte budget"""
+        removed = 0
+        try:
+            conn = self._connect()
+            with conn:
+                removed += conn.execute("DELETE FROM response WHERE expires_at <= ?", (time.time(),)).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+                if total > self.max_bytes:
+                    # Walk from the least recently used entry until enough bytes are freed
+                    excess = total - self.max_bytes
+                    freed = 0
+                    keys = []
+                    for key, size in conn.execute("SELECT key, size FROM response ORDER BY accessed_at"):
+                        keys.append(key)
+                        freed += size
+                        if freed >= excess:
+                            break
+                    for start in range(0, len(keys), 500):
+                        batch = keys[start:start + 500]
+                        removed += conn.execute(
+                            f"DELETE FROM response WHERE key IN ({','.join('?' * len(batch))})", batch
+                        ).rowcount
+        except Exception as e:
+            logger.warning(f"Failed to evict cached responses: {e}")
+
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            logger.info(f"Evicted {removed} cached responses")
+        return removed
+
+    def _count(self, operation, counter):
+        with self._lock:
+            counters = self._counters.setdefault(operation, {'hits': 0, 'misses': 0, 'bypassed': 0})
+            counters[counter] += 1
+
+    def stats(self) -> Dict:
+        """Get per-operation hit rates and current usage"""
+        with self._lock:
+            operations = {}
+            for operation, counters in self._counters.items():
+                lookups = counters['hits'] + counters['misses']
+                operations[operation] = dict(counters, hit_rate=round(counters['hits'] / lookups, 4) if lookups else None)
+            evictions = self.evictions
+
+        entries, size = 0, 0
+        try:
+            entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response").fetchone()
+        except Exception as e:
+            logger.warning(f"Failed to read response cache size: {e}")
+
+        return {
+            'operations': operations,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'evictions': evictions
+        }
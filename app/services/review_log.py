@@ -0,0 +1,127 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, List
+
+from app import db
+from app.models.document import ReviewLog, StudyDay
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ReviewLogWriter:
+    """Write-behind buffer for review log rows
+
+    record() only appends rows to an in-memory buffer, so answering a question
+    never waits on the log. A background thread inserts buffered rows in
+    batches every flush_interval seconds, or as soon as batch_size rows are
+    waiting, and once more when the process exits. Each batch also adds its
+    review counts to the daily study rollups in the same transaction. Rows
+    that fail to insert are kept for the next flush; beyond max_buffer rows
+    the oldest are dropped, so a crash or a long database outage can lose
+    recent log rows (never question or SRS state, which are committed with
+    the answer).
+    """
+
+    def __init__(self, batch_size=500, flush_interval=2.0, max_buffer=50000):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+        self._counters = {'recorded': 0, 'written': 0, 'dropped': 0, 'flushes': 0, 'failed_flushes': 0}
+
+        logger.info(f"Initialized ReviewLogWriter with {self.batch_size} row batches every {flush_interval}s")
+
+    def record(self, app, rows: List[Dict]) -> None:
+        """Queue review log rows (as returned by Question.update_srs_data) for writing"""
+        if not rows:
+            return
+
+        with self._lock:
+            self._buffer.extend(rows)
+            self._counters['recorded'] += len(rows)
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self._counters['dropped'] += overflow
+                logger.warning(f"Review log buffer full, dropped {overflow} oldest rows")
+            full = len(self._buffer) >= self.batch_size
+
+            if self._thread is None:
+                self._app = app
+                self._thread = threading.Thread(target=self._run, name='review-log', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write every buffered row now, returning the number written"""
+        if self._app is None:
+            return 0
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._buffer[:self.batch_size]
+                    del self._buffer[:len(batch)]
+                if not batch:
+                    break
+
+                try:
+                    with self._app.app_context():
+                        try:
+                            db.session.execute(ReviewLog.__table__.insert(), batch)
+                            self._roll_up(batch)
+                            db.session.commit()
+                        finally:
+                            db.session.remove()
+                except Exception as e:
+                    # Put the batch back in front of anything recorded meanwhile and retry on the next flush
+                    with self._lock:
+                        self._buffer[:0] = batch
+                        self._counters['failed_flushes'] += 1
+                    logger.warning(f"Failed to write {len(batch)} review log rows: {e}")
+                    break
+
+                written += len(batch)
+                with self._lock:
+                    self._counters['written'] += len(batch)
+                    self._counters['flushes'] += 1
+        return written
+
+    @staticmethod
+    def _roll_up(batch):
+        days = {}
+        for row in batch:
+            key = (row['user_id'], row['reviewed_at'].date(), row['document_id'])
+            counts = days.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if row['is_correct'] else 0
+        for (user_id, day, document_id), (reviews, correct) in days.items():
+            StudyDay.add(user_id, day, document_id, reviews=reviews, correct=correct)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Review log flush crashed: {e}")
+                time.sleep(self.flush_interval)
+
+    def stats(self) -> Dict:
+        """Get row counters and the current buffer size"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['buffered'] = len(self._buffer)
+        return stats
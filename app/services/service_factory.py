@@ -5,6 +5,15 @@ from app.services.question_generator import QuestionGenerator
 from app.services.document_chatbot import DocumentChatbot
 from app.services.study_assistant import StudyAssistant
 from app.services.embeddings import EmbeddingsService
+from app.services.ingestion import IngestionPipeline
+from app.services.text_store import ExtractedTextStore
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from app.services.question_cache import QuestionCache
+from app.services.chat_context import ChatContextBuilder
+from app.services.srs_scheduler import create_scheduler
+from app.services.review_log import ReviewLogWriter
+from app.utils.http_client import configure_http_client
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -13,12 +22,48 @@ def initialize_services(app):
     """Initialize and register all services in the app's service container"""
     logger.info("Initializing services...")
     
+    # Register the shared HTTP client used for all model API calls
+    http_client = configure_http_client(
+        pool_maxsize=app.config['UPSTREAM_POOL_SIZE'],
+        connect_timeout=app.config['UPSTREAM_CONNECT_TIMEOUT'],
+        read_timeout=app.config['UPSTREAM_READ_TIMEOUT'],
+        max_retries=app.config['UPSTREAM_MAX_RETRIES']
+    )
+    app.services.register('http_client', http_client)
+    
+    # Register model response cache
+    response_cache = None
+    if app.config['RESPONSE_CACHE_PATH']:
+        response_cache = ResponseCache(
+            app.config['RESPONSE_CACHE_PATH'],
+            ttl_seconds=app.config['RESPONSE_CACHE_TTL'],
+            max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES']
+        )
+        app.services.register('response_cache', response_cache)
+    
+    # Register request coalescing for identical concurrent model calls
+    single_flight = SingleFlight(
+        app.config['SINGLE_FLIGHT_PATH'] or None,
+        lease_seconds=app.config['SINGLE_FLIGHT_WAIT']
+    )
+    app.services.register('single_flight', single_flight)
+    
+    # Register extracted text store
+    text_store = ExtractedTextStore(app.config['TEXT_STORE_FOLDER'])
+    app.services.register('text_store', text_store)
+    
     # Register document processor
     app.services.register(
         'document_processor',
         DocumentProcessor(
             upload_folder=app.config['UPLOAD_FOLDER'],
-            allowed_extensions=app.config['ALLOWED_EXTENSIONS']
+            allowed_extensions=app.config['ALLOWED_EXTENSIONS'],
+            max_pdf_pages=app.config['MAX_PDF_PAGES'],
+            pdf_extraction_mode=app.config['PDF_EXTRACTION_MODE'],
+            pdf_workers=app.config['PDF_EXTRACTION_WORKERS'],
+            text_store=text_store,
+            response_cache=response_cache,
+            single_flight=single_flight
         )
     )
     
@@ -26,7 +71,41 @@ def initialize_services(app):
     app.services.register(
         'ai_service',
         ClaudeService(
-            api_key=app.config['ANTHROPIC_API_KEY']
+            api_key=app.config['ANTHROPIC_API_KEY'],
+            prompt_caching=app.config['PROMPT_CACHING'],
+            response_cache=response_cache,
+            single_flight=single_flight
+        )
+    )
+    
+    # Register shared cache of generated questions
+    question_cache = None
+    if app.config['QUESTION_CACHE']:
+        question_cache = QuestionCache(
+            max_per_key=app.config['QUESTION_CACHE_PER_KEY'],
+            ttl_seconds=app.config['QUESTION_CACHE_TTL'],
+            max_entries=app.config['QUESTION_CACHE_MAX_ENTRIES']
+        )
+        app.services.register('question_cache', question_cache)
+    
+    # Register spaced-repetition scheduler engine
+    app.services.register(
+        'srs_scheduler',
+        create_scheduler(
+            app.config['SRS_SCHEDULER'],
+            desired_retention=app.config['SRS_DESIRED_RETENTION'],
+            maximum_interval=app.config['SRS_MAXIMUM_INTERVAL'],
+            weights=app.config['SRS_FSRS_WEIGHTS']
+        )
+    )
+    
+    # Register write-behind review log
+    app.services.register(
+        'review_log',
+        ReviewLogWriter(
+            batch_size=app.config['REVIEW_LOG_BATCH_SIZE'],
+            flush_interval=app.config['REVIEW_LOG_FLUSH_INTERVAL'],
+            max_buffer=app.config['REVIEW_LOG_MAX_BUFFER']
         )
     )
     
@@ -34,7 +113,16 @@ def initialize_services(app):
     app.services.register(
         'question_generator',
         QuestionGenerator(
-            api_key=app.config['ANTHROPIC_API_KEY']
+            api_key=app.config['ANTHROPIC_API_KEY'],
+            single_flight=single_flight,
+            max_concurrency=app.config['QUESTION_GEN_CONCURRENCY'],
+            questions_per_call=app.config['QUESTIONS_PER_CALL'],
+            question_cache=question_cache,
+            pool_chunks=app.config['QUESTION_POOL_CHUNKS'],
+            pool_per_difficulty=app.config['QUESTION_POOL_PER_DIFFICULTY'],
+            pool_types=app.config['QUESTION_POOL_TYPES'],
+            pool_max_calls=app.config['QUESTION_POOL_MAX_CALLS'],
+            duplicate_similarity=app.config['QUESTION_DUPLICATE_SIMILARITY']
         )
     )
     
@@ -42,7 +130,8 @@ def initialize_services(app):
     app.services.register(
         'document_chatbot',
         DocumentChatbot(
-            api_key=app.config['ANTHROPIC_API_KEY']
+            api_key=app.config['ANTHROPIC_API_KEY'],
+            prompt_caching=app.config['PROMPT_CACHING']
         )
     )
     
@@ -58,7 +147,43 @@ def initialize_services(app):
     app.services.register(
         'embeddings_service',
         EmbeddingsService(
-            api_key=app.config['ANTHROPIC_API_KEY']
+            api_key=app.config['ANTHROPIC_API_KEY'],
+            embedding_backend=app.config['EMBEDDING_BACKEND'],
+            local_embedding_dim=app.config['LOCAL_EMBEDDING_DIM'],
+            embedding_cache_bytes=app.config['EMBEDDING_CACHE_MAX_BYTES'],
+            embedding_cache_path=app.config['EMBEDDING_CACHE_PATH'] or None,
+            embed_batch_size=app.config['EMBED_BATCH_SIZE'],
+            embed_batch_tokens=app.config['EMBED_BATCH_TOKENS'],
+            embed_max_in_flight=app.config['EMBED_MAX_IN_FLIGHT'],
+            embed_max_retries=app.config['EMBED_MAX_RETRIES'],
+            index_cache_bytes=app.config['INDEX_CACHE_MAX_BYTES'],
+            index_mmap_threshold=app.config['INDEX_MMAP_THRESHOLD'],
+            index_type=app.config['FAISS_INDEX_TYPE'],
+            index_compression=app.config['FAISS_COMPRESSION'],
+            flat_max_vectors=app.config['FAISS_FLAT_MAX_VECTORS']
+        )
+    )
+    
+    # Register document chat context builder (retrieval over chunks)
+    app.services.register(
+        'chat_context',
+        ChatContextBuilder(
+            document_processor=app.services.get('document_processor'),
+            embeddings_service=app.services.get('embeddings_service'),
+            mode=app.config['CHAT_CONTEXT_MODE'],
+            max_context_tokens=app.config['CHAT_CONTEXT_TOKENS'],
+            top_k=app.config['CHAT_RETRIEVAL_TOP_K'],
+            max_history_messages=app.config['CHAT_HISTORY_MESSAGES']
+        )
+    )
+    
+    # Register background ingestion pipeline for uploads
+    app.services.register(
+        'ingestion_pipeline',
+        IngestionPipeline(
+            max_workers=app.config['INGEST_WORKERS'],
+            embed=app.config['INGEST_EMBED'],
+            questions=app.config['QUESTION_POOL']
         )
     )
     
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """One in-process call that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent upstream calls so only one is in flight
+
+    Within a process, the first thread to ask for a key makes the call and
+    other threads with the same key wait for its result. With a SQLite path,
+    the process-level leaders also coordinate across workers on the host:
+    the first worker takes a lease row for the key, the others poll until it
+    publishes the result (or error) and use that instead of calling. Leases
+    expire, so a worker that dies mid-call doesn't block the key for long.
+    Results are only shared with callers that were waiting while the call
+    ran; this is not a cache.
+
+    Results must be JSON-serialisable to be shared across workers.
+    """
+
+    def __init__(self, path=None, lease_seconds=120.0, poll_interval=0.05, result_ttl=60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._counters = {}
+
+        if self.path:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS flight (key TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                             "lease_until REAL NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS flight_result (key TEXT NOT NULL, body TEXT, error TEXT, "
+                             "finished_at REAL NOT NULL)")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_flight_result_key ON flight_result (key, finished_at)")
+
+        logger.info(f"Initialized SingleFlight, cross-worker coordination {path or 'disabled'}")
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections can't be shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key_for(operation: str, payload: Dict) -> str:
+        """Hash of an operation and request payload, independent of key order"""
+        return hashlib.sha256(json.dumps([operation, payload], sort_keys=True).encode('utf-8')).hexdigest()
+
+    def fetch(self, operation: str, payload: Dict, call: Callable[[], Dict]):
+        """Return call()'s result for a payload, sharing one call among identical concurrent requests"""
+        return self.do(self.key_for(operation, payload), call, operation)
+
+    def do(self, key: str, call: Callable[[], Dict], operation: str = 'upstream'):
+        """Return call()'s result, sharing it with identical calls already in flight"""
+        with self._lock:
+            self._count(operation, 'calls')
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+                self._count(operation, 'coalesced_in_process')
+
+        if not leader:
+            if not flight.done.wait(self.lease_seconds):
+                logger.warning(f"Timed out waiting for in-flight call {key[:12]}, calling directly")
+                return call()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._call_across_workers(key, call, operation) if self.path else self._lead(call, operation)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _lead(self, call, operation):
+        with self._lock:
+            self._count(operation, 'leader_calls')
+        return call()
+
+    def _call_across_workers(self, key, call, operation):
+        started = time.time()
+        deadline = started + self.lease_seconds
+
+        while True:
+            try:
+                acquired = self._acquire(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Single-flight coordination unavailable, calling directly: {e}")
+                return self._lead(call, operation)
+
+            if acquired:
+                # Another worker may have finished this call while we were waiting for the lease
+                shared = self._shared_result(key, started)
+                if shared is not None:
+                    self._release(key)
+                    return self._use_shared(shared, operation)
+                return self._lead_and_publish(key, call, operation)
+
+            shared = self._shared_result(key, started)
+            if shared is not None:
+                return self._use_shared(shared, operation)
+
+            if time.time() > deadline:
+                logger.warning(f"Timed out waiting for another worker's call {key[:12]}, calling directly")
+                return self._lead(call, operation)
+            time.sleep(self.poll_interval)
+
+    def _acquire(self, key) -> bool:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Take the lease if nobody holds it or the holder's lease ran out
+            acquired = conn.execute(
+                "INSERT INTO flight (key, owner, lease_until) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until "
+                "WHERE flight.lease_until < ?",
+                (key, self.owner, now + self.lease_seconds, now)
+            ).rowcount == 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def _release(self, key, body=None, error=None):
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            if body is not None or error is not None:
+                conn.execute("INSERT INTO flight_result (key, body, error, finished_at) VALUES (?, ?, ?, ?)",
+                             (key, body, error, time.time()))
+                conn.execute("DELETE FROM flight_result WHERE finished_at < ?", (time.time() - self.result_ttl,))
+            conn.execute("DELETE FROM flight WHERE key = ? AND owner = ?", (key, self.owner))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to publish single-flight result for {key[:12]}: {e}")
+            try:
+                self._connect().execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def _lead_and_publish(self, key, call, operation):
+        try:
+            result = self._lead(call, operation)
+        except Exception as e:
+            self._release(key, error=f"{e.__class__.__name__}: {e}")
+            raise
+
+        try:
+            body = json.dumps(result)
+        except (TypeError, ValueError):
+            body = None
+        # A result that can't be shared just releases the lease; waiters then call themselves
+        self._release(key, body=body)
+        return result
+
+    def _shared_result(self, key, since) -> Optional[tuple]:
+        try:
+            return self._connect().execute(
+                "SELECT body, error FROM flight_result WHERE key = ? AND finished_at >= ? "
+                "ORDER BY finished_at DESC LIMIT 1",
+                (key, since)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read single-flight result for {key[:12]}: {e}")
+            return None
+
+    def _use_shared(self, shared, operation):
+        body, error = shared
+        with self._lock:
+            self._count(operation, 'coalesced_across_workers')
+        if error is not None:
+            raise RuntimeError(f"Shared upstream call failed: {error}")
+        return json.loads(body)
+
+    def _count(self, operation, counter):
+        # Callers hold self._lock
+        counters = self._counters.setdefault(operation, {
+            'calls': 0, 'leader_calls': 0, 'coalesced_in_process': 0, 'coalesced_across_workers': 0
+        })
+        counters[counter] += 1
+
+    def stats(self) -> Dict:
+        """Get per-operation counts of calls made and calls answered from another caller's result"""
+        with self._lock:
+            operations = {}
+            for operation, counters in self._counters.items():
+                coalesced = counters['coalesced_in_process'] + counters['coalesced_across_workers']
+                operations[operation] = dict(counters, coalesced_rate=round(coalesced / counters['calls'], 4))
+            in_flight = len(self._flights)
+
+        return {
+            'operations': operations,
+            'in_flight': in_flight,
+            'cross_worker': bool(self.path)
+        }
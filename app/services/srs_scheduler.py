@@ -0,0 +1,198 @@
+import logging
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, update
+
+from app import db
+from app.models.document import Question
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SRS_SCHEDULERS = ('fsrs', 'sm2')
+DEFAULT_SCHEDULER = 'fsrs'
+
+# Review grades
+AGAIN, HARD, GOOD, EASY = 1, 2, 3, 4
+
+# FSRS-4.5 default model weights
+DEFAULT_FSRS_WEIGHTS = (0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474, 0.1367,
+                        1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755)
+
+
+class SRSScheduler:
+    """Interface for spaced-repetition schedulers
+
+    A card's state is its stability (days), difficulty on a 1-10 scale, number
+    of consecutive successful reviews and number of lapses; stability is NaN
+    for a card never reviewed. review() advances the state of many cards at
+    once for their grades (1 again, 2 hard, 3 good, 4 easy) and the days since
+    each card's previous review, and intervals() turns states into days until
+    the next review. Both take NumPy arrays, so whole decks are processed in
+    one call; review_one() wraps them for a single answer.
+    """
+    name = None
+
+    def __init__(self, maximum_interval=365):
+        self.maximum_interval = maximum_interval
+
+    def review(self, stability: np.ndarray, difficulty: np.ndarray, reps: np.ndarray, lapses: np.ndarray,
+               grades: np.ndarray, elapsed_days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Get (stability, difficulty, reps, lapses) after reviewing each card with its grade"""
+        raise NotImplementedError
+
+    def intervals(self, stability: np.ndarray, difficulty: np.ndarray) -> np.ndarray:
+        """Get whole days until the next review for each card state"""
+        raise NotImplementedError
+
+    def review_one(self, stability: Optional[float], difficulty: Optional[float], reps: int, lapses: int,
+                   grade: int, elapsed_days: float) -> Tuple[float, float, int, int, int]:
+        """Review a single card, returning its new state and interval in days"""
+        state = self.review(
+            np.array([np.nan if stability is None else stability], dtype=np.float64),
+            np.array([np.nan if difficulty is None else difficulty], dtype=np.float64),
+            np.array([reps or 0]), np.array([lapses or 0]), np.array([grade]), np.array([elapsed_days], dtype=np.float64)
+        )
+        interval = self.intervals(state[0], state[1])
+        return float(state[0][0]), float(state[1][0]), int(state[2][0]), int(state[3][0]), int(interval[0])
+
+    def _clip_interval(self, days: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(days), 1, self.maximum_interval).astype(np.int64)
+
+
+class SM2Scheduler(SRSScheduler):
+    """SuperMemo SM-2: intervals of 1 and 6 days, then multiplied by a per-card ease factor
+
+    The ease factor (1.3 to 3.0) is stored on the shared 1-10 difficulty scale.
+    A lapse restarts the card at 1 day; interval_modifier scales every interval.
+    """
+    name = 'sm2'
+
+    # SM-2 response quality for again/hard/good/easy
+    QUALITY = np.array([0, 1, 3, 4, 5])
+
+    def __init__(self, maximum_interval=365, interval_modifier=1.0):
+        super().__init__(maximum_interval)
+        self.interval_modifier = interval_modifier
+
+    @staticmethod
+    def ease_to_difficulty(ease):
+        return 10.0 - (ease - 1.3) * 9.0 / 1.7
+
+    @staticmethod
+    def difficulty_to_ease(difficulty):
+        return 1.3 + (10.0 - difficulty) * 1.7 / 9.0
+
+    def review(self, stability, difficulty, reps, lapses, grades, elapsed_days):
+        new = np.isnan(stability)
+        quality = self.QUALITY[grades]
+        ease = np.where(new | np.isnan(difficulty), 2.5, self.difficulty_to_ease(np.nan_to_num(difficulty, nan=5.0)))
+        passed = grades >= HARD
+
+        next_reps = np.where(passed, reps + 1, 0)
+        grown = np.nan_to_num(stability, nan=1.0) * ease
+        next_stability = np.where(~passed | (next_reps == 1), 1.0, np.where(next_reps == 2, 6.0, grown))
+        next_ease = np.maximum(1.3, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        next_lapses = lapses + (~passed & ~new)
+        return next_stability, self.ease_to_difficulty(next_ease), next_reps, next_lapses
+
+    def intervals(self, stability, difficulty):
+        return self._clip_interval(stability * self.interval_modifier)
+
+
+class FSRSScheduler(SRSScheduler):
+    """FSRS-style memory model: stability and difficulty updated from recall probability
+
+    The interval is the time for recall probability to fall to desired_retention,
+    so changing the retention reschedules from the stored stability alone.
+    """
+    name = 'fsrs'
+
+    DECAY = -0.5
+    FACTOR = 19.0 / 81.0
+
+    def __init__(self, weights: Sequence[float] = None, desired_retention=0.9, maximum_interval=365):
+        super().__init__(maximum_interval)
+        self.w = np.array(weights or DEFAULT_FSRS_WEIGHTS, dtype=np.float64)
+        if len(self.w) != len(DEFAULT_FSRS_WEIGHTS):
+            raise ValueError(f"FSRS needs {len(DEFAULT_FSRS_WEIGHTS)} weights, got {len(self.w)}")
+        self.desired_retention = desired_retention
+
+    def retrievability(self, elapsed_days, stability):
+        """Probability of recall after elapsed_days for each stability"""
+        return np.power(1.0 + self.FACTOR * np.maximum(elapsed_days, 0.0) / stability, self.DECAY)
+
+    def review(self, stability, difficulty, reps, lapses, grades, elapsed_days):
+        w = self.w
+        new = np.isnan(stability)
+        grade = grades.astype(np.float64)
+        s = np.where(new, 1.0, stability)
+        d = np.where(new | np.isnan(difficulty), w[4], difficulty)
+
+        # Difficulty moves with the grade and reverts towards the initial difficulty of a good answer
+        initial_difficulty = np.clip(w[4] - (grade - 3) * w[5], 1.0, 10.0)
+        next_difficulty = np.clip(w[7] * w[4] + (1 - w[7]) * (d - w[6] * (grade - 3)), 1.0, 10.0)
+
+        r = self.retrievability(elapsed_days, s)
+        bonus = np.where(grades == HARD, w[15], 1.0) * np.where(grades == EASY, w[16], 1.0)
+        recalled = s * (1 + np.exp(w[8]) * (11 - d) * np.power(s, -w[9]) * np.expm1(w[10] * (1 - r)) * bonus)
+        forgotten = np.minimum(w[11] * np.power(d, -w[12]) * (np.power(s + 1, w[13]) - 1) * np.exp(w[14] * (1 - r)), s)
+
+        next_stability = np.where(new, w[np.clip(grades, AGAIN, EASY) - 1],
+                                  np.where(grades == AGAIN, forgotten, recalled))
+        next_difficulty = np.where(new, initial_difficulty, next_difficulty)
+        next_reps = np.where(grades > AGAIN, reps + 1, 0)
+        next_lapses = lapses + ((grades == AGAIN) & ~new)
+        return next_stability, next_difficulty, next_reps, next_lapses
+
+    def intervals(self, stability, difficulty):
+        return self._clip_interval(stability / self.FACTOR * (self.desired_retention ** (1 / self.DECAY) - 1))
+
+
+def create_scheduler(name=DEFAULT_SCHEDULER, desired_retention=0.9, maximum_interval=365, weights=None,
+                     interval_modifier=1.0) -> SRSScheduler:
+    """Create the scheduler engine for a name"""
+    if name not in SRS_SCHEDULERS:
+        logger.warning(f"Unknown SRS scheduler '{name}', using '{DEFAULT_SCHEDULER}'")
+        name = DEFAULT_SCHEDULER
+
+    if name == 'sm2':
+        return SM2Scheduler(maximum_interval=maximum_interval, interval_modifier=interval_modifier)
+    return FSRSScheduler(weights=weights, desired_retention=desired_retention, maximum_interval=maximum_interval)
+
+
+def reschedule_questions(scheduler: SRSScheduler, user_id: int, document_id: int = None, batch_size=50000) -> int:
+    """Recompute next_review for a user's reviewed questions from their stored card state
+
+    Rows are read and updated in id-ordered batches; intervals for each batch
+    are computed in one vectorized call. Returns the number of questions updated.
+    """
+    query = db.session.query(Question.id, Question.srs_stability, Question.srs_difficulty, Question.last_answered) \
+        .filter(Question.user_id == user_id, Question.srs_stability != None, Question.last_answered != None)
+    if document_id:
+        query = query.filter(Question.document_id == document_id)
+
+    updated = 0
+    last_id = 0
+    while True:
+        rows = query.filter(Question.id > last_id).order_by(Question.id).limit(batch_size).all()
+        if not rows:
+            break
+        ids, stability, difficulty, last_answered = zip(*rows)
+
+        days = scheduler.intervals(np.array(stability, dtype=np.float64),
+                                   np.array([np.nan if d is None else d for d in difficulty], dtype=np.float64))
+        next_review = (np.array(last_answered, dtype='datetime64[us]') + days.astype('timedelta64[D]')).tolist()
+        db.session.execute(
+            update(Question.__table__).where(Question.__table__.c.id == bindparam('question_id'))
+            .values(next_review=bindparam('review_at')),
+            [{'question_id': question_id, 'review_at': review_at} for question_id, review_at in zip(ids, next_review)]
+        )
+
+        updated += len(rows)
+        last_id = ids[-1]
+
+    db.session.commit()
+    logger.info(f"Rescheduled {updated} questions for user {user_id} with {scheduler.name}")
+    return updated
@@ -1,9 +1,10 @@
 import json
-import requests
 import logging
 from typing import Dict, List, Tuple, Optional
 
 from app.utils.api_utils import safe_api_call
+from app.utils.http_client import get_http_client
+from app.utils.streaming import stream_message_text
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -14,11 +15,6 @@ class StudyAssistant:
     def __init__(self, api_key):
         self.api_key = api_key
         self.claude_api_url = "https://api.anthropic.com/v1/messages"
-        self.headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
         logger.info("Initialized StudyAssistant with Claude API")
         
         # System prompt for the study assistant
@@ -44,6 +40,33 @@ Please format your responses for readability:
 
     def _call_claude_api(self, prompt, system_prompt=None, chat_history=None, max_tokens=2000, temperature=0.7):
         """Make an API call to Claude API"""
+        payload = self._build_payload(prompt, system_prompt, chat_history, max_tokens, temperature)
+        messages = payload["messages"]
+
+        # Log API request (without sensitive data)
+        logger.debug(f"Making Claude API request with {len(messages)} messages, system prompt: {bool(system_prompt)}")
+        
+        # Make API call
+        response = get_http_client().post(self.claude_api_url, json=payload, api_key=self.api_key, timeout=30,
+                                          operation='study_assistant')
+        response.raise_for_status()  # Raise exception for 4XX/5XX status codes
+        
+        # Log successful response
+        logger.debug(f"Successful API response, status: {response.status_code}")
+        
+        result = response.json()
+        
+        # Extract response
+        if 'content' in result and len(result['content']) > 0:
+            chat_response = result['content'][0]['text'].strip()
+            logger.info("Successfully generated chat response")
+            return chat_response
+        else:
+            logger.error("Invalid response from Claude API")
+            raise ValueError("Failed to generate response")
+    
+    def _build_payload(self, prompt, system_prompt=None, chat_history=None, max_tokens=2000, temperature=0.7):
+        """Build the Claude API payload for a prompt and chat history"""
         # Prepare messages based on chat history and prompt
         messages = []
         
@@ -73,27 +96,7 @@ Please format your responses for readability:
         # Add system prompt as a top-level parameter if provided
         if system_prompt:
             payload["system"] = system_prompt
-
-        # Log API request (without sensitive data)
-        logger.debug(f"Making Claude API request with {len(messages)} messages, system prompt: {bool(system_prompt)}")
-        
-        # Make API call
-        response = requests.post(self.claude_api_url, json=payload, headers=self.headers, timeout=30)
-        response.raise_for_status()  # Raise exception for 4XX/5XX status codes
-        
-        # Log successful response
-        logger.debug(f"Successful API response, status: {response.status_code}")
-        
-        result = response.json()
-        
-        # Extract response
-        if 'content' in result and len(result['content']) > 0:
-            chat_response = result['content'][0]['text'].strip()
-            logger.info("Successfully generated chat response")
-            return chat_response
-        else:
-            logger.error("Invalid response from Claude API")
-            raise ValueError("Failed to generate response")
+        return payload
     
     def chat(self, user_message: str, chat_history: List[Dict] = None, 
              use_fallback: bool = True) -> Tuple[str, Optional[str], bool]:
@@ -129,6 +132,11 @@ Please format your responses for readability:
             
         return response, error, is_fallback
     
+    def stream_chat(self, user_message: str, chat_history: List[Dict] = None):
+        """Like chat, but yields the response text as it is generated (raises on failure)"""
+        payload = self._build_payload(user_message, self.system_prompt, chat_history or [], temperature=0.7)
+        return stream_message_text(self.claude_api_url, payload, self.api_key, timeout=30, operation='study_assistant')
+    
     def _get_chat_fallback(self, prompt, system_prompt=None, chat_history=None, **kwargs) -> str:
         """Generate a fallback response when the API is unavailable
         
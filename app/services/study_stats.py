@@ -0,0 +1,115 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, or_
+
+from app import db
+from app.models.document import Document, StudyDay
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def _accuracy(correct, reviews):
+    return round(correct / reviews, 4) if reviews else None
+
+
+def get_study_stats(user_id: int, days: int = 30, today: Optional[date] = None) -> Dict:
+    """Aggregate a user's study time, sessions, answers and streaks from the daily rollups
+
+    Only StudyDay rows are read, so the cost depends on the window and the
+    number of active days rather than on the session and review history.
+    Days are UTC; time in a session still running is counted when it pauses
+    or ends.
+    """
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    counters = [func.coalesce(func.sum(getattr(StudyDay, name)), 0) for name in StudyDay.COUNTERS]
+
+    # Minutes, sessions and answers per day in the window
+    per_day = {
+        row[0]: row[1:]
+        for row in db.session.query(StudyDay.day, *counters)
+        .filter(StudyDay.user_id == user_id, StudyDay.day >= start, StudyDay.day <= today)
+        .group_by(StudyDay.day).all()
+    }
+    daily = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        seconds, sessions, reviews, correct = per_day.get(day, (0, 0, 0, 0))
+        daily.append({
+            'date': day.isoformat(),
+            'minutes': round(seconds / 60, 1),
+            'sessions': sessions,
+            'reviews': reviews,
+            'correct': correct,
+            'accuracy': _accuracy(correct, reviews)
+        })
+
+    # Weeks starting on Monday, from the days above
+    weekly = {}
+    for offset, entry in enumerate(daily):
+        day = start + timedelta(days=offset)
+        week = weekly.setdefault(day - timedelta(days=day.weekday()), {'minutes': 0.0, 'reviews': 0, 'correct': 0})
+        week['minutes'] += entry['minutes']
+        week['reviews'] += entry['reviews']
+        week['correct'] += entry['correct']
+    weeks = [
+        {'week_start': week_start.isoformat(), 'minutes': round(week['minutes'], 1), 'reviews': week['reviews'],
+         'accuracy': _accuracy(week['correct'], week['reviews'])}
+        for week_start, week in sorted(weekly.items())
+    ]
+
+    # Per document in the window
+    documents = [
+        {
+            'document_id': document_id or None,
+            'filename': filename,
+            'minutes': round(seconds / 60, 1),
+            'sessions': sessions,
+            'reviews': reviews,
+            'accuracy': _accuracy(correct, reviews)
+        }
+        for document_id, filename, seconds, sessions, reviews, correct in
+        db.session.query(StudyDay.document_id, Document.original_filename, *counters)
+        .outerjoin(Document, Document.id == StudyDay.document_id)
+        .filter(StudyDay.user_id == user_id, StudyDay.day >= start, StudyDay.day <= today)
+        .group_by(StudyDay.document_id, Document.original_filename)
+        .order_by(func.sum(StudyDay.study_seconds).desc()).all()
+    ]
+
+    # Lifetime totals
+    seconds, sessions, reviews, correct = db.session.query(*counters).filter(StudyDay.user_id == user_id).one()
+
+    # Streaks of consecutive days with study time or answers
+    active_days = [
+        row[0] for row in db.session.query(StudyDay.day)
+        .filter(StudyDay.user_id == user_id, StudyDay.day <= today, or_(StudyDay.study_seconds > 0, StudyDay.reviews > 0))
+        .group_by(StudyDay.day).order_by(StudyDay.day).all()
+    ]
+    longest = run = 0
+    previous = None
+    for day in active_days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    # A streak is still current until a whole day is missed
+    current = run if previous and today - previous <= timedelta(days=1) else 0
+
+    return {
+        'days': daily,
+        'weeks': weeks,
+        'documents': documents,
+        'totals': {
+            'minutes': round(seconds / 60, 1),
+            'sessions': sessions,
+            'reviews': reviews,
+            'correct': correct,
+            'accuracy': _accuracy(correct, reviews)
+        },
+        'streak': {
+            'current': current,
+            'longest': longest,
+            'last_active': previous.isoformat() if previous else None
+        }
+    }
@@ -1,36 +1,42 @@
-import requests
 import logging
 from typing import Dict, Tuple, Optional
 
+from app.utils.http_client import get_http_client
+from app.utils.streaming import stream_message_text
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
 class TextProcessor:
     """Service for processing text using Claude API"""
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, response_cache=None, single_flight=None):
         self.api_key = api_key
         self.claude_api_url = "https://api.anthropic.com/v1/messages"
-        self.headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
+        self.response_cache = response_cache
+        self.single_flight = single_flight
         logger.info("Initialized TextProcessor with Claude API")
     
-    def _call_claude_api(self, prompt, max_tokens=1000, temperature=0.7):
-        """Make an API call to Claude"""
-        payload = {
-            "model": "claude-3-opus-20240229",
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
+    def _call_claude_api(self, prompt, max_tokens=1000, temperature=0.7, cache_operation=None, use_cache=True):
+        """Make an API call to Claude, through the response cache when cache_operation is given
+        
+        Identical requests already in flight share one upstream call.
+        """
+        payload = self._build_payload(prompt, max_tokens, temperature)
+        call = lambda: self._post(payload)
+        if self.single_flight:
+            call = lambda: self.single_flight.fetch(cache_operation or 'text_processor', payload, lambda: self._post(payload))
         
+        if cache_operation and self.response_cache:
+            return self.response_cache.fetch(cache_operation, payload, call, use_cache)
+        return call()
+    
+    def _post(self, payload):
+        """Send a payload to the Claude API and return the decoded response"""
+        response = None
         try:
-            response = requests.post(self.claude_api_url, json=payload, headers=self.headers)
+            response = get_http_client().post(self.claude_api_url, json=payload, api_key=self.api_key,
+                                              operation='text_processor')
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -39,13 +45,26 @@ class TextProcessor:
                 logger.error(f"API response: {response.text}")
             raise
     
-    def summarize(self, text: str, length: str = 'medium', format: str = 'paragraph') -> Tuple[str, Optional[str]]:
+    def _build_payload(self, prompt, max_tokens=1000, temperature=0.7):
+        """Build the Claude API payload for a single prompt"""
+        return {
+            "model": "claude-3-opus-20240229",
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+    
+    def summarize(self, text: str, length: str = 'medium', format: str = 'paragraph',
+                  use_cache: bool = True) -> Tuple[str, Optional[str]]:
         """Summarize text using Claude API
         
         Args:
             text: Text to summarize
             length: Length of summary ('short', 'medium', 'long')
             format: Format of summary ('paragraph', 'bullets')
+            use_cache: Whether an identical earlier request may be answered from the response cache
             
         Returns:
             Tuple of (summary, error)
@@ -54,23 +73,49 @@ class TextProcessor:
             return "", "Text is too short to summarize"
         
         try:
-            # Limit text length to avoid API issues
-            if len(text) > 10000:
-                logger.warning(f"Text too long ({len(text)} chars), truncating to 10000")
-                text = text[:10000]
-                
             logger.info(f"Summarizing text of length {len(text)}, format: {format}, length: {length}")
             
-            # Convert length to word count
-            length_words = {
-                'short': 100,
-                'medium': 250,
-                'long': 500
-            }.get(length, 250)
+            response = self._call_claude_api(self._summary_prompt(text, length, format), max_tokens=1000, temperature=0.3,
+                                             cache_operation='summarize', use_cache=use_cache)
+            
+            if 'content' not in response or len(response['content']) == 0:
+                logger.error("Invalid response from Claude API")
+                return "", "Failed to summarize text"
             
-            # Create prompt based on format
-            if format == 'bullets':
-                prompt = f"""
+            summary = response['content'][0]['text'].strip()
+            logger.info("Successfully summarized text")
+            return summary, None
+        
+        except Exception as e:
+            logger.exception(f"Error summarizing text: {str(e)}")
+            return "", str(e)
+    
+    def stream_summarize(self, text: str, length: str = 'medium', format: str = 'paragraph'):
+        """Like summarize, but returns (chunks, error) where chunks yields the summary as it is generated"""
+        if not text or len(text.strip()) < 50:
+            return None, "Text is too short to summarize"
+        
+        logger.info(f"Streaming summary of text of length {len(text)}, format: {format}, length: {length}")
+        payload = self._build_payload(self._summary_prompt(text, length, format), max_tokens=1000, temperature=0.3)
+        return stream_message_text(self.claude_api_url, payload, self.api_key, operation='text_processor'), None
+    
+    def _summary_prompt(self, text: str, length: str, format: str) -> str:
+        """Build the summarization prompt"""
+        # Limit text length to avoid API issues
+        if len(text) > 10000:
+            logger.warning(f"Text too long ({len(text)} chars), truncating to 10000")
+            text = text[:10000]
+        
+        # Convert length to word count
+        length_words = {
+            'short': 100,
+            'medium': 250,
+            'long': 500
+        }.get(length, 250)
+        
+        # Create prompt based on format
+        if format == 'bullets':
+            return f"""
 Summarize the following text in a bulleted list format. Keep it around {length_words} words.
 
 TEXT TO SUMMARIZE:
@@ -78,8 +123,8 @@ TEXT TO SUMMARIZE:
 
 SUMMARY (in bullet points):
 """
-            else:  # paragraph format
-                prompt = f"""
+        # Paragraph format
+        return f"""
 Summarize the following text in paragraph format. Keep it around {length_words} words.
 
 TEXT TO SUMMARIZE:
@@ -87,26 +132,13 @@ TEXT TO SUMMARIZE:
 
 SUMMARY:
 """
-            
-            response = self._call_claude_api(prompt, max_tokens=1000, temperature=0.3)
-            
-            if 'content' not in response or len(response['content']) == 0:
-                logger.error("Invalid response from Claude API")
-                return "", "Failed to summarize text"
-            
-            summary = response['content'][0]['text'].strip()
-            logger.info("Successfully summarized text")
-            return summary, None
-        
-        except Exception as e:
-            logger.exception(f"Error summarizing text: {str(e)}")
-            return "", str(e)
     
-    def correct_text(self, text: str) -> Tuple[str, Optional[str], Optional[list]]:
+    def correct_text(self, text: str, use_cache: bool = True) -> Tuple[str, Optional[str], Optional[list]]:
         """Correct grammar and improve clarity of text
         
         Args:
             text: Text to correct
+            use_cache: Whether an identical earlier request may be answered from the response cache
             
         Returns:
             Tuple of (corrected_text, error, corrections)
@@ -152,7 +184,8 @@ ORIGINAL TEXT:
 CORRECTED TEXT:
 """
             
-            response = self._call_claude_api(prompt, max_tokens=len(text) * 2, temperature=0.2)
+            response = self._call_claude_api(prompt, max_tokens=len(text) * 2, temperature=0.2,
+                                             cache_operation='correct_text', use_cache=use_cache)
             
             if 'content' not in response or len(response['content']) == 0:
                 logger.error("Invalid response from Claude API")
@@ -196,12 +229,13 @@ CORRECTED TEXT:
             logger.exception(f"Error correcting text: {str(e)}")
             return "", str(e), None
     
-    def rephrase_text(self, text: str, style: str = 'academic') -> Tuple[str, Optional[str]]:
+    def rephrase_text(self, text: str, style: str = 'academic', use_cache: bool = True) -> Tuple[str, Optional[str]]:
         """Rephrase text in different style
         
         Args:
             text: Text to rephrase
             style: Style to use ('academic', 'simple', 'creative', 'professional')
+            use_cache: Whether an identical earlier request may be answered from the response cache
             
         Returns:
             Tuple of (rephrased_text, error)
@@ -236,7 +270,8 @@ ORIGINAL TEXT:
 REPHRASED TEXT:
 """
             
-            response = self._call_claude_api(prompt, max_tokens=len(text) * 2, temperature=0.7)
+            response = self._call_claude_api(prompt, max_tokens=len(text) * 2, temperature=0.7,
+                                             cache_operation='rephrase_text', use_cache=use_cache)
             
             if 'content' not in response or len(response['content']) == 0:
                 logger.error("Invalid response from Claude API")
@@ -250,12 +285,13 @@ REPHRASED TEXT:
             logger.exception(f"Error rephrasing text: {str(e)}")
             return "", str(e)
     
-    def explain_text(self, text: str, level: str = 'high_school') -> Tuple[str, Optional[str]]:
+    def explain_text(self, text: str, level: str = 'high_school', use_cache: bool = True) -> Tuple[str, Optional[str]]:
         """Explain complex text in simpler terms
         
         Args:
             text: Text to explain
             level: Target audience level ('elementary', 'middle_school', 'high_school', 'college')
+            use_cache: Whether an identical earlier request may be answered from the response cache
             
         Returns:
             Tuple of (explanation, error)
@@ -289,7 +325,8 @@ TEXT TO EXPLAIN:
 EXPLANATION:
 """
             
-            response = self._call_claude_api(prompt, max_tokens=len(text) * 2, temperature=0.5)
+            response = self._call_claude_api(prompt, max_tokens=len(text) * 2, temperature=0.5,
+                                             cache_operation='explain_text', use_cache=use_cache)
             
             if 'content' not in response or len(response['content']) == 0:
                 logger.error("Invalid response from Claude API")
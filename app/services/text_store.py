@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ExtractedTextStore:
+    """Content-addressed store of extracted document text
+
+    Text is kept gzip-compressed on disk under the SHA-256 of the source
+    file, so documents with identical files share one blob and readers never
+    have to parse the PDF/DOCX again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        # Create store directory if it doesn't exist
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        logger.info(f"Initialized ExtractedTextStore at {self.directory}")
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """Compute the SHA-256 of a file without loading it into memory"""
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _path_for(self, content_hash: str) -> str:
+        # Fan out over subdirectories to keep directory listings small
+        return os.path.join(self.directory, content_hash[:2], f"{content_hash}.txt.gz")
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Get stored text for a content hash, or None if not stored"""
+        if not content_hash:
+            return None
+
+        try:
+            with gzip.open(self._path_for(content_hash), 'rt', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read stored text for {content_hash}: {e}")
+            return None
+
+    def put(self, content_hash: str, text: str) -> bool:
+        """Store text for a content hash, replacing any existing blob"""
+        if not content_hash:
+            return False
+
+        path = self._path_for(content_hash)
+        directory = os.path.dirname(path)
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+
+            # Write to a temporary file and rename so readers in other
+            # workers never see a partially written blob
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                    f.write(text.encode('utf-8'))
+                os.replace(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+            logger.info(f"Stored extracted text for {content_hash} ({len(text)} chars)")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to store text for {content_hash}: {e}")
+            return False
+
+    def delete(self, content_hash: str) -> None:
+        """Remove the stored text for a content hash"""
+        if not content_hash:
+            return
+
+        try:
+            os.remove(self._path_for(content_hash))
+            logger.info(f"Removed stored text for {content_hash}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to remove stored text for {content_hash}: {e}")
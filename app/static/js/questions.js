@@ -538,7 +538,7 @@ document.addEventListener('DOMContentLoaded', function() {
         let correctCount = 0;
         let totalQuestions = questions.length;
         let evaluatedCount = 0;
-        let pendingEvaluations = [];
+        let submittedAnswers = [];
         
         // Disable submit button during evaluation
         const submitBtn = document.getElementById('submit-quiz-btn');
@@ -602,9 +602,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 }, 1000);
                 
                 // Submit for SRS tracking
-                pendingEvaluations.push(
-                    evaluateAnswer(questionId, selectedOption.value, questionType)
-                );
+                submittedAnswers.push({ question_id: parseInt(questionId, 10), answer: selectedOption.value });
                 
             } else if (questionType === 'fill_in_blank') {
                 const answerInput = question.querySelector('.fill-blank-input');
@@ -644,14 +642,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 }, 1000);
                 
                 // Submit for SRS tracking
-                pendingEvaluations.push(
-                    evaluateAnswer(questionId, userAnswer, questionType)
-                );
+                submittedAnswers.push({ question_id: parseInt(questionId, 10), answer: userAnswer });
             }
         });
         
-        // Wait for all evaluations to complete
-        Promise.all(pendingEvaluations).then(() => {
+        // Submit all answers in one request and wait for it to complete
+        evaluateAnswers(submittedAnswers).then(() => {
             // Display score
             displayScore(correctCount, totalQuestions);
             
@@ -709,6 +705,31 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Evaluate all answers of a quiz in one request
+    async function evaluateAnswers(answers) {
+        if (answers.length === 0) {
+            return { results: [] };
+        }
+        
+        try {
+            return await fetchAPI('/api/questions/evaluate-batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    answers: answers
+                })
+            });
+        } catch (error) {
+            console.error('Error evaluating answers:', error);
+            return { 
+                results: [],
+                error: 'Failed to evaluate answers' 
+            };
+        }
+    }
+    
     // Display the final score with study recommendations
     function displayScore(correct, total) {
         const scorePercentage = Math.round((correct / total) * 100);
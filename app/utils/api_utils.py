@@ -1,7 +1,7 @@
 import logging
 import json
 from typing import Dict, Any, Tuple, Optional
-from flask import jsonify
+from flask import jsonify, request
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +67,18 @@ def safe_api_call(func, *args, service_name="API", fallback_func=None, **kwargs)
         
         return None, False, error_message
 
+def response_cache_allowed(data: Dict = None) -> bool:
+    """Whether this request may be answered from the response cache
+    
+    Callers opt out with "cache": false in the JSON body, ?cache=0, or a
+    Cache-Control: no-cache header.
+    """
+    if data and data.get('cache') is False:
+        return False
+    if request.args.get('cache', '').lower() in ('0', 'false', 'no'):
+        return False
+    return 'no-cache' not in request.headers.get('Cache-Control', '').lower()
+
 def log_api_access(service_name: str, success: bool, details: Dict = None):
     """Log API access for monitoring and security"""
     details = details or {}
@@ -1,10 +1,15 @@
 import os
 import logging
+import threading
 import anthropic
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+# Clients are reused per API key so their connection pools stay warm
+_clients = {}
+_clients_lock = threading.Lock()
+
 def get_anthropic_client():
     """
     Returns an initialized Anthropic client using the API key from config
@@ -16,7 +21,10 @@ def get_anthropic_client():
         return None
     
     try:
-        client = anthropic.Anthropic(api_key=api_key)
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = _clients[api_key] = anthropic.Anthropic(api_key=api_key)
         return client
     except Exception as e:
         logger.exception(f"Error initializing Anthropic client: {str(e)}")
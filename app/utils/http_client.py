@@ -0,0 +1,209 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_API_VERSION = "2023-06-01"
+
+# Overloaded, rate limited and transient server errors are retried
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Token counts reported in the Messages API usage block
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+
+class UpstreamHTTPClient:
+    """
+    Shared HTTP client for upstream model API calls.
+
+    One requests.Session with a pooled adapter keeps TCP+TLS connections
+    alive between calls. Every call gets a timeout, the API headers are built
+    in one place, transient failures are retried with backoff (honouring
+    Retry-After), and per-operation call counts and latencies are recorded.
+    """
+
+    def __init__(self, pool_maxsize: int = 32, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 2, backoff_factor: float = 0.5, max_backoff: float = 20.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+        logger.info(f"Initialized UpstreamHTTPClient with pool size {pool_maxsize} and timeout {self.timeout}")
+
+    def headers_for(self, api_key: Optional[str] = None, extra: Optional[Dict] = None) -> Dict:
+        """Build request headers for the model API"""
+        headers = {
+            "anthropic-version": ANTHROPIC_API_VERSION,
+            "content-type": "application/json"
+        }
+        if api_key:
+            headers["x-api-key"] = api_key
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def post(self, url: str, json=None, api_key: Optional[str] = None, headers: Optional[Dict] = None,
+             timeout=None, retries: Optional[int] = None, operation: str = 'upstream',
+             stream: bool = False) -> requests.Response:
+        """
+        POST to an upstream API on a pooled connection.
+
+        Returns the final response, including non-2xx ones, so callers keep
+        their own status handling. Connection errors and timeouts are raised
+        once retries are exhausted.
+
+        Args:
+            url: Endpoint URL
+            json: JSON payload
+            api_key: API key sent as x-api-key
+            headers: Extra headers
+            timeout: Seconds or (connect, read) tuple, defaults to the client timeout
+            retries: Retry attempts, defaults to the client setting (0 disables)
+            operation: Name the call is recorded under in stats()
+            stream: Return once headers arrive and leave the body unread (the
+                caller must close the response)
+        """
+        retries = self.max_retries if retries is None else retries
+        request_headers = self.headers_for(api_key, headers)
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.post(url, json=json, headers=request_headers, timeout=timeout or self.timeout,
+                                             stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(operation, time.perf_counter() - started, error=True, retried=attempt < retries)
+                if attempt >= retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{operation} request failed ({e}), retry {attempt + 1}/{retries} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            retry = response.status_code in RETRYABLE_STATUS_CODES and attempt < retries
+            self._record(operation, time.perf_counter() - started, status=response.status_code, retried=retry)
+            if not retry:
+                return response
+
+            delay = self._retry_after(response)
+            delay = self._backoff(attempt) if delay is None else min(delay, self.max_backoff)
+            logger.warning(f"{operation} returned {response.status_code}, retry {attempt + 1}/{retries} in {delay:.2f}s")
+            response.close()
+            time.sleep(delay)
+
+    def record_first_byte(self, operation: str, seconds: float):
+        """Record the time from sending a streamed request to its first content"""
+        with self._lock:
+            stats = self._operation_stats(operation)
+            stats['streams'] += 1
+            stats['first_byte_total_ms'] += seconds * 1000
+            stats['first_byte_max_ms'] = max(stats['first_byte_max_ms'], seconds * 1000)
+
+    def record_usage(self, operation: str, usage: Optional[Dict]):
+        """Add the token counts from an API usage block (including prompt cache reads/writes)"""
+        if not usage:
+            return
+        with self._lock:
+            tokens = self._operation_stats(operation)['tokens']
+            for field in USAGE_FIELDS:
+                tokens[field] += usage.get(field) or 0
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter so concurrent callers spread out
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _operation_stats(self, operation) -> Dict:
+        return self._stats.setdefault(operation, {
+            'requests': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'status_codes': {},
+            'streams': 0, 'first_byte_total_ms': 0.0, 'first_byte_max_ms': 0.0,
+            'tokens': dict.fromkeys(USAGE_FIELDS, 0)
+        })
+
+    def _record(self, operation, seconds, status=None, error=False, retried=False):
+        with self._lock:
+            stats = self._operation_stats(operation)
+            stats['requests'] += 1
+            stats['errors'] += int(error or (status is not None and status >= 400))
+            stats['retries'] += int(retried)
+            stats['total_ms'] += seconds * 1000
+            stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+            if status is not None:
+                stats['status_codes'][str(status)] = stats['status_codes'].get(str(status), 0) + 1
+
+    def stats(self) -> Dict:
+        """Get per-operation request counts and latencies"""
+        with self._lock:
+            result = {}
+            for operation, stats in self._stats.items():
+                streams = stats['streams']
+                tokens = stats['tokens']
+                prompt_tokens = tokens['input_tokens'] + tokens['cache_creation_input_tokens'] + tokens['cache_read_input_tokens']
+                result[operation] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'status_codes': dict(stats['status_codes']),
+                    'avg_ms': round(stats['total_ms'] / stats['requests'], 1) if stats['requests'] else None,
+                    'total_ms': round(stats['total_ms'], 1),
+                    'max_ms': round(stats['max_ms'], 1),
+                    'streams': streams,
+                    'avg_first_byte_ms': round(stats['first_byte_total_ms'] / streams, 1) if streams else None,
+                    'max_first_byte_ms': round(stats['first_byte_max_ms'], 1) if streams else None,
+                    'tokens': dict(tokens),
+                    # Share of prompt tokens served from the upstream prompt cache
+                    'prompt_cache_hit_ratio': round(tokens['cache_read_input_tokens'] / prompt_tokens, 3) if prompt_tokens else None
+                }
+            return result
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def configure_http_client(**kwargs) -> UpstreamHTTPClient:
+    """Create the shared client with the given settings (called once at app start-up)"""
+    global _client
+    with _client_lock:
+        _client = UpstreamHTTPClient(**kwargs)
+    return _client
+
+
+def get_http_client() -> UpstreamHTTPClient:
+    """Get the shared client, creating one with default settings if needed"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamHTTPClient()
+    return _client
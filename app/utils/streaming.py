@@ -0,0 +1,166 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from flask import Response, request, stream_with_context
+
+from app.utils.api_utils import log_api_access
+from app.utils.http_client import get_http_client
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Recent time-to-first-byte samples kept per endpoint
+TTFB_SAMPLES = 1000
+
+_ttfb = {}
+_ttfb_lock = threading.Lock()
+
+
+def wants_stream(data: Optional[Dict] = None) -> bool:
+    """Whether the caller opted into a streamed response (stream in the JSON body or query string)"""
+    if data and isinstance(data.get('stream'), bool):
+        return data['stream']
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def stream_message_text(url: str, payload: Dict, api_key: str, operation: str, timeout=None) -> Iterator[str]:
+    """
+    Yield text deltas from a streamed Messages API call as they arrive.
+
+    The upstream time to first text and the token usage are recorded on the
+    shared HTTP client. Raises on HTTP errors and on error events in the
+    stream.
+    """
+    started = time.perf_counter()
+    usage = {}
+    response = get_http_client().post(url, json=dict(payload, stream=True), api_key=api_key, timeout=timeout,
+                                      operation=operation, stream=True)
+    try:
+        response.raise_for_status()
+        first = True
+
+        # chunk_size=None hands over each chunk as soon as it is received
+        for line in response.iter_lines(chunk_size=None):
+            if not line.startswith(b'data:'):
+                continue
+            event = json.loads(line[5:].decode('utf-8'))
+
+            if event.get('type') == 'message_start':
+                usage.update(event.get('message', {}).get('usage') or {})
+            elif event.get('type') == 'message_delta':
+                usage.update(event.get('usage') or {})
+            elif event.get('type') == 'content_block_delta':
+                text = event.get('delta', {}).get('text')
+                if not text:
+                    continue
+                if first:
+                    get_http_client().record_first_byte(operation, time.perf_counter() - started)
+                    first = False
+                yield text
+            elif event.get('type') == 'error':
+                error = event.get('error', {})
+                raise RuntimeError(f"Stream error from API: {error.get('type')}: {error.get('message')}")
+            elif event.get('type') == 'message_stop':
+                break
+    finally:
+        response.close()
+        get_http_client().record_usage(operation, usage)
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(chunks: Iterable[str], operation: str, on_complete: Optional[Callable[[str], Dict]] = None,
+                 fallback: Optional[Callable[[], str]] = None, started: Optional[float] = None) -> Response:
+    """
+    Stream text chunks to the client as server-sent events.
+
+    Sends a 'token' event per chunk, then a 'done' event carrying
+    on_complete(full_text) once the upstream finishes, or an 'error' event.
+    If the upstream fails before anything was sent and a fallback is given,
+    its text is sent instead and the done event is flagged is_fallback.
+    Time to first token, from started (the start of the request), is
+    recorded per operation.
+
+    Args:
+        chunks: Text chunks, typically from stream_message_text
+        operation: Name used for logging and the TTFB metric
+        on_complete: Called with the full text when the stream completes
+            (persist history here); returns extra fields for the done event
+        fallback: Called for replacement text if the upstream fails first
+        started: perf_counter() at the start of the request
+    """
+    started = started or time.perf_counter()
+
+    def generate():
+        parts = []
+        ttfb_ms = None
+        is_fallback = False
+
+        try:
+            try:
+                for text in chunks:
+                    if ttfb_ms is None:
+                        ttfb_ms = _record_ttfb(operation, time.perf_counter() - started)
+                    parts.append(text)
+                    yield sse_event('token', {'text': text})
+            except Exception as e:
+                if parts or not fallback:
+                    raise
+                logger.warning(f"Streaming {operation} failed before the first token, using fallback: {e}")
+                text = fallback()
+                ttfb_ms = _record_ttfb(operation, time.perf_counter() - started)
+                parts.append(text)
+                is_fallback = True
+                yield sse_event('token', {'text': text})
+
+            full_text = ''.join(parts).strip()
+            done = on_complete(full_text) if on_complete else {}
+            done = dict(done or {}, is_fallback=is_fallback, ttfb_ms=ttfb_ms,
+                        total_ms=round((time.perf_counter() - started) * 1000, 1))
+            log_api_access(operation, True, {"stream": True, "ttfb_ms": ttfb_ms, "characters": len(full_text)})
+            yield sse_event('done', done)
+
+        except Exception as e:
+            logger.exception(f"Error streaming {operation}")
+            log_api_access(operation, False, {"stream": True, "error": str(e)})
+            yield sse_event('error', {'error': str(e)})
+
+        finally:
+            # Release the upstream connection if the client went away mid-stream
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+    })
+
+
+def _record_ttfb(operation: str, seconds: float) -> float:
+    ms = round(seconds * 1000, 1)
+    with _ttfb_lock:
+        _ttfb.setdefault(operation, deque(maxlen=TTFB_SAMPLES)).append(ms)
+    return ms
+
+
+def get_stream_stats() -> Dict:
+    """Get time-to-first-token percentiles per streamed endpoint (recent samples)"""
+    with _ttfb_lock:
+        samples = {operation: sorted(values) for operation, values in _ttfb.items()}
+
+    return {
+        operation: {
+            'samples': len(values),
+            'p50_ttfb_ms': values[len(values) // 2],
+            'p95_ttfb_ms': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max_ttfb_ms': values[-1]
+        }
+        for operation, values in samples.items() if values
+    }
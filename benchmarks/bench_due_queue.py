@@ -0,0 +1,135 @@
+"""Benchmark the SRS due-for-review query at 10k/100k/1M questions for one user.
+
+Fills a SQLite database with one user's questions (a mix of never answered,
+recently failed and well-known ones with review dates spread over the past
+and next month), then times the due-queue query two ways:
+
+  computed (before)  ORDER BY a CASE on times_answered plus a success-rate
+                     division, which sorts every due question of the user
+  indexed (after)    ORDER BY the stored review_priority and next_review,
+                     read in order from ix_question_user_review
+
+Both return the same questions up to ties. The query plan of each is printed
+once per size.
+
+Usage:
+    python benchmarks/bench_due_queue.py [--sizes 10000 100000 1000000]
+        [--limits 10 1000] [--repeat 5]
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.config import Config
+from app.models.document import Document, Question
+from app.models.user import User
+
+
+def fill_questions(document_id, user_id, count, now, rng):
+    """Insert questions in batches; priorities are set as update_srs_data would"""
+    rows = []
+    for i in range(count):
+        if rng.random() < 0.2:
+            answered, correct, next_review = 0, 0, None
+        else:
+            answered = rng.randint(1, 12)
+            correct = rng.randint(0, answered)
+            next_review = now + timedelta(minutes=rng.randint(-30 * 24 * 60, 30 * 24 * 60))
+        rows.append({
+            'question_text': f'Question {i}?', 'question_type': 'qa', 'answer': 'answer',
+            'created_at': now, 'difficulty': 'medium', 'times_answered': answered, 'times_correct': correct,
+            'next_review': next_review, 'review_priority': Question.priority_for(answered, correct),
+            'document_id': document_id, 'user_id': user_id
+        })
+        if len(rows) == 20000:
+            db.session.execute(Question.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Question.__table__.insert(), rows)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+
+
+def due_query(user_id, now, strategy):
+    query = Question.query.filter(
+        Question.user_id == user_id,
+        db.or_(Question.next_review <= now, Question.next_review == None)
+    )
+    if strategy == 'computed (before)':
+        return query.order_by(
+            db.case((Question.times_answered == 0, 0), else_=1),
+            (db.func.cast(Question.times_correct, db.Float) /
+             db.case((Question.times_answered < 1, 1), else_=Question.times_answered)).asc()
+        )
+    return query.order_by(Question.review_priority, Question.next_review)
+
+
+def query_plan(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {statement}')).all()
+    return '; '.join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Questions for the user (default: 10000 100000 1000000)')
+    parser.add_argument('--limits', type=int, nargs='+', default=[10, 1000], help='Page sizes (default: 10 1000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query, median reported (default: 5)')
+    args = parser.parse_args()
+
+    # Keep application logging out of the benchmark output
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(42)
+
+    print(f"{'questions':>9} {'limit':>6} {'strategy':<18} {'median ms':>10}")
+    for size in args.sizes:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_db_'), 'bench.db')}"
+
+        app = create_app(BenchConfig)
+        logging.getLogger().setLevel(logging.WARNING)
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', email='bench@example.com')
+            db.session.add(user)
+            db.session.commit()
+            document = Document(filename='bench.txt', original_filename='bench.txt', file_type='txt',
+                                file_size=0, file_path='bench.txt', user_id=user.id)
+            db.session.add(document)
+            db.session.commit()
+
+            now = datetime.utcnow()
+            started = time.perf_counter()
+            fill_questions(document.id, user.id, size, now, rng)
+            print(f"{size:9d} filled in {time.perf_counter() - started:.1f} s")
+
+            for strategy in ('computed (before)', 'indexed (after)'):
+                print(f"{size:9d} {'':>6} {strategy:<18} plan: {query_plan(due_query(user.id, now, strategy))}")
+
+            for limit in args.limits:
+                results = {}
+                for strategy in ('computed (before)', 'indexed (after)'):
+                    timings = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        due_query(user.id, now, strategy).limit(limit).all()
+                        timings.append((time.perf_counter() - started) * 1000)
+                        db.session.expunge_all()
+                    results[strategy] = statistics.median(timings)
+                    print(f"{size:9d} {limit:6d} {strategy:<18} {results[strategy]:10.2f}")
+                print(f"{size:9d} {limit:6d} speedup: {results['computed (before)'] / results['indexed (after)']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
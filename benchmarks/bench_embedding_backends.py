@@ -0,0 +1,146 @@
+"""Benchmark query latency and retrieval recall of the embedding backends.
+
+Chunks documents the way DocumentProcessor does, then for each chunk takes
+one sentence as the query with a fraction of its words dropped, and checks
+whether the source chunk comes back in the top k of a flat FAISS index.
+Latency covers embedding the query plus the index search, as in
+EmbeddingsService.search_document.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py [documents ...] [--k 3]
+        [--queries 100] [--drop 0.3] [--local-dim 1024] [--remote]
+
+Without a path the chunks of every upload with extractable text are
+pooled, which makes retrieval harder than within one document. The
+remote backend runs only with --remote and ANTHROPIC_API_KEY set, since it
+makes one API request per query.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import faiss
+
+from app.services.document_processor import DocumentProcessor
+from app.services.embedding_providers import HashedNgramEmbeddingProvider, RemoteEmbeddingProvider
+
+UPLOADS = os.path.join(os.path.dirname(__file__), '..', 'app', 'static', 'uploads')
+
+
+def load_text(processor, path):
+    file_type = path.rsplit('.', 1)[-1].lower()
+    text, error = processor.extract_text(SimpleNamespace(id=None, file_path=path, file_type=file_type),
+                                         use_store=False)
+    return processor.prepare_text(text or '') if not error else ''
+
+
+def load_chunks(processor, paths):
+    chunks = []
+    for path in paths:
+        text = load_text(processor, path)
+        chunks.extend(chunk['chunk_text'] for chunk in processor._split_into_chunks(text, None, max_chunks=10000))
+    return chunks
+
+
+def upload_paths(processor):
+    return sorted(path for path in glob.glob(os.path.join(UPLOADS, '*'))
+                  if path.rsplit('.', 1)[-1].lower() in processor.allowed_extensions)
+
+
+def make_queries(chunks, count, drop, rng):
+    """One query per sampled chunk: a sentence with some words dropped"""
+    queries = []
+    for target in rng.sample(range(len(chunks)), min(count, len(chunks))):
+        sentences = [s for s in re.split(r'(?<=[.!?])\s+', chunks[target]) if len(s.split()) >= 8]
+        if not sentences:
+            continue
+        words = rng.choice(sentences).split()
+        kept = [w for w in words if rng.random() >= drop] or words
+        queries.append((' '.join(kept), target))
+    return queries
+
+
+def bench(provider, chunks, queries, k):
+    started = time.perf_counter()
+    vectors = np.vstack(provider.embed(chunks)).astype(np.float32)
+    index_ms = (time.perf_counter() - started) * 1000
+
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+
+    timings = []
+    hits = 0
+    for query, target in queries:
+        started = time.perf_counter()
+        query_vector = np.vstack(provider.embed([query])).astype(np.float32)
+        _, ids = index.search(query_vector, k)
+        timings.append(time.perf_counter() - started)
+        hits += target in ids[0]
+
+    timings.sort()
+    return {
+        'index_ms': index_ms,
+        'p50_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[int(len(timings) * 0.95) - 1] * 1000,
+        'recall': hits / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('documents', nargs='*', help='PDF, DOCX or TXT files to chunk')
+    parser.add_argument('--k', type=int, default=3, help='Chunks retrieved per query (default: 3)')
+    parser.add_argument('--queries', type=int, default=100, help='Maximum number of queries (default: 100)')
+    parser.add_argument('--drop', type=float, default=0.3, help='Fraction of query words dropped (default: 0.3)')
+    parser.add_argument('--local-dim', type=int, default=1024, help='Local embedding dimension (default: 1024)')
+    parser.add_argument('--remote', action='store_true', help='Also benchmark the remote embeddings API')
+    args = parser.parse_args()
+
+    # Scanned uploads log OCR failures; keep them out of the output
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    processor = DocumentProcessor(tempfile.mkdtemp(prefix='bench_uploads_'), {'pdf', 'docx', 'txt'},
+                                  max_pdf_pages=0, pdf_extraction_mode='serial')
+    chunks = load_chunks(processor, args.documents or upload_paths(processor))
+    if not chunks:
+        sys.exit("No document given and no upload with extractable text found")
+    queries = make_queries(chunks, args.queries, args.drop, random.Random(0))
+    if not queries:
+        sys.exit("No sentences long enough to query")
+
+    print(f"{len(chunks)} chunks, {len(queries)} queries, recall@{args.k}, {args.drop:.0%} of query words dropped")
+
+    backends = [('local', HashedNgramEmbeddingProvider(dimension=args.local_dim))]
+    if args.remote:
+        if os.environ.get('ANTHROPIC_API_KEY'):
+            backends.append(('remote', RemoteEmbeddingProvider(os.environ['ANTHROPIC_API_KEY'])))
+        else:
+            print("remote skipped (ANTHROPIC_API_KEY not set)")
+    else:
+        print("remote skipped (pass --remote)")
+
+    print(f"{'backend':<8} {'index ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'recall':>7}")
+    for name, provider in backends:
+        try:
+            result = bench(provider, chunks, queries, args.k)
+        except Exception as e:
+            print(f"{name:<8} failed: {e}")
+            continue
+        print(f"{name:<8} {result['index_ms']:10.1f} {result['p50_ms']:9.3f} {result['p95_ms']:9.3f} {result['recall']:7.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark recall and query latency of FAISS index types against flat search.
+
+Builds every index type/compression combination with the same
+build_faiss_index used by EmbeddingsService.create_document_index, over a
+synthetic clustered corpus, and reports recall@k against the exact flat
+results plus build time, per-query latency and index size.
+
+Usage:
+    python benchmarks/bench_faiss_index_types.py [--vectors 1000,10000,50000]
+        [--dim 1024] [--queries 200] [--k 5]
+
+Embeddings from the API are not needed; vectors are drawn around random
+cluster centres so neighbourhoods resemble real text embeddings more than
+uniform noise does.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import faiss
+
+from app.services.embeddings import build_faiss_index
+
+CONFIGS = (
+    ('flat', 'none'),
+    ('hnsw', 'none'),
+    ('hnsw', 'sq8'),
+    ('ivf', 'none'),
+    ('ivf', 'sq8'),
+    ('ivf', 'pq'),
+)
+
+
+def make_corpus(num_vectors, dimension, num_queries, seed=0):
+    """Draw corpus and query vectors around shared cluster centres"""
+    rng = np.random.default_rng(seed)
+    clusters = max(8, num_vectors // 100)
+    centres = rng.standard_normal((clusters, dimension)).astype(np.float32)
+
+    def sample(count):
+        labels = rng.integers(0, clusters, count)
+        return centres[labels] + 0.5 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+    return sample(num_vectors), sample(num_queries)
+
+
+def index_bytes(index):
+    return faiss.serialize_index(index).nbytes
+
+
+def bench(corpus, queries, k, index_type, compression, truth):
+    started = time.perf_counter()
+    index, description = build_faiss_index(corpus, index_type, compression, flat_max_vectors=0)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # One query at a time, as search_document issues them
+    timings = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        timings.append(time.perf_counter() - started)
+        found.append(ids[0])
+
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return description, build_ms, recall, np.median(timings) * 1000, np.percentile(timings, 99) * 1000, index_bytes(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', default='1000,10000,50000', help='Comma-separated corpus sizes')
+    parser.add_argument('--dim', type=int, default=1024, help='Embedding dimension (default: 1024)')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per configuration (default: 200)')
+    parser.add_argument('--k', type=int, default=5, help='Neighbours per query (default: 5)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for num_vectors in (int(n) for n in args.vectors.split(',')):
+        corpus, queries = make_corpus(num_vectors, args.dim, args.queries)
+
+        # Exact neighbours from a flat index are the recall baseline
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+
+        print(f"\n{num_vectors} vectors, dim {args.dim}, recall@{args.k}")
+        print(f"{'index':<20} {'build ms':>10} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'MB':>8}")
+        for index_type, compression in CONFIGS:
+            description, build_ms, recall, p50, p99, size = bench(
+                corpus, queries, args.k, index_type, compression, truth
+            )
+            print(f"{description:<20} {build_ms:10.1f} {recall:7.3f} {p50:8.3f} {p99:8.3f} {size / 1e6:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
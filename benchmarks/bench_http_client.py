@@ -0,0 +1,155 @@
+"""Benchmark per-call latency of the shared pooled HTTP client against one-off requests.post.
+
+Starts a local stub of the messages API (HTTPS with a throwaway self-signed
+certificate when openssl is available, plain HTTP otherwise) that answers
+each POST after a fixed delay, then sends the same calls with
+requests.post, which opens a new connection (and TLS handshake) per call as
+the services used to, and with UpstreamHTTPClient, which reuses
+keep-alive connections from its pool.
+
+Usage:
+    python benchmarks/bench_http_client.py [--calls 200] [--concurrency 1 8]
+        [--delay-ms 5] [--http]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.http_client import UpstreamHTTPClient
+
+RESPONSE = json.dumps({'content': [{'type': 'text', 'text': 'ok'}]}).encode('utf-8')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+    delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """Self-signed certificate for localhost, or None without openssl"""
+    if not shutil.which('openssl'):
+        return None
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    result = subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert,
+         '-days', '1', '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1'],
+        capture_output=True
+    )
+    return (cert, key) if result.returncode == 0 else None
+
+
+def start_server(delay, certificate):
+    StubHandler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(send, calls, concurrency):
+    payload = {'model': 'stub', 'max_tokens': 10, 'messages': [{'role': 'user', 'content': 'hello'}]}
+
+    def timed(_):
+        started = time.perf_counter()
+        response = send(payload)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    StubHandler.connections = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = sorted(executor.map(timed, range(calls)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'p50_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[int(len(timings) * 0.95) - 1] * 1000,
+        'calls_per_second': calls / elapsed,
+        'connections': StubHandler.connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200, help='Calls per run (default: 200)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help='Concurrent callers (default: 1 8)')
+    parser.add_argument('--delay-ms', type=float, default=5.0, help='Stub response delay (default: 5)')
+    parser.add_argument('--http', action='store_true', help='Use plain HTTP instead of HTTPS')
+    args = parser.parse_args()
+
+    # Keep per-request connection logging out of the output
+    logging.getLogger().setLevel(logging.WARNING)
+
+    directory = tempfile.mkdtemp(prefix='bench_http_')
+    try:
+        certificate = None if args.http else make_certificate(directory)
+        server = start_server(args.delay_ms / 1000, certificate)
+        scheme = 'https' if certificate else 'http'
+        url = f"{scheme}://localhost:{server.server_address[1]}/v1/messages"
+        verify = certificate[0] if certificate else True
+        print(f"{scheme.upper()} stub, {args.calls} calls per run, {args.delay_ms:g} ms server delay")
+
+        client = UpstreamHTTPClient(pool_maxsize=max(args.concurrency), max_retries=0)
+        # REQUESTS_CA_BUNDLE would otherwise override the stub certificate
+        client.session.trust_env = False
+        client.session.verify = verify
+        headers = client.headers_for('stub-key')
+
+        clients = [
+            ('requests.post', lambda payload: requests.post(url, json=payload, headers=headers, timeout=30, verify=verify)),
+            ('pooled', lambda payload: client.post(url, json=payload, api_key='stub-key', timeout=30, operation='bench')),
+        ]
+
+        print(f"{'client':<14} {'threads':>7} {'p50 ms':>8} {'p95 ms':>8} {'calls/s':>9} {'conns':>6}")
+        for concurrency in args.concurrency:
+            for name, send in clients:
+                result = run(send, args.calls, concurrency)
+                print(f"{name:<14} {concurrency:7d} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+                      f"{result['calls_per_second']:9.1f} {result['connections']:6d}")
+
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark PDF text extraction throughput (pages/sec) by worker count.
+
+Runs DocumentProcessor.iter_pdf_pages over a PDF with 1, 2, 4 and 8 workers
+for each extraction mode. One worker is the serial baseline.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py [path/to/file.pdf] [--runs 3]
+        [--modes process,thread] [--workers 1,2,4,8]
+
+Without a path the PDF in app/static/uploads with the most pages is used.
+The page limit is disabled so every page of the file is extracted.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.document_processor import DocumentProcessor
+
+UPLOADS = os.path.join(os.path.dirname(__file__), '..', 'app', 'static', 'uploads')
+
+
+def default_pdf():
+    import PyPDF2
+
+    pdfs = glob.glob(os.path.join(UPLOADS, '*.pdf'))
+    if not pdfs:
+        sys.exit("No PDF given and none found in app/static/uploads")
+    return max(pdfs, key=lambda path: len(PyPDF2.PdfReader(path, strict=False).pages))
+
+
+def extract_all(processor, path):
+    return sum(1 for _ in processor.iter_pdf_pages(path, max_pages=0))
+
+
+def bench(path, mode, workers, runs):
+    processor = DocumentProcessor(
+        tempfile.mkdtemp(prefix='bench_uploads_'), {'pdf'},
+        max_pdf_pages=0,
+        pdf_extraction_mode='serial' if workers == 1 else mode,
+        pdf_workers=workers
+    )
+
+    # Warm-up run starts the pool so worker start-up is not measured
+    pages = extract_all(processor, path)
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        extract_all(processor, path)
+        timings.append(time.perf_counter() - started)
+
+    if processor._pdf_executor is not None:
+        processor._pdf_executor.shutdown()
+
+    return pages, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help='PDF file to extract')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per setting, best is reported (default: 3)')
+    parser.add_argument('--modes', default='process,thread', help='Comma-separated modes (default: process,thread)')
+    parser.add_argument('--workers', default='1,2,4,8', help='Comma-separated worker counts (default: 1,2,4,8)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+
+    path = args.pdf or default_pdf()
+    print(f"PDF: {path}")
+
+    for mode in args.modes.split(','):
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(',')):
+            pages, best = bench(path, mode, workers, args.runs)
+            rate = pages / best
+            baseline = baseline or rate
+            print(f"{mode:<8} workers={workers:<2} {pages:4d} pages  {best * 1000:9.1f} ms  "
+                  f"{rate:8.1f} pages/sec  {rate / baseline:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Benchmark time-to-quiz for mixed question sets against a stub messages API.
+
+Starts a local HTTP stub that answers after a fixed base delay plus a delay
+per requested question (so multi-question calls cost more than single ones,
+like real output tokens), then generates 10/20/30-question mixed quizzes
+for a document of chunks two ways:
+
+  sequential (before)  the old loop: one call per question, chunk by chunk,
+                       a commit per question and a 0.5 s pause after each
+  concurrent (after)   QuestionGenerator.generate_questions_for_document:
+                       multi-question calls fanned out over chunks on the
+                       shared pool, one transaction for all rows
+
+Usage:
+    python benchmarks/bench_question_generation.py [--counts 10 20 30]
+        [--base-ms 300] [--per-question-ms 150] [--concurrency 4]
+        [--per-call 3] [--pause 0.5]
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.config import Config
+from app.models.document import Document, DocumentChunk, Question
+from app.models.user import User
+from app.services.question_generator import QuestionGenerator
+
+_serial = itertools.count()
+
+
+def stub_questions(question_type, count):
+    """JSON questions of one type, unique per call"""
+    items = []
+    for _ in range(count):
+        n = next(_serial)
+        if question_type == 'mcq':
+            items.append({'question': f'Question {n}?', 'options': {'A': 'a', 'B': 'b', 'C': 'c', 'D': 'd'}, 'answer': 'B'})
+        elif question_type == 'true_false':
+            items.append({'statement': f'Statement {n}.', 'answer': 'True', 'explanation': 'Because.'})
+        else:
+            items.append({'question': f'Question {n} _____?', 'answer': 'answer', 'explanation': 'Because.'})
+    return json.dumps(items)
+
+
+def stub_single(prompt):
+    """One question in the text format of the single-question prompts"""
+    n = next(_serial)
+    if 'multiple-choice' in prompt:
+        return f'Question: Question {n}?\nOptions:\n(A) a\n(B) b\n(C) c\n(D) d\nAnswer: B'
+    if 'True/False' in prompt:
+        return f'STATEMENT: Statement {n}.\nANSWER: True\nEXPLANATION: Because.'
+    if 'fill-in-the-blank' in prompt:
+        return f'QUESTION: Question {n} _____?\nANSWER: answer\nEXPLANATION: Because.'
+    return f'QUESTION: Question {n}?\nANSWER: A detailed answer.'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    base_delay = 0.0
+    per_question_delay = 0.0
+    calls = 0
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        prompt = payload['messages'][0]['content']
+        StubHandler.calls += 1
+
+        match = re.search(r'JSON array of (\d+) objects', prompt)
+        if match:
+            count = int(match.group(1))
+            question_type = next(t for t, name in (('mcq', 'multiple-choice'), ('true_false', 'True/False'),
+                                                   ('fill_in_blank', 'fill-in-the-blank'), ('qa', '')) if name in prompt)
+            text = stub_questions(question_type, count)
+        else:
+            count = 1
+            text = stub_single(prompt)
+
+        time.sleep(self.base_delay + self.per_question_delay * count)
+        body = json.dumps({'content': [{'type': 'text', 'text': text}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sequential_quiz(generator, document_id, user_id, count, pause):
+    """Replicates the old generate_questions_for_document / _generate_questions_batch loop for a mixed quiz"""
+    generators = {'mcq': generator.generate_mcq, 'qa': generator.generate_qa,
+                  'true_false': generator.generate_true_false, 'fill_in_blank': generator.generate_fill_in_blank}
+    chunks = DocumentChunk.query.filter_by(document_id=document_id).all()
+    selected = generator._select_diverse_chunks(chunks, count, max_chunks=10)
+    type_counts = {t: count // 4 + (1 if i < count % 4 else 0) for i, t in enumerate(generators)}
+
+    created = 0
+    for qtype, qcount in type_counts.items():
+        for difficulty, diff_count in generator._distribute_by_difficulty(qcount, ['easy', 'medium', 'hard']).items():
+            made = 0
+            for chunk in selected:
+                if made >= diff_count:
+                    break
+                data = generators[qtype](chunk.chunk_text)
+                if not data or 'question' not in data:
+                    continue
+                db.session.add(Question(question_text=data['question'], question_type=qtype, answer=data['answer'],
+                                        document_id=document_id, user_id=user_id, difficulty=difficulty))
+                db.session.commit()
+                made += 1
+                time.sleep(pause)
+            created += made
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 20, 30], help='Quiz sizes (default: 10 20 30)')
+    parser.add_argument('--base-ms', type=float, default=300.0, help='Stub delay per call (default: 300)')
+    parser.add_argument('--per-question-ms', type=float, default=150.0,
+                        help='Extra stub delay per requested question (default: 150)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent generation calls (default: 4)')
+    parser.add_argument('--per-call', type=int, default=3, help='Questions per call (default: 3)')
+    parser.add_argument('--pause', type=float, default=0.5, help='Pause per question in the old loop (default: 0.5)')
+    parser.add_argument('--chunks', type=int, default=40, help='Chunks in the benchmark document (default: 40)')
+    args = parser.parse_args()
+
+    # Keep application logging out of the benchmark output
+    logging.getLogger().setLevel(logging.WARNING)
+
+    StubHandler.base_delay = args.base_ms / 1000
+    StubHandler.per_question_delay = args.per_question_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_db_'), 'bench.db')}"
+
+    app = create_app(BenchConfig)
+    logging.getLogger().setLevel(logging.WARNING)
+    generator = QuestionGenerator('stub-key', max_concurrency=args.concurrency, questions_per_call=args.per_call)
+    generator.claude_api_url = f"http://127.0.0.1:{server.server_address[1]}/v1/messages"
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        db.session.add(user)
+        db.session.commit()
+        document = Document(filename='bench.txt', original_filename='bench.txt', file_type='txt',
+                            file_size=0, file_path='bench.txt', user_id=user.id)
+        db.session.add(document)
+        db.session.commit()
+        db.session.add_all([
+            DocumentChunk(chunk_text=f"Section {i}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20,
+                          chunk_index=i, document_id=document.id)
+            for i in range(args.chunks)
+        ])
+        db.session.commit()
+
+        print(f"stub {args.base_ms:g} ms + {args.per_question_ms:g} ms/question, "
+              f"{args.concurrency} concurrent, {args.per_call} per call")
+        print(f"{'questions':>9} {'strategy':<20} {'seconds':>8} {'calls':>6} {'created':>8}")
+        for count in args.counts:
+            results = {}
+            for label, run in (
+                ('sequential (before)', lambda: sequential_quiz(generator, document.id, user.id, count, args.pause)),
+                ('concurrent (after)', lambda: len(generator.generate_questions_for_document(
+                    document.id, user.id, 'mixed', count)[0])),
+            ):
+                StubHandler.calls = 0
+                started = time.perf_counter()
+                created = run()
+                results[label] = time.perf_counter() - started
+                print(f"{count:9d} {label:<20} {results[label]:8.2f} {StubHandler.calls:6d} {created:8d}")
+            print(f"{count:9d} speedup: {results['sequential (before)'] / results['concurrent (after)']:.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Benchmark SRS rescheduling throughput (cards per second).
+
+Engine: reviews and intervals for N random card states, one call per card
+(review_one, as a single answer does) against one vectorized call for the
+whole deck, for each scheduler engine.
+
+Database: rescheduling one user's deck of reviewed questions in SQLite after
+a desired-retention change, row by row through ORM objects (an interval call
+and an UPDATE per card) against reschedule_questions (batched reads,
+vectorized intervals, bulk updates).
+
+Usage:
+    python benchmarks/bench_srs_scheduler.py [--sizes 10000 100000 1000000]
+        [--db-sizes 10000 100000] [--loop-max 100000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.config import Config
+from app.models.document import Document, Question
+from app.models.user import User
+from app.services.srs_scheduler import SRS_SCHEDULERS, create_scheduler, reschedule_questions
+
+
+def random_deck(size, rng):
+    """Card states, grades and elapsed days for a deck of reviewed cards"""
+    return {
+        'stability': rng.uniform(0.5, 200.0, size),
+        'difficulty': rng.uniform(1.0, 10.0, size),
+        'reps': rng.integers(0, 10, size),
+        'lapses': rng.integers(0, 5, size),
+        'grades': rng.choice([1, 2, 3, 4], size, p=[0.1, 0.15, 0.6, 0.15]),
+        'elapsed_days': rng.uniform(0.0, 100.0, size)
+    }
+
+
+def bench_engine(sizes, loop_max, rng):
+    print(f"{'engine':<6} {'cards':>9} {'strategy':<18} {'cards/s':>14}")
+    for name in SRS_SCHEDULERS:
+        scheduler = create_scheduler(name)
+        for size in sizes:
+            deck = random_deck(size, rng)
+            results = {}
+
+            # The per-card loop is timed on a prefix of big decks
+            looped = min(size, loop_max)
+            started = time.perf_counter()
+            for i in range(looped):
+                scheduler.review_one(deck['stability'][i], deck['difficulty'][i], deck['reps'][i], deck['lapses'][i],
+                                     deck['grades'][i], deck['elapsed_days'][i])
+            results['per card (before)'] = looped / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            state = scheduler.review(deck['stability'], deck['difficulty'], deck['reps'], deck['lapses'],
+                                     deck['grades'], deck['elapsed_days'])
+            scheduler.intervals(state[0], state[1])
+            results['vectorized (after)'] = size / (time.perf_counter() - started)
+
+            for label, rate in results.items():
+                print(f"{name:<6} {size:9d} {label:<18} {rate:14,.0f}")
+            print(f"{name:<6} {size:9d} speedup: {results['vectorized (after)'] / results['per card (before)']:.0f}x")
+
+
+def fill_deck(document_id, user_id, size, rng):
+    now = datetime.utcnow()
+    rows = []
+    for i, (stability, difficulty, age) in enumerate(zip(rng.uniform(0.5, 200.0, size), rng.uniform(1.0, 10.0, size),
+                                                         rng.integers(0, 60, size))):
+        last_answered = now - timedelta(days=int(age))
+        rows.append({
+            'question_text': f'Question {i}?', 'question_type': 'qa', 'answer': 'answer', 'created_at': now,
+            'difficulty': 'medium', 'times_answered': 1, 'times_correct': 1, 'last_answered': last_answered,
+            'next_review': last_answered + timedelta(days=1), 'review_priority': 2.0,
+            'srs_stability': float(stability), 'srs_difficulty': float(difficulty), 'srs_reps': 1, 'srs_lapses': 0,
+            'document_id': document_id, 'user_id': user_id
+        })
+        if len(rows) == 20000:
+            db.session.execute(Question.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Question.__table__.insert(), rows)
+    db.session.commit()
+
+
+def reschedule_row_by_row(scheduler, user_id):
+    count = 0
+    for question in Question.query.filter(Question.user_id == user_id, Question.srs_stability != None).all():
+        days = scheduler.intervals(np.array([question.srs_stability]), np.array([question.srs_difficulty]))[0]
+        question.next_review = question.last_answered + timedelta(days=int(days))
+        count += 1
+    db.session.commit()
+    return count
+
+
+def bench_database(sizes, rng):
+    print(f"\n{'questions':>9} {'strategy':<22} {'seconds':>8} {'cards/s':>12}")
+    for size in sizes:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_db_'), 'bench.db')}"
+
+        app = create_app(BenchConfig)
+        logging.getLogger().setLevel(logging.WARNING)
+        with app.app_context():
+            db.create_all()
+            user = User(username='bench', email='bench@example.com')
+            db.session.add(user)
+            db.session.commit()
+            document = Document(filename='bench.txt', original_filename='bench.txt', file_type='txt',
+                                file_size=0, file_path='bench.txt', user_id=user.id)
+            db.session.add(document)
+            db.session.commit()
+            user_id = user.id
+            fill_deck(document.id, user_id, size, rng)
+
+            results = {}
+            for label, retention, run in (
+                ('row by row (before)', 0.85, reschedule_row_by_row),
+                ('batched (after)', 0.8, reschedule_questions),
+            ):
+                scheduler = create_scheduler('fsrs', desired_retention=retention)
+                db.session.expunge_all()
+                started = time.perf_counter()
+                count = run(scheduler, user_id)
+                results[label] = time.perf_counter() - started
+                print(f"{size:9d} {label:<22} {results[label]:8.2f} {count / results[label]:12,.0f}")
+            print(f"{size:9d} speedup: {results['row by row (before)'] / results['batched (after)']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Deck sizes for the engine benchmark (default: 10000 100000 1000000)')
+    parser.add_argument('--db-sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='Deck sizes for the database benchmark, none to skip (default: 10000 100000)')
+    parser.add_argument('--loop-max', type=int, default=100000,
+                        help='Cards timed in the per-card loop (default: 100000)')
+    args = parser.parse_args()
+
+    # Keep application logging out of the benchmark output
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = np.random.default_rng(42)
+
+    bench_engine(args.sizes, args.loop_max, rng)
+    if args.db_sizes:
+        bench_database(args.db_sizes, rng)
+
+
+if __name__ == '__main__':
+    main()